@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Cold-start timing for the deployed app (src/main.py)
+
+Each run starts a fresh interpreter with `python -X importtime`, imports the
+app and serves GET /health and GET /.well-known/agent.json in-process, which is
+what a serverless cold start does before answering. Reported per run:
+- import time of the app and the slowest modules it pulls in (from -X importtime)
+- time to the first /health and agent card responses
+- which heavy rendering modules (qrcode, barcode, PIL, numpy) got loaded
+
+Run from the repository root:
+    python -m benchmarks.cold_start
+    python -m benchmarks.cold_start --runs 5 --budget-ms 1500 --output cold.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Rendering dependencies that cold starts for /health and the agent card should not load
+HEAVY_MODULES = ("qrcode", "barcode", "PIL", "numpy")
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import {module} as target
+imported = time.perf_counter()
+import asyncio, httpx
+
+async def first_requests():
+    timings = {{}}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=target.app), base_url="http://cold") as client:
+        for path in ("/health", "/.well-known/agent.json"):
+            began = time.perf_counter()
+            response = await client.get(path)
+            timings[path] = [response.status_code, (time.perf_counter() - began) * 1000]
+    return timings
+
+requests = asyncio.run(first_requests())
+heavy = sorted({{name.split(".")[0] for name in sys.modules}} & set({heavy!r}))
+print(json.dumps({{"import_ms": (imported - started) * 1000, "requests": requests, "heavy_modules": heavy}}))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Parse `-X importtime` lines into {name, depth, self_ms, cumulative_ms}"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules.append({
+            "name": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000
+        })
+    return modules
+
+
+def import_subtree(modules: List[Dict[str, Any]], name: str) -> List[Dict[str, Any]]:
+    """Modules imported while importing `name` (importtime lists children just before their parent)"""
+    for index, entry in enumerate(modules):
+        if entry["name"] == name and entry["depth"] == 0:
+            children = []
+            for child in reversed(modules[:index]):
+                if child["depth"] == 0:
+                    break
+                children.append(child)
+            return [entry] + children[::-1]
+    return []
+
+
+def measure_once(module: str = "src.main") -> Dict[str, Any]:
+    """Cold-start one interpreter and return its import and first-request timings"""
+    env = dict(os.environ, RENDER_EXECUTOR=os.environ.get("RENDER_EXECUTOR", "sync"))
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["modules"] = parse_importtime(completed.stderr)
+    return result
+
+
+def measure(module: str = "src.main", runs: int = 3) -> Dict[str, Any]:
+    """Median cold-start timings over several fresh interpreters"""
+    samples = [measure_once(module) for _ in range(runs)]
+    slowest = sorted(
+        (m for m in import_subtree(samples[-1]["modules"], module) if m["depth"] <= 1),
+        key=lambda m: m["cumulative_ms"], reverse=True
+    )
+    return {
+        "module": module,
+        "runs": runs,
+        "import_ms": statistics.median(s["import_ms"] for s in samples),
+        "first_request_ms": {
+            path: statistics.median(s["requests"][path][1] for s in samples)
+            for path in samples[-1]["requests"]
+        },
+        "statuses": {path: status for path, (status, _) in samples[-1]["requests"].items()},
+        "heavy_modules": samples[-1]["heavy_modules"],
+        "slowest_imports": [
+            {"name": m["name"], "cumulative_ms": m["cumulative_ms"], "self_ms": m["self_ms"]}
+            for m in slowest[:15]
+        ]
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure cold-start import and first-request time")
+    parser.add_argument("--module", default="src.main", help="Module exposing the ASGI app")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to start (median is reported)")
+    parser.add_argument("--budget-ms", type=float, help="Fail if the median import time exceeds this")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    report = measure(args.module, args.runs)
+
+    print(f"{report['module']}: import {report['import_ms']:.1f} ms (median of {report['runs']})")
+    for path, ms in report["first_request_ms"].items():
+        print(f"  first {path:<26} {ms:8.1f} ms  (HTTP {report['statuses'][path]})")
+    print(f"  heavy modules loaded: {', '.join(report['heavy_modules']) or 'none'}")
+    print("  slowest imports (cumulative):")
+    for entry in report["slowest_imports"]:
+        print(f"    {entry['cumulative_ms']:8.1f} ms  {entry['name']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.budget_ms is not None and report["import_ms"] > args.budget_ms:
+        print(f"\nImport time {report['import_ms']:.1f} ms exceeds the budget of {args.budget_ms:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
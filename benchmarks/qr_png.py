@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Benchmark the direct QR PNG encoder against qrcode's PIL image factory
+
+Run from the repository root:
+    python -m benchmarks.qr_png
+"""
+
+import io
+import time
+
+from src.services.qr_service import _make_qr
+from src.utils.png_encoder import encode_module_matrix_png
+
+VERSIONS = [1, 5, 10, 20, 30, 40]
+COMPRESS_LEVELS = [1, 6, 9]
+BOX_SIZE = 10
+BORDER = 4
+
+
+def best_of(fn, repeat: int = 5, number: int = 3) -> float:
+    """Return the best mean time per call in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) / number)
+    return min(timings) * 1000
+
+
+def pil_png(qr) -> bytes:
+    buffer = io.BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def main():
+    print(f"box_size={BOX_SIZE} border={BORDER}; rasterize+PNG only (matrix built once)\n")
+    print(f"{'version':>7} {'pixels':>9} {'PIL ms':>8} {'fast ms':>8} {'speedup':>8} {'PIL B':>7} " +
+          " ".join(f"{'L' + str(level) + ' B':>7}" for level in COMPRESS_LEVELS))
+
+    for version in VERSIONS:
+        qr = _make_qr("x", version, BOX_SIZE, BORDER, "L")
+        reference = pil_png(qr)
+
+        pil_ms = best_of(lambda: pil_png(qr))
+        fast_ms = best_of(lambda: encode_module_matrix_png(qr.modules, BOX_SIZE, BORDER))
+        sizes = [len(encode_module_matrix_png(qr.modules, BOX_SIZE, BORDER, level)) for level in COMPRESS_LEVELS]
+        side = (qr.modules_count + 2 * BORDER) * BOX_SIZE
+
+        print(f"{version:>7} {side}x{side:<5} {pil_ms:>8.2f} {fast_ms:>8.2f} {pil_ms / fast_ms:>7.1f}x {len(reference):>7} " +
+              " ".join(f"{size:>7}" for size in sizes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the encoders, rasterizers and HTTP endpoints
+
+Measures latency percentiles, throughput and peak traced memory for:
+- QRCodeService.generate_qr_code across sizes and payload lengths up to 2000 chars
+- QR matrix build per version for each mask mode (reference, exact, fast)
+- QR and barcode PNG encoding per profile (fast, balanced, small), with output bytes
+- BarcodeService.generate_barcode for every BarcodeFormat
+- GET /, POST /api/v1/qr, POST /api/v1/barcode and the A2A paths (POST / and
+  A2AHandler message/send), in-process through the ASGI app
+- 50 concurrent identical QR requests, which single-flight collapses to one render
+- The per-stage metrics instrumentation itself
+
+Every iteration encodes a different payload so the render cache never answers.
+Rendering runs inline (RENDER_EXECUTOR=sync) unless the environment says
+otherwise, so memory is measured in this process.
+
+Run from the repository root:
+    python -m benchmarks.suite --output bench.json
+    python -m benchmarks.suite --baseline bench.json        # flag regressions
+    python -m benchmarks.suite --quick --filter barcode
+"""
+
+import os
+
+os.environ.setdefault("RENDER_EXECUTOR", "sync")
+
+import argparse
+import asyncio
+import inspect
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+QR_SIZES = [1, 2, 5, 10, 20, 30, 40]
+QR_PAYLOAD_LENGTHS = [16, 100, 500, 1000, 2000]  # 2000 is the QRRequest limit
+QUICK_QR_SIZES = [1, 10, 40]
+QUICK_QR_PAYLOAD_LENGTHS = [16, 2000]
+MASK_VERSIONS = [1, 5, 10, 20, 30, 40]
+QUICK_MASK_VERSIONS = [1, 10, 40]
+
+DEFAULT_THRESHOLD = 0.25  # 25% slower (or larger) than the baseline is a regression
+MIN_LATENCY_DELTA_MS = 0.05  # Ignore differences below timer noise
+
+
+class Case:
+    """One benchmarked operation; fn takes the iteration number so each call gets a fresh payload"""
+
+    def __init__(self, name: str, group: str, fn: Callable[[int], Any], params: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.group = group
+        self.fn = fn
+        self.params = params or {}
+
+    async def call(self, iteration: int) -> Any:
+        result = self.fn(iteration)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+
+def payload(iteration: int, length: int) -> str:
+    """Deterministic text of exactly length chars, unique per iteration"""
+    prefix = f"{iteration:08d}-"
+    body = "The quick brown fox jumps over the lazy dog. "
+    return (prefix + body * (length // len(body) + 1))[:length]
+
+
+def digits(iteration: int, length: int) -> str:
+    return f"{iteration:0{length}d}"[-length:]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Linear-interpolated percentile of an already sorted list"""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+async def measure(case: Case, min_time: float, min_iterations: int, max_iterations: int) -> Dict[str, Any]:
+    """
+    Run a case until min_time has elapsed (within the iteration bounds)
+
+    Returns:
+        dict: Latency percentiles in ms, throughput in ops/s, peak traced memory in KiB
+        and, for cases returning encoded bytes, their mean size
+    """
+    await case.call(0)  # Warm-up: imports, fonts, lazy pools
+
+    latencies = []
+    sizes = []
+    iteration = 1
+    started = time.perf_counter()
+    while iteration <= max_iterations and (iteration <= min_iterations or time.perf_counter() - started < min_time):
+        call_started = time.perf_counter()
+        result = await case.call(iteration)
+        latencies.append((time.perf_counter() - call_started) * 1000)
+        if isinstance(result, bytes):
+            sizes.append(len(result))
+        iteration += 1
+    elapsed = time.perf_counter() - started
+
+    # Memory is traced in a separate call because tracemalloc slows allocation down
+    tracemalloc.start()
+    try:
+        await case.call(iteration)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    report = {
+        "group": case.group,
+        "params": case.params,
+        "iterations": len(latencies),
+        "mean_ms": round(statistics.fmean(latencies), 4),
+        "min_ms": round(latencies[0], 4),
+        "p50_ms": round(percentile(latencies, 0.50), 4),
+        "p90_ms": round(percentile(latencies, 0.90), 4),
+        "p99_ms": round(percentile(latencies, 0.99), 4),
+        "max_ms": round(latencies[-1], 4),
+        "throughput_ops": round(len(latencies) / elapsed, 2),
+        "peak_kib": round(peak / 1024, 1)
+    }
+    if sizes:
+        report["mean_bytes"] = round(statistics.fmean(sizes), 1)
+    return report
+
+
+def service_cases(sizes: List[int], lengths: List[int]) -> List[Case]:
+    from src.models.request_models import BarcodeFormat, OutputFormat
+    from src.services.qr_service import QRCodeService
+    from src.services.barcode_service import BarcodeService
+
+    qr_service = QRCodeService()
+    barcode_service = BarcodeService()
+    cases = []
+
+    for size in sizes:
+        for length in lengths:
+            cases.append(Case(
+                f"qr_service/size={size}/len={length}", "qr_service",
+                lambda i, size=size, length=length: qr_service.generate_qr_code(payload(i, length), size, use_cache=False, persist=False),
+                {"size": size, "payload_length": length}
+            ))
+
+    barcode_texts = {
+        BarcodeFormat.CODE128: lambda i: payload(i, 24),
+        BarcodeFormat.EAN13: lambda i: digits(i, 12),
+        BarcodeFormat.EAN8: lambda i: digits(i, 7),
+        BarcodeFormat.UPC: lambda i: digits(i, 11)
+    }
+    for format_type in BarcodeFormat:
+        for output_format in OutputFormat:
+            cases.append(Case(
+                f"barcode_service/{format_type.value}/{output_format.value}", "barcode_service",
+                lambda i, f=format_type, o=output_format: barcode_service.generate_barcode(barcode_texts[f](i), f, use_cache=False, output_format=o, persist=False),
+                {"format": format_type.value, "output_format": output_format.value}
+            ))
+
+    return cases
+
+
+def mask_cases(versions: List[int]) -> List[Case]:
+    """QR matrix build (data encoding, mask selection, final layout) per version for each mask mode"""
+    import qrcode
+    from src.services.qr_mask import MASK_MODES, select_mask
+
+    def build(i: int, version: int, mode: str) -> None:
+        qr = qrcode.QRCode(version=version, error_correction=qrcode.constants.ERROR_CORRECT_L)
+        qr.add_data(payload(i, 16))
+        qr.makeImpl(False, select_mask(qr, mode))
+
+    return [
+        Case(f"qr_mask/{mode}/v{version}", "qr_mask",
+             lambda i, version=version, mode=mode: build(i, version, mode),
+             {"version": version, "mask_mode": mode})
+        for version in versions
+        for mode in MASK_MODES
+    ]
+
+
+def png_profile_cases(lengths: List[int]) -> List[Case]:
+    """Rasterize and encode one QR code (box size 10) or CODE128 barcode per PNG profile, reporting bytes and ms"""
+    from src.services.barcode_service import render_barcode_png
+    from src.services.qr_service import render_qr_png
+    from src.utils.png_encoder import PNG_PROFILES
+
+    cases = []
+    for profile in PNG_PROFILES:
+        for length in lengths:
+            cases.append(Case(
+                f"png_profile/{profile}/qr/len={length}", "png_profile",
+                lambda i, profile=profile, length=length: render_qr_png(payload(i, length), 1, 10, 4, "L", profile),
+                {"profile": profile, "payload_length": length}
+            ))
+        cases.append(Case(
+            f"png_profile/{profile}/barcode/code128", "png_profile",
+            lambda i, profile=profile: render_barcode_png(payload(i, 24), "code128", profile),
+            {"profile": profile}
+        ))
+    return cases
+
+
+def metrics_cases() -> List[Case]:
+    """Cost of one instrumented stage, to keep metrics overhead within budget"""
+    from src.utils.metrics import stage
+
+    def timed_stage(i: int) -> None:
+        for _ in range(1000):
+            with stage("bench", symbology="none", size_bucket="none"):
+                pass
+
+    return [Case("metrics/1000 stage observations", "metrics", timed_stage)]
+
+
+def endpoint_cases(client) -> List[Case]:
+    from src.models.request_models import BarcodeFormat
+    from src.services.a2a_handler import A2AHandler
+
+    a2a_handler = A2AHandler()
+
+    async def request(method: str, path: str, body: Optional[Dict[str, Any]] = None) -> None:
+        response = await client.request(method, path, json=body)
+        response.raise_for_status()
+
+    def a2a_message(text: str) -> Dict[str, Any]:
+        return {
+            "jsonrpc": "2.0",
+            "method": "message/send",
+            "id": 1,
+            "params": {"message": {"role": "user", "parts": [{"kind": "text", "text": text}]}}
+        }
+
+    cases = [
+        Case("endpoint/GET /", "endpoint", lambda i: request("GET", "/")),
+        Case("endpoint/POST /api/v1/qr", "endpoint",
+             lambda i: request("POST", "/api/v1/qr", {"text": payload(i, 100), "size": 10, "cache": False})),
+        Case("endpoint/POST / qr", "endpoint",
+             lambda i: request("POST", "/", {"text": f"qr {payload(i, 100)}"})),
+        Case("endpoint/POST / barcode", "endpoint",
+             lambda i: request("POST", "/", {"text": f"barcode {payload(i, 24)}"})),
+        Case("a2a/message/send qr", "a2a",
+             lambda i: a2a_handler.handle_request(a2a_message(f"qr {payload(i, 100)}"))),
+        Case("a2a/message/send barcode", "a2a",
+             lambda i: a2a_handler.handle_request(a2a_message(f"barcode {payload(i, 24)}"))),
+        Case("a2a/batch of 20 qr", "a2a",
+             lambda i: a2a_handler.handle_request([a2a_message(f"qr {payload(i * 20 + j, 100)}") for j in range(20)]),
+             {"batch": 20}),
+        # A viral message: identical uncached requests collapse onto one render
+        Case("endpoint/50 concurrent identical POST /api/v1/qr", "endpoint",
+             lambda i: asyncio.gather(*(request("POST", "/api/v1/qr", {"text": payload(i, 100), "size": 10, "cache": False}) for _ in range(50))),
+             {"concurrency": 50})
+    ]
+    for format_type in BarcodeFormat:
+        text = (lambda i: payload(i, 24)) if format_type == BarcodeFormat.CODE128 else (lambda i: digits(i, 12))
+        cases.append(Case(
+            f"endpoint/POST /api/v1/barcode/{format_type.value}", "endpoint",
+            lambda i, f=format_type, text=text: request("POST", "/api/v1/barcode", {"text": text(i), "format": f.value, "cache": False}),
+            {"format": format_type.value}
+        ))
+    return cases
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_suite(args) -> Dict[str, Any]:
+    import httpx
+    from src.main import app
+
+    sizes = list(range(1, 41)) if args.all_sizes else (QUICK_QR_SIZES if args.quick else QR_SIZES)
+    lengths = QUICK_QR_PAYLOAD_LENGTHS if args.quick else QR_PAYLOAD_LENGTHS
+    mask_versions = QUICK_MASK_VERSIONS if args.quick else MASK_VERSIONS
+    min_time = 0.05 if args.quick else args.min_time
+
+    results = {}
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        cases = (service_cases(sizes, lengths) + mask_cases(mask_versions) + png_profile_cases(lengths) +
+                 metrics_cases() + endpoint_cases(client))
+        for case in cases:
+            if args.filter and args.filter not in case.name:
+                continue
+            results[case.name] = await measure(case, min_time, args.min_iterations, args.max_iterations)
+            result = results[case.name]
+            print(f"{case.name:<48} p50 {result['p50_ms']:>9.3f} ms  p99 {result['p99_ms']:>9.3f} ms  "
+                  f"{result['throughput_ops']:>9.1f} ops/s  peak {result['peak_kib']:>9.1f} KiB" +
+                  (f"  {result['mean_bytes']:>9.0f} B" if "mean_bytes" in result else ""), file=sys.stderr)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "executor": os.environ["RENDER_EXECUTOR"],
+            "quick": args.quick
+        },
+        "results": results
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Compare two runs case by case
+
+    Returns:
+        list: One message per regression (p50/p99 latency, throughput, peak memory or output bytes)
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            continue
+
+        for metric in ("p50_ms", "p99_ms"):
+            delta = result[metric] - reference[metric]
+            if delta > MIN_LATENCY_DELTA_MS and result[metric] > reference[metric] * (1 + threshold):
+                regressions.append(f"{name}: {metric} {reference[metric]:.3f} -> {result[metric]:.3f}")
+        if result["throughput_ops"] < reference["throughput_ops"] / (1 + threshold):
+            regressions.append(f"{name}: throughput_ops {reference['throughput_ops']:.1f} -> {result['throughput_ops']:.1f}")
+        if result["peak_kib"] > reference["peak_kib"] * (1 + threshold) and result["peak_kib"] - reference["peak_kib"] > 64:
+            regressions.append(f"{name}: peak_kib {reference['peak_kib']:.1f} -> {result['peak_kib']:.1f}")
+        if "mean_bytes" in result and "mean_bytes" in reference and result["mean_bytes"] > reference["mean_bytes"] * (1 + threshold):
+            regressions.append(f"{name}: mean_bytes {reference['mean_bytes']:.0f} -> {result['mean_bytes']:.0f}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark encoders, rasterizers and endpoints")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Compare against a previous JSON result and fail on regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed relative slowdown (default 0.25)")
+    parser.add_argument("--filter", help="Only run cases whose name contains this string")
+    parser.add_argument("--quick", action="store_true", help="Fewer sizes and payloads, shorter runs")
+    parser.add_argument("--all-sizes", action="store_true", help="Benchmark every QR size from 1 to 40")
+    parser.add_argument("--min-time", type=float, default=0.3, help="Seconds to run each case")
+    parser.add_argument("--min-iterations", type=int, default=5)
+    parser.add_argument("--max-iterations", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_suite(args))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        print(f"\nCompared with {args.baseline} (revision {baseline['meta'].get('revision')}): "
+              f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+        for regression in regressions:
+            print(f"  REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Offline bulk generation of QR codes and barcodes
+
+Reads CSV or JSONL rows (text, type, format, size and optional name and
+output_format),
+renders them in parallel and streams the images straight into a tar or zip
+archive. A JSONL manifest with a SHA-256 checksum per image is written next
+to the archive and is used to resume an interrupted run.
+
+Usage:
+    python bulk_generate.py catalogue.csv catalogue.tar
+    python bulk_generate.py catalogue.jsonl catalogue.zip --workers 8
+    python bulk_generate.py catalogue.csv catalogue.tar --resume
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import struct
+import sys
+import tarfile
+import time
+import zipfile
+from multiprocessing import Pool
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from src.models.request_models import BarcodeFormat, OutputFormat
+from src.services.qr_service import QR_RENDERERS
+from src.services.barcode_service import BARCODE_RENDERERS, prepare_barcode
+
+
+def read_rows(path: str, input_format: Optional[str] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield (row_number, row) from a CSV or JSONL file without loading it into memory"""
+    input_format = input_format or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if input_format == "csv":
+            for row_number, row in enumerate(csv.DictReader(f)):
+                yield row_number, row
+        else:
+            row_number = 0
+            for line in f:
+                if line.strip():
+                    yield row_number, json.loads(line)
+                    row_number += 1
+
+
+def render_row(job: Tuple[int, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Render one row in a worker process
+
+    Args:
+        job: (row_number, row)
+
+    Returns:
+        dict: Row metadata with either "data" bytes or an "error"
+    """
+    row_number, row = job
+    code_type = (row.get("type") or "qr").lower()
+    result = {"row": row_number, "type": code_type, "text": row.get("text", "")}
+
+    try:
+        text = row.get("text")
+        if not text:
+            raise ValueError("Missing text")
+
+        output_format = OutputFormat((row.get("output_format") or OutputFormat.PNG.value).lower())
+        if code_type == "qr":
+            size = int(row.get("size") or 10)
+            # Same settings as QRCodeService.generate_qr_code
+            data = QR_RENDERERS[output_format](text, 1, max(1, min(40, size)), 4, "L")
+        elif code_type == "barcode":
+            format_type = (row.get("format") or BarcodeFormat.CODE128.value).lower()
+            validated_text, symbology = prepare_barcode(text, format_type)
+            data = BARCODE_RENDERERS[output_format](validated_text, symbology)
+        else:
+            raise ValueError(f"Unsupported type: {code_type}")
+
+        name = row.get("name") or f"{row_number:08d}_{code_type}"
+        result["name"] = f"{name}.{output_format.value}"
+        result["data"] = data
+    except Exception as e:
+        result["error"] = str(e)
+
+    return result
+
+
+class ArchiveWriter:
+    """
+    Streams images into a tar or zip archive without temporary files
+
+    Each entry is flushed before add() returns its end offset, which the
+    manifest records. Resuming truncates the archive at the last recorded
+    offset. A zip killed before close() has no central directory, so its
+    entries are recovered from their local headers and listed again when
+    the archive is closed.
+    """
+
+    def __init__(self, path: str, resume: bool = False, resume_offset: Optional[int] = 0):
+        self.path = path
+        self.is_zip = path.lower().endswith(".zip")
+        self.compressed_tar = path.lower().endswith((".tar.gz", ".tgz"))
+        self._file = None
+
+        if self.compressed_tar:
+            if resume:
+                raise ValueError("Compressed tar archives cannot be resumed; use .tar or .zip")
+            self.archive = tarfile.open(path, "w:gz")
+            return
+        if resume and resume_offset is None:
+            raise ValueError("The manifest has no archive offsets to resume from; rerun without --resume")
+
+        # Drop anything written after the last entry recorded in the manifest
+        self._file = open(path, "r+b" if resume else "wb")
+        self._file.seek(resume_offset if resume else 0)
+        self._file.truncate()
+        if self.is_zip:
+            recovered = read_zip_entries(self._file, resume_offset) if resume else []
+            self._file.seek(resume_offset if resume else 0)
+            self.archive = zipfile.ZipFile(self._file, "w", zipfile.ZIP_STORED)
+            for info in recovered:
+                self.archive.filelist.append(info)
+                self.archive.NameToInfo[info.filename] = info
+        else:
+            self.archive = tarfile.open(fileobj=self._file, mode="w")
+
+    def add(self, name: str, data: bytes) -> Optional[int]:
+        """Add one image and return the archive offset after it (None for compressed tar)"""
+        if self.is_zip:
+            self.archive.writestr(name, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            self.archive.addfile(info, io.BytesIO(data))
+        if self._file is None:
+            return None
+        # On disk before the manifest says so
+        self._file.flush()
+        return self._file.tell()
+
+    def close(self) -> None:
+        self.archive.close()
+        if self._file is not None:
+            self._file.close()
+
+
+def read_zip_entries(file, end: int) -> List[zipfile.ZipInfo]:
+    """
+    Rebuild the ZipInfo of each entry written before offset end from its local header
+
+    Raises:
+        ValueError: When the entries don't end exactly at end
+    """
+    entries = []
+    offset = 0
+    while offset < end:
+        file.seek(offset)
+        header = file.read(zipfile.sizeFileHeader)
+        if len(header) < zipfile.sizeFileHeader:
+            break
+        (signature, extract_version, _, flag_bits, compress_type, dos_time, dos_date,
+         crc, compress_size, file_size, name_length, extra_length) = struct.unpack(zipfile.structFileHeader, header)
+        if signature != zipfile.stringFileHeader:
+            break
+        raw_name = file.read(name_length)
+        info = zipfile.ZipInfo(
+            raw_name.decode("utf-8" if flag_bits & 0x800 else "cp437"),
+            ((dos_date >> 9) + 1980, (dos_date >> 5) & 0xF, dos_date & 0x1F,
+             dos_time >> 11, (dos_time >> 5) & 0x3F, (dos_time & 0x1F) * 2)
+        )
+        info.extract_version = extract_version
+        info.flag_bits = flag_bits
+        info.compress_type = compress_type
+        info.CRC = crc
+        info.compress_size = compress_size
+        info.file_size = file_size
+        info.extra = file.read(extra_length)
+        info.header_offset = offset
+        info.external_attr = 0o600 << 16  # as written by ZipFile.writestr
+        entries.append(info)
+        offset += zipfile.sizeFileHeader + name_length + extra_length + compress_size
+    if offset != end:
+        raise ValueError(f"{file.name} doesn't match its manifest; rerun without --resume")
+    return entries
+
+
+def load_manifest(path: str) -> Tuple[Set[int], Optional[int]]:
+    """Return (completed_rows, last_archive_offset) from an existing manifest"""
+    completed = set()
+    offset = None
+    if not os.path.exists(path):
+        return completed, offset
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break  # Torn final line from an interrupted run
+            if "sha256" in entry:
+                completed.add(entry["row"])
+                if entry.get("offset") is not None:
+                    offset = entry["offset"]
+    return completed, offset
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk-generate QR codes and barcodes into a tar or zip archive")
+    parser.add_argument("input", help="CSV or JSONL file with text, type, format, size (and optional name, output_format) columns")
+    parser.add_argument("output", help="Output archive (.tar, .tar.gz, .tgz or .zip)")
+    parser.add_argument("--input-format", choices=["csv", "jsonl"], help="Override input format detection")
+    parser.add_argument("--manifest", help="Manifest path (default: <output>.manifest.jsonl)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--chunksize", type=int, default=16, help="Rows sent to a worker at a time")
+    parser.add_argument("--resume", action="store_true", help="Skip rows already recorded in the manifest")
+    parser.add_argument("--progress-every", type=int, default=1000, help="Report progress every N rows")
+    args = parser.parse_args(argv)
+
+    manifest_path = args.manifest or f"{args.output}.manifest.jsonl"
+    completed, offset = set(), None
+    if args.resume and os.path.exists(args.output):
+        completed, offset = load_manifest(manifest_path)
+    args.resume = bool(completed)
+
+    writer = ArchiveWriter(args.output, resume=args.resume, resume_offset=offset)
+    manifest = open(manifest_path, "a" if args.resume else "w", encoding="utf-8")
+
+    jobs = (job for job in read_rows(args.input, args.input_format) if job[0] not in completed)
+    written = errors = bytes_written = 0
+    started = time.perf_counter()
+
+    try:
+        with Pool(args.workers) as pool:
+            for result in pool.imap(render_row, jobs, chunksize=args.chunksize):
+                data = result.pop("data", None)
+                if data is None:
+                    errors += 1
+                else:
+                    result["offset"] = writer.add(result["name"], data)
+                    result["sha256"] = hashlib.sha256(data).hexdigest()
+                    result["bytes"] = len(data)
+                    written += 1
+                    bytes_written += len(data)
+
+                manifest.write(json.dumps(result) + "\n")
+                manifest.flush()
+
+                done = written + errors
+                if args.progress_every and done % args.progress_every == 0:
+                    elapsed = time.perf_counter() - started
+                    print(f"{done} rows processed ({done / elapsed:.1f} codes/sec)", file=sys.stderr)
+    except KeyboardInterrupt:
+        print("Interrupted; rerun with --resume to continue", file=sys.stderr)
+    finally:
+        writer.close()
+        manifest.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Generated {written} codes ({errors} errors, {len(completed)} skipped) in {elapsed:.2f}s")
+    print(f"Throughput: {written / elapsed if elapsed else 0:.1f} codes/sec, {bytes_written / (1024 * 1024):.2f} MB written")
+    print(f"Archive: {args.output}")
+    print(f"Manifest: {manifest_path}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
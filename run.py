@@ -19,4 +19,16 @@ if __name__ == "__main__":
     print(f"Agent config: http://localhost:{port}/.well-known/agent.json")
     
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    workers = int(os.environ.get("WORKERS", 1))
+    if workers > 1:
+        # Workers share rendered images through one shared memory segment
+        os.environ.setdefault("SHARED_CACHE", "1")
+        print(f"Workers: {workers} (shared render cache: {os.environ['SHARED_CACHE'] == '1'})")
+        try:
+            uvicorn.run("src.main:app", host="0.0.0.0", port=port, workers=workers)
+        finally:
+            if os.environ["SHARED_CACHE"] == "1":
+                from src.services.shared_cache import shared_cache_from_env
+                shared_cache_from_env().unlink()
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
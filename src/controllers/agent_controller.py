@@ -1,7 +1,11 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from src.models.request_models import QRRequest, BarcodeRequest, TelexMessage, AgentResponse
+from fastapi import APIRouter, HTTPException
+from src.models.request_models import A2A_PNG_PROFILE, DEFAULT_PNG_PROFILE, QRRequest, BarcodeRequest, TelexMessage, AgentResponse, OutputFormat
 from src.services.qr_service import QRCodeService
 from src.services.barcode_service import BarcodeService
+from src.services.retention import retention_manager
+from src.services.pack_store import pack_store
+from src.services.admission import tenant_from_body
+from src.services.render_scheduler import INTERACTIVE, render_priority
 from src.utils.message_parser import MessageParser
 from src.utils.telex_client import TelexClient
 import logging
@@ -25,14 +29,19 @@ class AgentController:
         self.router.post("/barcode", response_model=AgentResponse)(self.generate_barcode)
         self.router.post("/a2a/agent/qrBarcodeAgent", response_model=dict)(self.handle_telex_message)
         self.router.get("/health")(self.health_check)
+        self.router.get("/retention/stats")(self.retention_stats)
+        # Generated files are evicted by one periodic task rather than after every request
+        self.router.add_event_handler("startup", retention_manager.start)
+        self.router.add_event_handler("shutdown", retention_manager.stop)
+        if pack_store is not None:
+            self.router.add_event_handler("startup", pack_store.start)
+            self.router.add_event_handler("shutdown", pack_store.stop)
+        self.router.add_event_handler("shutdown", self.telex_client.aclose)
     
-    async def generate_qr(self, request: QRRequest, background_tasks: BackgroundTasks) -> AgentResponse:
+    async def generate_qr(self, request: QRRequest) -> AgentResponse:
         """Generate QR code endpoint"""
         try:
-            file_path, base64_img = self.qr_service.generate_qr_code(request.text, request.size)
-            
-            # Schedule cleanup
-            background_tasks.add_task(self.qr_service.cleanup_old_files)
+            file_path, base64_img = await self.qr_service.generate_qr_code_async(request.text, request.size, use_cache=request.cache, output_format=request.output_format, profile=request.profile or DEFAULT_PNG_PROFILE)
             
             return AgentResponse(
                 success=True,
@@ -43,13 +52,10 @@ class AgentController:
             logger.error(f"QR generation error: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
     
-    async def generate_barcode(self, request: BarcodeRequest, background_tasks: BackgroundTasks) -> AgentResponse:
+    async def generate_barcode(self, request: BarcodeRequest) -> AgentResponse:
         """Generate barcode endpoint"""
         try:
-            file_path, base64_img = self.barcode_service.generate_barcode(request.text, request.format)
-            
-            # Schedule cleanup
-            background_tasks.add_task(self.barcode_service.cleanup_old_files)
+            file_path, base64_img = await self.barcode_service.generate_barcode_async(request.text, request.format, use_cache=request.cache, output_format=request.output_format, profile=request.profile or DEFAULT_PNG_PROFILE)
             
             return AgentResponse(
                 success=True,
@@ -62,21 +68,35 @@ class AgentController:
     
     async def handle_telex_message(self, message_data: dict) -> dict:
         """Handle incoming Telex messages via A2A protocol"""
+        # Chat replies are rendered ahead of API and bulk work
+        with render_priority(INTERACTIVE, tenant_from_body(message_data)):
+            return await self._reply_to_telex_message(message_data)
+    
+    async def _reply_to_telex_message(self, message_data: dict) -> dict:
+        """Render the code a Telex message asks for and build the A2A reply"""
         try:
             # Parse message
             parsed_request = self.message_parser.parse_message(message_data.get("message", ""))
             
+            output_format = OutputFormat(parsed_request.get("output_format", OutputFormat.PNG))
+            
             if parsed_request["type"] == "qr":
-                file_path, base64_img = self.qr_service.generate_qr_code(
+                file_path, base64_img = await self.qr_service.generate_qr_code_async(
                     parsed_request["text"], 
-                    parsed_request.get("size", 10)
+                    parsed_request.get("size", 10),
+                    output_format=output_format,
+                    persist=False,
+                    profile=parsed_request.get("profile") or A2A_PNG_PROFILE
                 )
                 response_text = f"QR code generated for: {parsed_request['text'][:50]}..."
                 
             elif parsed_request["type"] == "barcode":
-                file_path, base64_img = self.barcode_service.generate_barcode(
+                file_path, base64_img = await self.barcode_service.generate_barcode_async(
                     parsed_request["text"],
-                    parsed_request.get("format", "code128")
+                    parsed_request.get("format", "code128"),
+                    output_format=output_format,
+                    persist=False,
+                    profile=parsed_request.get("profile") or A2A_PNG_PROFILE
                 )
                 response_text = f"Barcode generated for: {parsed_request['text']}"
                 
@@ -91,7 +111,7 @@ class AgentController:
             }
             
             if base64_img:
-                response["image"] = f"data:image/png;base64,{base64_img}"
+                response["image"] = f"data:{output_format.mime_type};base64,{base64_img}"
                 response["type"] = "image"
             
             return response
@@ -107,6 +127,10 @@ class AgentController:
         """Health check endpoint"""
         return {"status": "healthy", "agent": "QRBarcodeBot"}
     
+    async def retention_stats(self) -> dict:
+        """Generated file index and eviction counters"""
+        return retention_manager.stats()
+    
     def _get_help_message(self) -> str:
         """Return help message for users"""
         return """
@@ -115,7 +139,7 @@ class AgentController:
 Commands:
 • qr [text] - Generate QR code
 • barcode [text] - Generate barcode
-• qr size:15 [text] - QR with custom size
+• qr size:15 [text] - QR with 15 pixels per module (4-40)
 • barcode format:ean13 [text] - Barcode with format
 
 Examples:
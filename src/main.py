@@ -1,16 +1,25 @@
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, HTTPException, Request, Query
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, Response
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-import qrcode
-import barcode
-from barcode.writer import ImageWriter
-import io
+import asyncio
 import base64
 import os
 import json
-from typing import Optional, Dict, Any
+from functools import lru_cache
+from typing import Optional, Dict, Any, Union
 from datetime import datetime
+from src.models.request_models import A2A_PNG_PROFILE, DEFAULT_PNG_PROFILE, IMAGE_PNG_PROFILE, OutputFormat, PngProfile, qr_box_size
+from src.services.render_cache import render_cache, make_render_key
+from src.services.render_executor import RenderQueueFull, render_executor
+from src.services.pack_store import pack_store
+from src.services.render_pipeline import render_pipeline, cache_sink
+from src.services.retention import retention_manager
+from src.services.admission import AdmissionMiddleware, admission_controller, tenant_from_headers
+from src.services.render_scheduler import BULK, INTERACTIVE, render_priority
+from src.services.shared_cache import shared_cache
+from src.utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, METRICS_ENABLED, MetricsMiddleware, counter_lines, registry, stage
+from src.services.batch_service import MAX_JSON_BATCH_BYTES, iter_json_items, iter_ndjson_lines, stream_batch, stream_ndjson
 
 app = FastAPI(
     title="QR & Barcode Generator Agent for Telex.im",
@@ -18,21 +27,114 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Mount static files
-if os.path.exists("static"):
-    app.mount("/static", StaticFiles(directory="static"), name="static")
+# Added first so the metrics middleware (outermost) also records refused requests
+app.add_middleware(AdmissionMiddleware)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 class MessageRequest(BaseModel):
     text: Optional[str] = None
     message: Optional[str] = None
+    channel_id: Optional[str] = None
+    user_id: Optional[str] = None
 
 class QRRequest(BaseModel):
     text: str
     size: Optional[int] = 10
+    cache: Optional[bool] = True
+    output_format: OutputFormat = OutputFormat.PNG
+    profile: Optional[PngProfile] = None
 
 class BarcodeRequest(BaseModel):
     text: str
     format: Optional[str] = "code128"
+    cache: Optional[bool] = True
+    output_format: OutputFormat = OutputFormat.PNG
+    profile: Optional[PngProfile] = None
+
+class BatchItem(BaseModel):
+    type: str = "qr"
+    text: str
+    size: Optional[int] = 10
+    format: Optional[str] = "code128"
+    cache: Optional[bool] = True
+    id: Optional[str] = None
+    output_format: OutputFormat = OutputFormat.PNG
+    profile: Optional[PngProfile] = None
+
+# The rendering stack (qrcode, python-barcode, PIL, numpy) is imported on first use,
+# so cold starts serving /health or the agent card don't pay for it
+def qr_renderers():
+    from src.services.qr_service import QR_RENDERERS
+    return QR_RENDERERS
+
+def barcode_renderers():
+    from src.services.barcode_service import BARCODE_RENDERERS
+    return BARCODE_RENDERERS
+
+def qr_render_key(text: str, size: int, output_format: OutputFormat, profile: Optional[PngProfile] = None) -> str:
+    """Render key of the QR code render_qr produces (also its ETag)"""
+    profile = profile or DEFAULT_PNG_PROFILE
+    return make_render_key(text, "qr", size=1, box_size=qr_box_size(size), border=5, ecc="M", output_format=output_format.value, profile=profile.value)
+
+def barcode_render_key(text: str, format_type: str, output_format: OutputFormat, profile: Optional[PngProfile] = None) -> str:
+    """Render key of the barcode render_barcode produces (also its ETag)"""
+    profile = profile or DEFAULT_PNG_PROFILE
+    return make_render_key(text, format_type.lower(), output_format=output_format.value, profile=profile.value)
+
+async def render_qr(text: str, size: int, use_cache: bool = True, output_format: OutputFormat = OutputFormat.PNG, profile: Optional[PngProfile] = None) -> bytes:
+    """
+    Render a QR code in memory on the render executor through the shared render cache
+    
+    size is the module size in pixels (1-40), as in QRCodeService. Sizes below
+    QR_MIN_BOX_SIZE (4) are raised to it so small codes stay scannable. The version
+    is the smallest that fits the text, so a large size no longer forces a large symbol,
+    and the module size is reduced so the image is at most QR_MAX_PIXELS (2048) wide.
+    profile is the PNG encoding profile (PNG_PROFILE when None).
+    """
+    box_size = qr_box_size(size)
+    profile = profile or DEFAULT_PNG_PROFILE
+    artifact = await render_pipeline.render(
+        qr_render_key(text, size, output_format, profile), output_format, "qr",
+        qr_renderers()[output_format], text, 1, box_size, 5, "M",
+        use_cache=use_cache,
+        sinks=[cache_sink] if use_cache else [],
+        profile=profile
+    )
+    return artifact.data
+
+async def render_barcode(text: str, format_type: str, use_cache: bool = True, output_format: OutputFormat = OutputFormat.PNG, profile: Optional[PngProfile] = None) -> bytes:
+    """Render a barcode in memory on the render executor through the shared render cache"""
+    format_type = format_type.lower()
+    profile = profile or DEFAULT_PNG_PROFILE
+    artifact = await render_pipeline.render(
+        barcode_render_key(text, format_type, output_format, profile), output_format, "barcode",
+        barcode_renderers()[output_format], text, format_type,
+        use_cache=use_cache,
+        sinks=[cache_sink] if use_cache else [],
+        profile=profile
+    )
+    return artifact.data
+
+def to_base64(data: bytes, kind: str) -> str:
+    """Base64-encode an image for a data URI, timed as the base64 stage"""
+    with stage("base64", symbology=kind, size_bucket="all"):
+        return base64.b64encode(data).decode()
+
+@app.on_event("startup")
+async def start_retention():
+    """Start the retention task (it indexes static/images off the loop), open the pack store and start compaction"""
+    retention_manager.start()
+    if pack_store is not None:
+        pack_store.start()
+
+@app.on_event("shutdown")
+async def shutdown_background_work():
+    """Stop render worker processes, the retention sweep and pack store compaction with the application"""
+    render_executor.shutdown()
+    await retention_manager.stop()
+    if pack_store is not None:
+        await pack_store.stop()
 
 @app.get("/")
 async def root():
@@ -47,18 +149,33 @@ async def root():
             "GET /health": "Health check endpoint",
             "GET /.well-known/agent.json": "Agent configuration for Telex.im",
             "POST /": "A2A protocol endpoint for QR/barcode generation",
+            "POST /a2a": "A2A JSON-RPC (message/send, batches, message/stream over SSE)",
             "POST /api/v1/qr": "Direct QR code generation",
-            "POST /api/v1/barcode": "Direct barcode generation"
+            "POST /api/v1/barcode": "Direct barcode generation",
+            "POST /api/v1/batch": "Batch QR/barcode generation streamed as NDJSON",
+            "GET /api/v1/qr.png|svg": "QR code as a raw, cacheable image",
+            "GET /api/v1/barcode.png|svg": "Barcode as a raw, cacheable image",
+            "GET /api/v1/cache/stats": "Render cache and single-flight statistics",
+            "GET /api/v1/executor/stats": "Render worker pool statistics",
+            "GET /api/v1/retention/stats": "Generated file retention statistics",
+            "GET /api/v1/store/stats": "Pack store entries, appends, recovery and compaction statistics",
+            "GET /api/v1/admission/stats": "Admission control state and rejection counters",
+            "GET /static/images/{name}": "Persisted images, served from the pack store",
+            "GET /metrics": "Prometheus metrics (per-stage latency histograms and counters)"
         },
         "commands": {
             "qr [text]": "Generate QR code for any text or URL",
-            "qr size:X [text]": "Generate QR code with custom size (1-40)",
+            "qr size:X [text]": "Generate QR code with X pixels per module (4-40; smaller values use 4)",
             "barcode [text]": "Generate barcode with default format (CODE128)",
-            "barcode format:X [text]": "Generate barcode with specific format"
+            "barcode format:X [text]": "Generate barcode with specific format",
+            "qr format:svg [text] / barcode format:svg [text]": "Generate SVG instead of PNG",
+            "qr profile:small [text] / barcode profile:small [text]": "PNG encoding profile: fast, balanced or small"
         },
         "supported_formats": {
-            "qr": ["Standard QR with customizable size (1-40)"],
-            "barcode": ["CODE128", "EAN13", "EAN8", "UPC"]
+            "qr": ["Standard QR with customizable module size (4-40 pixels)"],
+            "barcode": ["CODE128", "EAN13", "EAN8", "UPC"],
+            "output": ["PNG", "SVG"],
+            "png_profiles": ["fast", "balanced", "small"]
         },
         "examples": [
             "qr Hello World",
@@ -85,13 +202,17 @@ async def health():
         "uptime": "running"
     }
 
+@lru_cache(maxsize=1)
+def load_agent_card() -> bytes:
+    """Read and validate the agent card once per process (a missing file is not cached)"""
+    with open(".well-known/agent.json", "r") as f:
+        return json.dumps(json.load(f), separators=(",", ":")).encode()
+
 @app.get("/.well-known/agent.json")
 async def agent_config():
     """Serve agent configuration for Telex.im"""
     try:
-        with open(".well-known/agent.json", "r") as f:
-            agent_data = json.load(f)
-        return agent_data
+        return Response(content=load_agent_card(), media_type="application/json")
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Agent configuration not found")
 
@@ -99,21 +220,24 @@ async def agent_config():
 async def a2a_endpoint(request: MessageRequest):
     """A2A protocol endpoint for Telex.im integration"""
     message = request.text or request.message or ""
+    tenant = f"channel:{request.channel_id}" if request.channel_id else f"user:{request.user_id}" if request.user_id else None
     
     print(f"[A2A] Received: {message}")
     
-    # Parse QR command
+    # Parse QR command (chat replies are rendered ahead of API and bulk work)
     if message.lower().startswith("qr "):
-        return await handle_qr_command(message)
+        with render_priority(INTERACTIVE, tenant):
+            return await handle_qr_command(message)
     
     # Parse barcode command
     elif message.lower().startswith("barcode "):
-        return await handle_barcode_command(message)
+        with render_priority(INTERACTIVE, tenant):
+            return await handle_barcode_command(message)
     
     # Help command
     elif message.lower() in ["help", "commands"]:
         return {
-            "text": "QR & Barcode Generator Agent\\n\\nCommands:\\n• qr [text] - Generate QR code\\n• qr size:X [text] - QR with custom size\\n• barcode [text] - Generate barcode\\n• barcode format:X [text] - Barcode with format\\n\\nExamples:\\n• qr Hello World\\n• qr size:20 https://example.com\\n• barcode 1234567890\\n• barcode format:ean13 123456789012",
+            "text": "QR & Barcode Generator Agent\\n\\nCommands:\\n• qr [text] - Generate QR code\\n• qr size:X [text] - QR with X pixels per module (4-40)\\n• barcode [text] - Generate barcode\\n• barcode format:X [text] - Barcode with format\\n\\nExamples:\\n• qr Hello World\\n• qr size:20 https://example.com\\n• barcode 1234567890\\n• barcode format:ean13 123456789012",
             "type": "text"
         }
     
@@ -123,26 +247,64 @@ async def a2a_endpoint(request: MessageRequest):
         "type": "text"
     }
 
+@lru_cache(maxsize=1)
+def get_a2a_handler():
+    """A2AHandler, created (with the rendering stack) on the first /a2a request"""
+    from src.services.a2a_handler import A2AHandler
+    return A2AHandler()
+
+@app.post("/a2a")
+async def a2a_jsonrpc_endpoint(request: Request):
+    """A2A JSON-RPC endpoint: message/send, batches, and message/stream as Server-Sent Events"""
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse({"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}})
+    
+    if isinstance(body, dict) and body.get("method") == "message/stream":
+        return StreamingResponse(
+            get_a2a_handler().stream_request(body),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    response = await get_a2a_handler().handle_request(body)
+    if response is None:
+        return Response(status_code=204)  # Notifications only
+    return response
+
 async def handle_qr_command(message: str) -> Dict[str, Any]:
     """Handle QR code generation command"""
-    # Parse command: "qr size:15 Hello World" or "qr Hello World"
-    parts = message[3:].strip().split(" ", 1)
-    
+    # Parse command: "qr size:15 format:svg Hello World" or "qr Hello World"
     size = 10  # default size
-    text = ""
+    output_format = OutputFormat.PNG
+    profile = A2A_PNG_PROFILE
+    text = message[3:].strip()
     
-    if len(parts) == 1:
-        text = parts[0]
-    elif len(parts) == 2:
-        if parts[0].startswith("size:"):
-            try:
-                size = int(parts[0].split(":")[1])
-                size = max(1, min(40, size))  # Clamp between 1-40
-                text = parts[1]
-            except (ValueError, IndexError):
-                text = " ".join(parts)
-        else:
-            text = " ".join(parts)
+    with stage("parse", symbology="qr", size_bucket="none"):
+        while True:
+            parts = text.split(" ", 1)
+            if len(parts) < 2:
+                break
+            if parts[0].startswith("size:"):
+                try:
+                    size = int(parts[0].split(":")[1])
+                    size = max(1, min(40, size))  # Clamp between 1-40
+                except (ValueError, IndexError):
+                    break
+            elif parts[0].startswith("format:"):
+                try:
+                    output_format = OutputFormat(parts[0].split(":")[1].lower())
+                except ValueError:
+                    break
+            elif parts[0].startswith("profile:"):
+                try:
+                    profile = PngProfile(parts[0].split(":")[1].lower())
+                except ValueError:
+                    break
+            else:
+                break
+            text = parts[1]
     
     if not text:
         return {
@@ -152,24 +314,17 @@ async def handle_qr_command(message: str) -> Dict[str, Any]:
     
     try:
         # Generate QR code
-        qr = qrcode.QRCode(version=size, box_size=10, border=5)
-        qr.add_data(text)
-        qr.make(fit=True)
-        
-        # Create image
-        img = qr.make_image(fill_color="black", back_color="white")
+        data = await render_qr(text, size, output_format=output_format, profile=profile)
         
         # Convert to base64
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        img_str = base64.b64encode(buffer.getvalue()).decode()
+        img_str = to_base64(data, "qr")
         
         print(f"[QR] Generated for: {text} (size: {size})")
         
         return {
             "text": f"QR code generated for: {text}",
             "type": "image",
-            "image": f"data:image/png;base64,{img_str}"
+            "image": f"data:{output_format.mime_type};base64,{img_str}"
         }
         
     except Exception as e:
@@ -181,20 +336,32 @@ async def handle_qr_command(message: str) -> Dict[str, Any]:
 
 async def handle_barcode_command(message: str) -> Dict[str, Any]:
     """Handle barcode generation command"""
-    # Parse command: "barcode format:ean13 123456789012" or "barcode 1234567890"
-    parts = message[8:].strip().split(" ", 1)
-    
+    # Parse command: "barcode format:ean13 format:svg 123456789012" or "barcode 1234567890"
     format_type = "code128"  # default format
-    text = ""
+    output_format = OutputFormat.PNG
+    profile = A2A_PNG_PROFILE
+    text = message[8:].strip()
     
-    if len(parts) == 1:
-        text = parts[0]
-    elif len(parts) == 2:
-        if parts[0].startswith("format:"):
-            format_type = parts[0].split(":")[1].lower()
+    with stage("parse", symbology="barcode", size_bucket="none"):
+        while True:
+            parts = text.split(" ", 1)
+            if len(parts) < 2:
+                break
+            if parts[0].startswith("profile:"):
+                try:
+                    profile = PngProfile(parts[0].split(":")[1].lower())
+                except ValueError:
+                    break
+            elif parts[0].startswith("format:"):
+                value = parts[0].split(":")[1].lower()
+                # format: names either the output format (png/svg) or the symbology
+                try:
+                    output_format = OutputFormat(value)
+                except ValueError:
+                    format_type = value
+            else:
+                break
             text = parts[1]
-        else:
-            text = " ".join(parts)
     
     if not text:
         return {
@@ -225,20 +392,17 @@ async def handle_barcode_command(message: str) -> Dict[str, Any]:
             }
         
         # Generate barcode
-        barcode_class = barcode.get_barcode_class(format_type)
-        code = barcode_class(text, writer=ImageWriter())
+        data = await render_barcode(text, format_type, output_format=output_format, profile=profile)
         
         # Convert to base64
-        buffer = io.BytesIO()
-        code.write(buffer)
-        img_str = base64.b64encode(buffer.getvalue()).decode()
+        img_str = to_base64(data, "barcode")
         
         print(f"[Barcode] Generated {format_type.upper()} for: {text}")
         
         return {
             "text": f"{format_type.upper()} barcode generated for: {text}",
             "type": "image",
-            "image": f"data:image/png;base64,{img_str}"
+            "image": f"data:{output_format.mime_type};base64,{img_str}"
         }
         
     except Exception as e:
@@ -248,50 +412,281 @@ async def handle_barcode_command(message: str) -> Dict[str, Any]:
             "type": "text"
         }
 
+def render_error(e: Exception) -> HTTPException:
+    """400 for input the renderers reject, 503 with Retry-After when the render queue is full"""
+    if isinstance(e, RenderQueueFull):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return HTTPException(status_code=400, detail=str(e))
+
 @app.post("/api/v1/qr")
 async def generate_qr(request: QRRequest):
     """Direct QR code generation endpoint"""
     try:
-        qr = qrcode.QRCode(version=request.size, box_size=10, border=5)
-        qr.add_data(request.text)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        img_str = base64.b64encode(buffer.getvalue()).decode()
+        data = await render_qr(request.text, request.size, use_cache=request.cache, output_format=request.output_format, profile=request.profile)
+        img_str = to_base64(data, "qr")
         
         return {
             "success": True,
             "text": request.text,
             "size": request.size,
-            "image": f"data:image/png;base64,{img_str}"
+            "image": f"data:{request.output_format.mime_type};base64,{img_str}"
         }
         
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise render_error(e)
 
 @app.post("/api/v1/barcode")
 async def generate_barcode(request: BarcodeRequest):
     """Direct barcode generation endpoint"""
     try:
-        barcode_class = barcode.get_barcode_class(request.format)
-        code = barcode_class(request.text, writer=ImageWriter())
-        
-        buffer = io.BytesIO()
-        code.write(buffer)
-        img_str = base64.b64encode(buffer.getvalue()).decode()
+        data = await render_barcode(request.text, request.format, use_cache=request.cache, output_format=request.output_format, profile=request.profile)
+        img_str = to_base64(data, "barcode")
         
         return {
             "success": True,
             "text": request.text,
             "format": request.format,
-            "image": f"data:image/png;base64,{img_str}"
+            "image": f"data:{request.output_format.mime_type};base64,{img_str}"
         }
         
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise render_error(e)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header (weak comparison) against an ETag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+class BufferResponse(Response):
+    """Response whose body may be any buffer, e.g. a memoryview into the pack file, sent without copying"""
+    
+    def render(self, content: Any) -> Any:
+        return content
+
+def image_headers(key: str) -> Dict[str, str]:
+    """ETag (from the content-addressed render key, so the body is never hashed) and Cache-Control of an image"""
+    return {"ETag": f'"{key[:32]}"', "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+
+def not_modified(request: Request, key: str) -> Optional[Response]:
+    """
+    304 when the client sent this image's ETag, checked before rendering
+    
+    Only an explicit tag counts: a render that fails never gets an ETag, so a
+    match means the image was served before. "*" is left to image_response.
+    """
+    headers = image_headers(key)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and if_none_match.strip() != "*" and etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return None
+
+def image_response(data: Union[bytes, memoryview], output_format: OutputFormat, request: Request, key: str) -> Response:
+    """Return raw image bytes with the render key as ETag, answering 304 when the client already has them"""
+    headers = image_headers(key)
+    
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    
+    return BufferResponse(content=data, media_type=output_format.mime_type, headers=headers)
+
+@app.get("/api/v1/qr.{extension}")
+async def get_qr_image(
+    extension: OutputFormat,
+    request: Request,
+    text: str = Query(...),
+    size: Optional[int] = Query(10),
+    cache: Optional[bool] = Query(True),
+    profile: PngProfile = Query(IMAGE_PNG_PROFILE)
+):
+    """QR code as raw PNG or SVG bytes, cacheable by browsers and CDNs"""
+    key = qr_render_key(text, size, extension, profile)
+    cached = not_modified(request, key)
+    if cached is not None:
+        return cached
+    try:
+        data = await render_qr(text, size, use_cache=cache, output_format=extension, profile=profile)
+    except Exception as e:
+        raise render_error(e)
+    
+    return image_response(data, extension, request, key)
+
+@app.get("/api/v1/barcode.{extension}")
+async def get_barcode_image(
+    extension: OutputFormat,
+    request: Request,
+    text: str = Query(...),
+    format: Optional[str] = Query("code128"),
+    cache: Optional[bool] = Query(True),
+    profile: PngProfile = Query(IMAGE_PNG_PROFILE)
+):
+    """Barcode as raw PNG or SVG bytes, cacheable by browsers and CDNs"""
+    key = barcode_render_key(text, format, extension, profile)
+    cached = not_modified(request, key)
+    if cached is not None:
+        return cached
+    try:
+        data = await render_barcode(text, format, use_cache=cache, output_format=extension, profile=profile)
+    except Exception as e:
+        raise render_error(e)
+    
+    return image_response(data, extension, request, key)
+
+@app.get("/static/images/{name}")
+async def get_static_image(name: str, request: Request):
+    """
+    Persisted image by file name (<prefix>_<render key>.<png|svg>)
+    
+    Images written by the services live in the pack store and are served as
+    zero-copy slices of its memory-mapped pack file. Names that aren't in
+    the store fall back to files in static/images.
+    """
+    stem, _, extension = name.rpartition(".")
+    key = stem.rpartition("_")[2]
+    if pack_store is not None and len(key) == 64:
+        try:
+            stored = await asyncio.get_running_loop().run_in_executor(None, pack_store.get, key)
+        except OSError:
+            stored = None  # Unreadable store: try static/images
+        if stored is not None and stored[1] == extension:
+            return image_response(stored[0], OutputFormat(extension), request, key)
+    
+    path = os.path.join("static", "images", name)
+    if name.startswith(".") or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Image not found")
+    return FileResponse(path)
+
+# Other static files (mounted after /static/images/{name} so that route wins)
+if os.path.exists("static"):
+    app.mount("/static", StaticFiles(directory="static"), name="static")
+
+async def render_batch_item(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate and render a single parsed batch item"""
+    item = BatchItem.model_validate(raw)
+    
+    if item.type == "qr":
+        data = await render_qr(item.text, item.size, use_cache=item.cache, output_format=item.output_format, profile=item.profile)
+    elif item.type == "barcode":
+        data = await render_barcode(item.text, item.format, use_cache=item.cache, output_format=item.output_format, profile=item.profile)
+    else:
+        raise ValueError(f"Unsupported item type: {item.type}")
+    
+    img_str = to_base64(data, item.type)
+    return {
+        "id": item.id,
+        "type": item.type,
+        "text": item.text,
+        "image": f"data:{item.output_format.mime_type};base64,{img_str}"
+    }
+
+@app.post("/api/v1/batch")
+async def generate_batch(request: Request):
+    """
+    Batch generation endpoint
+    
+    Accepts a JSON array (or {"items": [...]}) or an application/x-ndjson body
+    of QR/barcode items and streams one NDJSON result line per item as soon as
+    it is rendered. Item failures are reported inline. A JSON array is parsed
+    whole, so it is limited to BATCH_MAX_JSON_BYTES; NDJSON items are parsed
+    one at a time as they are rendered.
+    """
+    content_type = request.headers.get("content-type", "")
+    
+    if "ndjson" in content_type:
+        items = iter_ndjson_lines(await request.body())
+    else:
+        raw_body = bytearray()
+        async for chunk in request.stream():
+            raw_body += chunk
+            if len(raw_body) > MAX_JSON_BATCH_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"JSON batch bodies are limited to {MAX_JSON_BATCH_BYTES} bytes; send larger batches as application/x-ndjson"
+                )
+        try:
+            body = json.loads(raw_body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if isinstance(body, dict):
+            body = body.get("items")
+        if not isinstance(body, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        items = iter_json_items(body)
+    
+    # Batch items wait behind chat replies and single API renders
+    tenant = tenant_from_headers(dict(request.scope["headers"])) or (f"client:{request.client.host}" if request.client else None)
+    
+    async def render_bulk_item(raw: Dict[str, Any]) -> Dict[str, Any]:
+        with render_priority(BULK, tenant):
+            return await render_batch_item(raw)
+    
+    concurrency = max(1, min(render_executor.max_queue, render_executor.max_workers * 2))
+    results = stream_batch(items, render_bulk_item, concurrency)
+    return StreamingResponse(stream_ndjson(results), media_type="application/x-ndjson")
+
+@app.get("/api/v1/cache/stats")
+async def cache_stats():
+    """Render cache hit/miss/eviction counters, the cache shared across workers and renders collapsed onto identical in-flight ones"""
+    stats = {**render_cache.stats(), "single_flight": render_pipeline.flights.stats()}
+    if shared_cache is not None:
+        stats["shared"] = shared_cache.stats()
+    return stats
+
+@app.get("/api/v1/executor/stats")
+async def executor_stats():
+    """Render worker pool configuration and job counters"""
+    return render_executor.stats()
+
+@app.get("/api/v1/retention/stats")
+async def retention_stats():
+    """Indexed generated files, byte budget, TTL and eviction counters"""
+    return retention_manager.stats()
+
+@app.get("/api/v1/admission/stats")
+async def admission_stats():
+    """Admission limits, requests in flight, throttled tenants and rejection counters"""
+    return admission_controller.stats()
+
+@app.get("/api/v1/store/stats")
+async def store_stats():
+    """Pack store entries, sizes, appends, deduplication, recovery and compaction counters"""
+    if pack_store is None:
+        raise HTTPException(status_code=404, detail="The pack store is disabled")
+    # Takes the store's flock and walks its index, so keep it off the event loop
+    return await asyncio.get_running_loop().run_in_executor(None, pack_store.stats)
+
+def cache_metric_lines():
+    """Render cache counters, read at scrape time"""
+    stats = render_cache.stats()
+    lines = (
+        counter_lines("qrbar_render_cache_hits_total", "Render cache hits", stats["hits"]) +
+        counter_lines("qrbar_render_cache_misses_total", "Render cache misses", stats["misses"]) +
+        counter_lines("qrbar_render_cache_evictions_total", "Render cache evictions", stats["evictions"]) +
+        counter_lines("qrbar_render_collapsed_total", "Renders that awaited an identical in-flight render", render_pipeline.flights.collapsed)
+    )
+    if shared_cache is not None:
+        shared = shared_cache.stats()
+        lines += (
+            counter_lines("qrbar_shared_cache_hits_total", "Shared cache hits in this worker", shared.get("hits", 0)) +
+            counter_lines("qrbar_shared_cache_misses_total", "Shared cache misses in this worker", shared.get("misses", 0)) +
+            counter_lines("qrbar_shared_cache_evictions_total", "Shared cache evictions across workers", shared.get("evictions", 0))
+        )
+    return lines
+
+registry.register_collector(cache_metric_lines)
+registry.register_collector(admission_controller.metric_lines)
+registry.register_collector(render_executor.scheduler.metric_lines)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of stage histograms and counters"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    # Set as a header: Starlette would append a second charset to a text/ media_type
+    return Response(content=registry.expose(), headers={"Content-Type": METRICS_CONTENT_TYPE})
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,3 +1,4 @@
+import os
 from pydantic import BaseModel, Field
 from typing import Optional, Literal
 from enum import Enum
@@ -8,13 +9,45 @@ class BarcodeFormat(str, Enum):
     EAN8 = "ean8"
     UPC = "upc"
 
+class OutputFormat(str, Enum):
+    PNG = "png"
+    SVG = "svg"
+    
+    @property
+    def mime_type(self) -> str:
+        return "image/svg+xml" if self is OutputFormat.SVG else "image/png"
+
+class PngProfile(str, Enum):
+    FAST = "fast"
+    BALANCED = "balanced"
+    SMALL = "small"
+
+# Per-endpoint defaults, used when the request doesn't pick a profile
+DEFAULT_PNG_PROFILE = PngProfile(os.getenv("PNG_PROFILE", PngProfile.BALANCED.value).lower())
+A2A_PNG_PROFILE = PngProfile(os.getenv("A2A_PNG_PROFILE", PngProfile.FAST.value).lower())  # interactive A2A traffic
+IMAGE_PNG_PROFILE = PngProfile(os.getenv("IMAGE_PNG_PROFILE", PngProfile.SMALL.value).lower())  # CDN-cached GET images
+
+# QR module size bounds in pixels; below the minimum phone scanners can't resolve the modules
+MIN_QR_BOX_SIZE = int(os.getenv("QR_MIN_BOX_SIZE", "4"))
+MAX_QR_BOX_SIZE = 40
+
+def qr_box_size(size: Optional[int]) -> int:
+    """Module size in pixels for a requested QR size (1-40), raised to at least MIN_QR_BOX_SIZE"""
+    return max(MIN_QR_BOX_SIZE, min(MAX_QR_BOX_SIZE, size or 10))
+
 class QRRequest(BaseModel):
     text: str = Field(..., min_length=1, max_length=2000, description="Text to encode in QR code")
     size: Optional[int] = Field(default=10, ge=1, le=40, description="QR code size")
+    cache: bool = Field(default=True, description="Reuse a cached render when available")
+    output_format: OutputFormat = Field(default=OutputFormat.PNG, description="Image format (png or svg)")
+    profile: Optional[PngProfile] = Field(default=None, description="PNG encoding profile (fast, balanced or small)")
 
 class BarcodeRequest(BaseModel):
     text: str = Field(..., min_length=1, max_length=100, description="Text to encode in barcode")
     format: BarcodeFormat = Field(default=BarcodeFormat.CODE128, description="Barcode format")
+    cache: bool = Field(default=True, description="Reuse a cached render when available")
+    output_format: OutputFormat = Field(default=OutputFormat.PNG, description="Image format (png or svg)")
+    profile: Optional[PngProfile] = Field(default=None, description="PNG encoding profile (fast, balanced or small)")
 
 class TelexMessage(BaseModel):
     message: str = Field(..., description="User message from Telex")
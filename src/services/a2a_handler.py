@@ -1,30 +1,97 @@
+import asyncio
+import json
+import os
+import time
 import uuid
 import logging
-from typing import Dict, Any, Optional
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Any, List, Optional, Union
 from src.services.qr_service import QRCodeService
 from src.services.barcode_service import BarcodeService
 from src.utils.message_parser import MessageParser
+from src.models.request_models import A2A_PNG_PROFILE, OutputFormat
+from src.services.admission import tenant_from_body
+from src.services.render_scheduler import INTERACTIVE, render_priority
 
 logger = logging.getLogger(__name__)
 
 class A2AHandler:
     """Handler for A2A protocol JSON-RPC requests"""
     
-    def __init__(self):
+    def __init__(self, batch_concurrency: Optional[int] = None, max_batch: Optional[int] = None, heartbeat_interval: Optional[float] = None):
+        """
+        Args:
+            batch_concurrency: Batch items (and streamed codes) rendered at once (A2A_BATCH_CONCURRENCY)
+            max_batch: Largest batch accepted (A2A_MAX_BATCH)
+            heartbeat_interval: Seconds of silence before a message/stream heartbeat (A2A_STREAM_HEARTBEAT)
+        """
         self.qr_service = QRCodeService()
         self.barcode_service = BarcodeService()
         self.message_parser = MessageParser()
+        self.batch_concurrency = batch_concurrency or int(os.getenv("A2A_BATCH_CONCURRENCY", "8"))
+        self.max_batch = max_batch or int(os.getenv("A2A_MAX_BATCH", "100"))
+        self.heartbeat_interval = heartbeat_interval or float(os.getenv("A2A_STREAM_HEARTBEAT", "15"))
     
-    async def handle_request(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def handle_request(self, request_data: Union[Dict[str, Any], List[Any]]) -> Optional[Union[Dict[str, Any], List[Dict[str, Any]]]]:
         """
-        Handle incoming A2A JSON-RPC request
+        Handle incoming A2A JSON-RPC request or batch
         
         Args:
-            request_data: JSON-RPC request object
+            request_data: JSON-RPC request object, or a list of them (a batch)
             
         Returns:
-            JSON-RPC response object
+            JSON-RPC response object, a list of them for a batch, or None when
+            there is nothing to answer (notifications only)
+        """
+        # Chat replies are rendered ahead of API and bulk work
+        with render_priority(INTERACTIVE, tenant_from_body(request_data)):
+            if isinstance(request_data, list):
+                return await self.handle_batch(request_data)
+            return await self._handle_single(request_data)
+    
+    async def handle_batch(self, requests: List[Any]) -> Optional[Union[Dict[str, Any], List[Dict[str, Any]]]]:
         """
+        Handle a JSON-RPC batch
+        
+        Items run concurrently (at most batch_concurrency at a time) and each one
+        fails on its own. Responses keep request order; notifications get none.
+        
+        Args:
+            requests: JSON-RPC request objects
+            
+        Returns:
+            List of responses, a single error response for an invalid batch, or
+            None when every item is a notification
+        """
+        if not requests:
+            return self._create_error_response(None, -32600, "Invalid Request")
+        if len(requests) > self.max_batch:
+            return self._create_error_response(None, -32600, f"Invalid Request: batch larger than {self.max_batch}")
+        
+        slots = asyncio.Semaphore(self.batch_concurrency)
+        batch_started = time.perf_counter()
+        
+        async def run(index: int, item: Any) -> Optional[Dict[str, Any]]:
+            async with slots:
+                started = time.perf_counter()
+                response = await self._handle_single(item)
+                outcome = "error" if response is not None and "error" in response else "ok"
+                method = item.get("method") if isinstance(item, dict) else None
+                logger.info(f"A2A batch item {index} ({method}) {outcome} in {(time.perf_counter() - started) * 1000:.1f} ms")
+                return response
+        
+        responses = await asyncio.gather(*(run(index, item) for index, item in enumerate(requests)))
+        logger.info(f"A2A batch of {len(requests)} handled in {(time.perf_counter() - batch_started) * 1000:.1f} ms")
+        
+        responses = [response for response in responses if response is not None]
+        return responses or None
+    
+    async def _handle_single(self, request_data: Any) -> Optional[Dict[str, Any]]:
+        """Handle one JSON-RPC request; returns None for notifications (no id)"""
+        if not isinstance(request_data, dict):
+            return self._create_error_response(None, -32600, "Invalid Request")
+        
+        is_notification = "id" not in request_data
         try:
             method = request_data.get("method")
             request_id = request_data.get("id")
@@ -33,12 +100,15 @@ class A2AHandler:
             if method == "message/send":
                 result = await self._handle_message_send(params)
             else:
-                return self._create_error_response(request_id, -32601, "Method not found")
+                response = self._create_error_response(request_id, -32601, "Method not found")
+                return None if is_notification else response
             
-            return self._create_success_response(request_id, result)
+            return None if is_notification else self._create_success_response(request_id, result)
             
         except Exception as e:
             logger.error(f"A2A request handling error: {str(e)}")
+            if is_notification:
+                return None
             return self._create_error_response(
                 request_data.get("id"), 
                 -32603, 
@@ -58,29 +128,154 @@ class A2AHandler:
                     text_content = part.get("text", "")
                     break
             
-            if not text_content:
-                return self._create_help_message()
-            
-            # Parse the message
-            parsed_request = self.message_parser.parse_message(text_content)
-            
-            if parsed_request["type"] == "qr":
-                return await self._generate_qr_response(parsed_request)
-            elif parsed_request["type"] == "barcode":
-                return await self._generate_barcode_response(parsed_request)
-            else:
-                return self._create_help_message()
+            return await self._respond_to_text(text_content)
                 
         except Exception as e:
             logger.error(f"Message send handling error: {str(e)}")
             raise
     
+    async def _respond_to_text(self, text_content: str) -> Dict[str, Any]:
+        """Parse one command and return the agent message answering it"""
+        if not text_content:
+            return self._create_help_message()
+        
+        # Parse the message
+        parsed_request = self.message_parser.parse_message(text_content)
+        
+        if parsed_request["type"] == "qr":
+            return await self._generate_qr_response(parsed_request)
+        elif parsed_request["type"] == "barcode":
+            return await self._generate_barcode_response(parsed_request)
+        else:
+            return self._create_help_message()
+    
+    def _stream_commands(self, params: Dict[str, Any]) -> List[str]:
+        """
+        Commands in a message/stream request, one per code to generate
+        
+        Every text part is a command. A part whose lines each start with
+        "qr " or "barcode " is split into one command per line.
+        """
+        commands = []
+        for part in params.get("message", {}).get("parts", []):
+            if part.get("kind") != "text" and part.get("type") != "text":
+                continue
+            text = part.get("text", "")
+            lines = [line.strip() for line in text.splitlines() if line.strip()]
+            if len(lines) > 1 and all(line.lower().startswith(("qr ", "barcode ")) for line in lines):
+                commands.extend(lines)
+            elif text.strip():
+                commands.append(text)
+        return commands or [""]
+    
+    async def stream_request(self, request_data: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Handle message/stream, yielding Server-Sent Events
+        
+        A "working" status event is sent at once, then one artifact event per
+        code as soon as it is rendered (in completion order, with its index),
+        then a final "completed" status. A comment line is sent whenever nothing
+        else has been sent for heartbeat_interval seconds. Closing the generator
+        (e.g. the client disconnected) cancels the renders still in flight.
+        
+        Args:
+            request_data: JSON-RPC request object with method message/stream
+            
+        Yields:
+            str: SSE frames
+        """
+        request_id = request_data.get("id")
+        params = request_data.get("params") or {}
+        task_id = str(uuid.uuid4())
+        context_id = params.get("message", {}).get("contextId") or str(uuid.uuid4())
+        commands = self._stream_commands(params)
+        started = time.perf_counter()
+        tenant = tenant_from_body(request_data)
+        
+        yield self._sse_event(request_id, self._status_event(task_id, context_id, "working", final=False))
+        
+        async def render(index: int, command: str):
+            try:
+                with render_priority(INTERACTIVE, tenant):
+                    return index, await self._respond_to_text(command)
+            except Exception as e:
+                logger.error(f"A2A stream item {index} failed: {str(e)}")
+                return index, self._error_message(f"Error generating code: {str(e)}")
+        
+        pending = set()
+        waiting = iter(enumerate(commands))
+        sent = 0
+        try:
+            for index, command in waiting:
+                pending.add(asyncio.ensure_future(render(index, command)))
+                if len(pending) >= self.batch_concurrency:
+                    break
+            
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=self.heartbeat_interval, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    yield ": heartbeat\n\n"
+                    continue
+                for task in done:
+                    index, message = task.result()
+                    yield self._sse_event(request_id, self._artifact_event(task_id, context_id, index, message))
+                    sent += 1
+                    next_item = next(waiting, None)
+                    if next_item is not None:
+                        pending.add(asyncio.ensure_future(render(*next_item)))
+            
+            yield self._sse_event(request_id, self._status_event(task_id, context_id, "completed", final=True))
+            logger.info(f"A2A stream of {len(commands)} code(s) finished in {(time.perf_counter() - started) * 1000:.1f} ms")
+        finally:
+            # Client went away: don't leave renders running
+            for task in pending:
+                task.cancel()
+            if sent < len(commands):
+                logger.info(f"A2A stream cancelled after {sent} of {len(commands)} code(s)")
+    
+    def _sse_event(self, request_id: Any, result: Dict[str, Any]) -> str:
+        """Frame one JSON-RPC response as a Server-Sent Event"""
+        return f"data: {json.dumps(self._create_success_response(request_id, result))}\n\n"
+    
+    def _status_event(self, task_id: str, context_id: str, state: str, final: bool) -> Dict[str, Any]:
+        """A2A TaskStatusUpdateEvent"""
+        return {
+            "kind": "status-update",
+            "taskId": task_id,
+            "contextId": context_id,
+            "status": {
+                "state": state,
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            },
+            "final": final
+        }
+    
+    def _artifact_event(self, task_id: str, context_id: str, index: int, message: Dict[str, Any]) -> Dict[str, Any]:
+        """A2A TaskArtifactUpdateEvent carrying the parts of one generated code"""
+        return {
+            "kind": "artifact-update",
+            "taskId": task_id,
+            "contextId": context_id,
+            "artifact": {
+                "artifactId": str(uuid.uuid4()),
+                "name": f"code-{index}",
+                "metadata": {"index": index},
+                "parts": message["parts"]
+            },
+            "append": False,
+            "lastChunk": True
+        }
+    
     async def _generate_qr_response(self, parsed_request: Dict[str, Any]) -> Dict[str, Any]:
         """Generate QR code and return A2A message"""
         try:
-            file_path, base64_img = self.qr_service.generate_qr_code(
+            output_format = OutputFormat(parsed_request.get("output_format", OutputFormat.PNG))
+            file_path, base64_img = await self.qr_service.generate_qr_code_async(
                 parsed_request["text"], 
-                parsed_request.get("size", 10)
+                parsed_request.get("size", 10),
+                output_format=output_format,
+                persist=False,
+                profile=parsed_request.get("profile") or A2A_PNG_PROFILE
             )
             
             return {
@@ -92,8 +287,8 @@ class A2AHandler:
                     },
                     {
                         "kind": "data",
-                        "data": f"data:image/png;base64,{base64_img}",
-                        "contentType": "image/png"
+                        "data": f"data:{output_format.mime_type};base64,{base64_img}",
+                        "contentType": output_format.mime_type
                     }
                 ],
                 "kind": "message",
@@ -115,9 +310,13 @@ class A2AHandler:
     async def _generate_barcode_response(self, parsed_request: Dict[str, Any]) -> Dict[str, Any]:
         """Generate barcode and return A2A message"""
         try:
-            file_path, base64_img = self.barcode_service.generate_barcode(
+            output_format = OutputFormat(parsed_request.get("output_format", OutputFormat.PNG))
+            file_path, base64_img = await self.barcode_service.generate_barcode_async(
                 parsed_request["text"],
-                parsed_request.get("format", "code128")
+                parsed_request.get("format", "code128"),
+                output_format=output_format,
+                persist=False,
+                profile=parsed_request.get("profile") or A2A_PNG_PROFILE
             )
             
             return {
@@ -129,8 +328,8 @@ class A2AHandler:
                     },
                     {
                         "kind": "data",
-                        "data": f"data:image/png;base64,{base64_img}",
-                        "contentType": "image/png"
+                        "data": f"data:{output_format.mime_type};base64,{base64_img}",
+                        "contentType": output_format.mime_type
                     }
                 ],
                 "kind": "message",
@@ -149,6 +348,20 @@ class A2AHandler:
                 "messageId": str(uuid.uuid4())
             }
     
+    def _error_message(self, text: str) -> Dict[str, Any]:
+        """Agent message reporting a failure"""
+        return {
+            "role": "agent",
+            "parts": [
+                {
+                    "kind": "text",
+                    "text": text
+                }
+            ],
+            "kind": "message",
+            "messageId": str(uuid.uuid4())
+        }
+    
     def _create_help_message(self) -> Dict[str, Any]:
         """Create help message response"""
         help_text = """🔧 QR & Barcode Generator Bot
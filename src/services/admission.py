@@ -0,0 +1,336 @@
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.services.render_executor import render_executor
+from src.services.render_scheduler import API, BULK, INTERACTIVE, PRIORITIES
+from src.utils.metrics import counter_lines, gauge_lines, registry
+
+DEFAULT_TENANT_RATE = 5.0  # tokens per second
+DEFAULT_TENANT_BURST = 20.0
+DEFAULT_COST_BYTES = 1024  # each started KiB of request costs one more token
+DEFAULT_MAX_TENANTS = 10000
+DEFAULT_MAX_QUEUED = 256
+DEFAULT_GROUP_MAX_QUEUED = {"a2a": 128, "api": 128}
+# Render priority classes whose queue counts against each endpoint group
+GROUP_PRIORITIES = {"a2a": (INTERACTIVE,), "api": (API, BULK)}
+DEFAULT_RETRY_AFTER = 1
+
+MAX_PARSED_BODY = 64 * 1024  # larger bodies are not parsed for a tenant id
+A2A_PATHS = ("/", "/a2a", "/a2a/agent/qrBarcodeAgent")
+TENANT_HEADERS = (b"x-telex-channel-id", b"x-channel-id", b"x-telex-user-id", b"x-user-id")
+
+ADMISSION_REJECTED_TOTAL = registry.counter(
+    "qrbar_admission_rejected_total",
+    "Requests refused by admission control",
+    ["endpoint", "reason"]
+)
+
+
+class TokenBucket:
+    """Refills at rate tokens per second up to burst; a request takes its cost in tokens"""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, cost: float, rate: float, burst: float, now: float) -> float:
+        """
+        Take cost tokens if available
+
+        Returns:
+            float: 0 when admitted, otherwise seconds until cost tokens are available
+        """
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / rate
+
+
+class AdmissionController:
+    """
+    Decides whether a request may start, before any work is done for it
+
+    Two checks run in order:
+
+    1. Shedding on queue depth: when the renders waiting for an executor slot
+       (in total, or in the priority classes of the endpoint group) reach
+       their limit, new requests fail at once with 503. This keeps queues
+       short, so admitted requests keep their latency. Requests that are in
+       flight but not rendering, such as open SSE or NDJSON streams, don't
+       count.
+    2. A token bucket per tenant (Telex channel, else user) and endpoint
+       group refuses a tenant that sends faster than its rate with 429. One
+       noisy channel cannot use the capacity meant for everyone else. Bigger
+       requests cost more tokens.
+
+    Both rejections carry Retry-After. The state lives in this process (one
+    per worker); it is only touched from the event loop.
+    """
+
+    def __init__(
+        self,
+        tenant_rate: float = DEFAULT_TENANT_RATE,
+        tenant_burst: float = DEFAULT_TENANT_BURST,
+        cost_bytes: int = DEFAULT_COST_BYTES,
+        max_queued: int = DEFAULT_MAX_QUEUED,
+        group_max_queued: Optional[Dict[str, int]] = None,
+        max_tenants: int = DEFAULT_MAX_TENANTS,
+        retry_after: int = DEFAULT_RETRY_AFTER,
+        enabled: bool = True,
+        queue_depth: Optional[Callable[[Tuple[str, ...]], int]] = None
+    ):
+        """
+        Args:
+            queue_depth: Renders waiting in the given priority classes (the
+                render executor's scheduler by default)
+        """
+        self.tenant_rate = tenant_rate
+        self.tenant_burst = tenant_burst
+        self.cost_bytes = cost_bytes
+        self.max_queued = max_queued
+        self.group_max_queued = dict(group_max_queued or DEFAULT_GROUP_MAX_QUEUED)
+        self.max_tenants = max_tenants
+        self.retry_after = retry_after
+        self.enabled = enabled
+        self.queue_depth = queue_depth or render_queue_depth
+
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self.in_flight = 0
+        self.group_in_flight = {group: 0 for group in self.group_max_queued}
+        self.admitted = {group: 0 for group in self.group_max_queued}
+        self.rejected = {group: {"rate_limited": 0, "overloaded": 0} for group in self.group_max_queued}
+
+    def group_of(self, method: str, path: str) -> Optional[str]:
+        """Endpoint group a request is admitted under, or None when it is exempt"""
+        if path in A2A_PATHS:
+            return "a2a" if method == "POST" else None
+        if path.startswith("/api/v1/") and not path.endswith("/stats") and path != "/api/v1/health":
+            return "api"
+        return None
+
+    def cost(self, body_bytes: int) -> float:
+        return 1 + body_bytes // self.cost_bytes
+
+    def check_capacity(self, group: str) -> Optional[int]:
+        """Return Retry-After seconds when the render queue, in total or for the group, is at its limit, else None"""
+        if (self.queue_depth(PRIORITIES) >= self.max_queued or
+                self.queue_depth(GROUP_PRIORITIES[group]) >= self.group_max_queued[group]):
+            self._reject(group, "overloaded")
+            return self.retry_after
+        return None
+
+    def check_tenant(self, group: str, tenant: str, cost: float) -> Optional[int]:
+        """Return Retry-After seconds when the tenant is over its rate, else None"""
+        now = time.monotonic()
+        key = (group, tenant)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.tenant_burst, now)
+            if len(self._buckets) > self.max_tenants:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        # A request bigger than the burst is charged the whole burst rather than refused forever
+        wait = bucket.take(min(cost, self.tenant_burst), self.tenant_rate, self.tenant_burst, now)
+        if wait:
+            self._reject(group, "rate_limited")
+            return max(1, math.ceil(wait))
+        return None
+
+    def _reject(self, group: str, reason: str) -> None:
+        self.rejected[group][reason] += 1
+        ADMISSION_REJECTED_TOTAL.inc(endpoint=group, reason=reason)
+
+    def enter(self, group: str) -> None:
+        self.in_flight += 1
+        self.group_in_flight[group] += 1
+        self.admitted[group] += 1
+
+    def leave(self, group: str) -> None:
+        self.in_flight -= 1
+        self.group_in_flight[group] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return limits, queued renders, requests in flight, tenants being throttled and rejection counters"""
+        now = time.monotonic()
+        throttled = sum(
+            1 for bucket in self._buckets.values()
+            if min(self.tenant_burst, bucket.tokens + (now - bucket.updated) * self.tenant_rate) < 1
+        )
+        return {
+            "enabled": self.enabled,
+            "tenant_rate": self.tenant_rate,
+            "tenant_burst": self.tenant_burst,
+            "cost_bytes": self.cost_bytes,
+            "in_flight": self.in_flight,
+            "queued": self.queue_depth(PRIORITIES),
+            "max_queued": self.max_queued,
+            "groups": {
+                group: {
+                    "in_flight": self.group_in_flight[group],
+                    "queued": self.queue_depth(GROUP_PRIORITIES[group]),
+                    "max_queued": limit,
+                    "admitted": self.admitted[group],
+                    "rejected": dict(self.rejected[group])
+                }
+                for group, limit in self.group_max_queued.items()
+            },
+            "tenants": len(self._buckets),
+            "tenants_throttled": throttled
+        }
+
+    def metric_lines(self) -> List[str]:
+        """In-flight gauge and tracked tenants, for registry.register_collector"""
+        return (
+            gauge_lines("qrbar_admission_in_flight", "Requests admitted and not yet finished", self.in_flight) +
+            gauge_lines("qrbar_admission_tenants", "Tenants with a token bucket", len(self._buckets)) +
+            counter_lines("qrbar_admission_admitted_total", "Requests admitted", sum(self.admitted.values()))
+        )
+
+
+def render_queue_depth(priorities: Tuple[str, ...]) -> int:
+    """Renders waiting for a slot of the shared render executor"""
+    return render_executor.scheduler.waiting(priorities)
+
+
+def tenant_from_body(body: Any) -> Optional[str]:
+    """Channel or user id of a Telex message or an A2A JSON-RPC request (the first of a batch)"""
+    if isinstance(body, list):
+        body = body[0] if body else None
+    if not isinstance(body, dict):
+        return None
+    params = body.get("params")
+    message = params.get("message") if isinstance(params, dict) else None
+    metadata = message.get("metadata") if isinstance(message, dict) else None
+    for source in (body, metadata if isinstance(metadata, dict) else {}):
+        for field, kind in (("channel_id", "channel"), ("telex_channel_id", "channel"), ("user_id", "user"), ("telex_user_id", "user")):
+            if source.get(field):
+                return f"{kind}:{source[field]}"
+    if isinstance(message, dict) and message.get("contextId"):
+        return f"context:{message['contextId']}"
+    return None
+
+
+def tenant_from_headers(headers: Dict[bytes, bytes]) -> Optional[str]:
+    """Channel or user id sent in a Telex header"""
+    for name in TENANT_HEADERS:
+        if headers.get(name):
+            kind = "channel" if b"channel" in name else "user"
+            return f"{kind}:{headers[name].decode('latin-1')}"
+    return None
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying an AdmissionController to A2A and /api/v1 requests
+
+    The capacity check runs before the body is read, so shedding costs almost
+    nothing. A2A bodies (up to 64 KiB) are read once to find the channel or
+    user and replayed to the application.
+    """
+
+    def __init__(self, app, controller: Optional["AdmissionController"] = None):
+        self.app = app
+        self.controller = controller or admission_controller
+
+    async def __call__(self, scope, receive, send):
+        controller = self.controller
+        if scope["type"] != "http" or not controller.enabled:
+            await self.app(scope, receive, send)
+            return
+        group = controller.group_of(scope["method"], scope["path"])
+        if group is None:
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = controller.check_capacity(group)
+        if retry_after is not None:
+            await self._refuse(send, 503, "Service overloaded, retry later", retry_after)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        try:
+            body_bytes = int(headers.get(b"content-length", b"0"))
+        except ValueError:
+            body_bytes = 0
+        tenant = None
+        if group == "a2a" and 0 < body_bytes <= MAX_PARSED_BODY:
+            body, receive = await self._buffer(receive)
+            body_bytes = len(body)
+            try:
+                tenant = tenant_from_body(json.loads(body))
+            except ValueError:
+                pass  # The endpoint reports malformed bodies
+        tenant = tenant or tenant_from_headers(headers)
+
+        # Anonymous requests (often many clients behind one proxy) are only subject to shedding
+        if tenant is not None:
+            retry_after = controller.check_tenant(group, tenant, controller.cost(body_bytes))
+            if retry_after is not None:
+                await self._refuse(send, 429, "Too many requests for this channel, slow down", retry_after)
+                return
+
+        controller.enter(group)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.leave(group)
+
+    async def _buffer(self, receive):
+        """Read the whole request body and return it with a receive callable that replays it"""
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return body, replay
+
+    async def _refuse(self, send, status: int, detail: str, retry_after: int) -> None:
+        body = json.dumps({"detail": detail, "retry_after": retry_after}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode())
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# Shared by every request of this process (ADMISSION_ENABLED=0 turns it off)
+admission_controller = AdmissionController(
+    tenant_rate=float(os.getenv("ADMISSION_TENANT_RATE", DEFAULT_TENANT_RATE)),
+    tenant_burst=float(os.getenv("ADMISSION_TENANT_BURST", DEFAULT_TENANT_BURST)),
+    cost_bytes=int(os.getenv("ADMISSION_COST_BYTES", DEFAULT_COST_BYTES)),
+    max_queued=int(os.getenv("ADMISSION_MAX_QUEUED", DEFAULT_MAX_QUEUED)),
+    group_max_queued={
+        "a2a": int(os.getenv("ADMISSION_A2A_MAX_QUEUED", DEFAULT_GROUP_MAX_QUEUED["a2a"])),
+        "api": int(os.getenv("ADMISSION_API_MAX_QUEUED", DEFAULT_GROUP_MAX_QUEUED["api"]))
+    },
+    max_tenants=int(os.getenv("ADMISSION_MAX_TENANTS", DEFAULT_MAX_TENANTS)),
+    retry_after=int(os.getenv("ADMISSION_RETRY_AFTER", DEFAULT_RETRY_AFTER)),
+    enabled=os.getenv("ADMISSION_ENABLED", "1") == "1"
+)
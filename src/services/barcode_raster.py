@@ -0,0 +1,176 @@
+import functools
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import barcode as barcode_lib
+import numpy as np
+from PIL import ImageFont
+
+from src.utils.metrics import stage, stage_labels
+from src.utils.png_encoder import bilevel_scanlines, png_from_scanlines, DEFAULT_COMPRESS_LEVEL
+
+# Quiet zones (left, right) in modules, per GS1 / ISO 15417
+QUIET_ZONES: Dict[str, Tuple[int, int]] = {
+    "ean13": (11, 7),
+    "ean8": (7, 7),
+    "upc": (9, 9),
+    "code128": (10, 10)
+}
+
+# Module ranges of the start, centre and end guard patterns, whose bars extend below the others
+GUARD_RANGES: Dict[str, List[Tuple[int, int]]] = {
+    "ean13": [(0, 3), (45, 50), (92, 95)],
+    "ean8": [(0, 3), (31, 36), (64, 67)],
+    "upc": [(0, 3), (45, 50), (92, 95)]
+}
+
+FORMAT_ALIASES = {"ean": "ean13", "upca": "upc"}
+
+# Label font shipped with python-barcode, the one ImageWriter uses
+FONT_PATH = os.path.join(os.path.dirname(barcode_lib.__file__), "fonts", "DejaVuSansMono.ttf")
+
+# Layout in pixels. Modules are a whole number of pixels so every bar keeps its width in a
+# 1-bit image; ImageWriter's 0.2-0.33 mm modules at 300 dpi alternate between 2 and 4 px.
+MODULE_WIDTH = 2
+BAR_HEIGHT = 100
+GUARD_EXTENSION = 10
+MARGIN = 10
+TEXT_GAP = 4
+FONT_SIZE = 20
+
+
+def canonical_format(format_type: str) -> str:
+    """Normalize a format name to a key of QUIET_ZONES"""
+    format_type = str(format_type).lower()
+    return FORMAT_ALIASES.get(format_type, format_type)
+
+
+def supports_format(format_type: str) -> bool:
+    """True when the raster engine can draw this symbology"""
+    return canonical_format(format_type) in QUIET_ZONES
+
+
+def encode_modules(text: str, format_type: str) -> Tuple[str, str]:
+    """
+    Run the python-barcode encoder and return (module_pattern, human_readable_text)
+
+    The pattern is a string of "0"/"1", one character per module.
+    """
+    barcode_class = barcode_lib.get_barcode_class(canonical_format(format_type))
+    with stage("encode"):
+        code = barcode_class(text)
+        return code.build()[0].replace("G", "1"), code.get_fullcode()
+
+
+def guard_mask(format_type: str, length: int) -> np.ndarray:
+    """Boolean mask of the modules that belong to guard patterns"""
+    mask = np.zeros(length, dtype=bool)
+    for start, end in GUARD_RANGES.get(canonical_format(format_type), []):
+        mask[start:end] = True
+    return mask
+
+
+@functools.lru_cache(maxsize=4)
+def _font(size: int) -> ImageFont.ImageFont:
+    """Load the label font once per size"""
+    try:
+        return ImageFont.truetype(FONT_PATH, size)
+    except OSError:
+        return ImageFont.load_default(size=size)
+
+
+def _text_rows(text: str, width: int) -> np.ndarray:
+    """Rasterize a centred 1-bit text strip (True = light)"""
+    mask = _font(FONT_SIZE).getmask(text)
+    glyph_width, glyph_height = mask.size
+    glyphs = np.asarray(mask, dtype=np.uint8).reshape(glyph_height, glyph_width) < 128
+
+    strip = np.ones((FONT_SIZE + TEXT_GAP, width), dtype=bool)
+    left = max(0, (width - glyph_width) // 2)
+    visible = min(glyph_width, width - left)
+    strip[TEXT_GAP:TEXT_GAP + glyph_height, left:left + visible] = glyphs[:FONT_SIZE, :visible]
+    return strip
+
+
+def rasterize_patterns(dark: np.ndarray, format_type: str) -> np.ndarray:
+    """
+    Rasterize module patterns of equal length into bar images
+
+    Each pattern is widened once into a single pixel row, which is then
+    broadcast to the full bar height; guard bars get a second row for their
+    extension below the others.
+
+    Args:
+        dark: (N, modules) bool array, True for bars
+        format_type: Symbology name
+
+    Returns:
+        np.ndarray: (N, height, width) bool array, True for light pixels
+    """
+    count, modules = dark.shape
+    left_quiet, right_quiet = QUIET_ZONES[canonical_format(format_type)]
+    width = (left_quiet + modules + right_quiet) * MODULE_WIDTH
+    bar_start = left_quiet * MODULE_WIDTH
+    bar_end = bar_start + modules * MODULE_WIDTH
+
+    rows = np.ones((count, width), dtype=bool)
+    rows[:, bar_start:bar_end] = ~np.repeat(dark, MODULE_WIDTH, axis=1)
+
+    guards = guard_mask(format_type, modules)
+    guard_rows = np.ones((count, width), dtype=bool)
+    guard_rows[:, bar_start:bar_end] = ~np.repeat(dark & guards, MODULE_WIDTH, axis=1)
+
+    return np.concatenate([
+        np.ones((count, MARGIN, width), dtype=bool),
+        np.broadcast_to(rows[:, None, :], (count, BAR_HEIGHT, width)),
+        np.broadcast_to(guard_rows[:, None, :], (count, GUARD_EXTENSION, width))
+    ], axis=1)
+
+
+def render_linear_png(text: str, format_type: str, compress_level: int = DEFAULT_COMPRESS_LEVEL, profile: Optional[str] = None) -> bytes:
+    """
+    Render one linear barcode with its human-readable text to a 1-bit PNG
+
+    Args:
+        text: Already validated text to encode
+        format_type: code128, ean13, ean8 or upc
+        compress_level: zlib level 0-9
+        profile: PNG_PROFILES name, overriding compress_level
+
+    Returns:
+        bytes: PNG image
+    """
+    with stage_labels(symbology=canonical_format(format_type), size_bucket="linear"):
+        pattern, label = encode_modules(text, format_type)
+        with stage("rasterize"):
+            dark = (np.frombuffer(pattern.encode("ascii"), dtype=np.uint8) == ord("1"))[None, :]
+            image = rasterize_patterns(dark, format_type)[0]
+
+            width = image.shape[1]
+            light = np.concatenate([
+                image,
+                _text_rows(label, width),
+                np.ones((MARGIN, width), dtype=bool)
+            ])
+            raw = bilevel_scanlines(light)
+        with stage("compress"):
+            return png_from_scanlines(raw, width, light.shape[0], compress_level, profile)
+
+
+def render_linear_batch(texts: Sequence[str], format_type: str) -> np.ndarray:
+    """
+    Render many fixed-width codes (EAN-13, EAN-8, UPC-A) into one array in a single call
+
+    Args:
+        texts: Already validated texts, all of the same symbology
+        format_type: ean13, ean8 or upc
+
+    Returns:
+        np.ndarray: (N, height, width) bool array, True for light pixels
+    """
+    if canonical_format(format_type) not in GUARD_RANGES:
+        raise ValueError(f"Batch rasterization needs a fixed-width symbology, got {format_type}")
+
+    patterns = "".join(encode_modules(text, format_type)[0] for text in texts)
+    dark = np.frombuffer(patterns.encode("ascii"), dtype=np.uint8).reshape(len(texts), -1) == ord("1")
+    return rasterize_patterns(dark, format_type)
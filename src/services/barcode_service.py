@@ -1,98 +1,209 @@
+import barcode as barcode_lib
 from barcode import Code128, EAN13, EAN8, UPCA
 from barcode.writer import ImageWriter
 import io
-import base64
-import uuid
-import os
 from typing import Optional
-from src.models.request_models import BarcodeFormat
+from src.models.request_models import DEFAULT_PNG_PROFILE, BarcodeFormat, OutputFormat, PngProfile
+from src.services.barcode_raster import guard_mask, render_linear_png, supports_format
+from src.services.render_cache import make_render_key
+from src.services.render_pipeline import persist_sink, render_pipeline, cache_sink
+from src.utils.metrics import stage, stage_labels
+from src.utils.svg_builder import modules_to_path, svg_document, svg_text
+
+BARCODE_CLASSES = {
+    BarcodeFormat.CODE128: Code128,
+    BarcodeFormat.EAN13: EAN13,
+    BarcodeFormat.EAN8: EAN8,
+    BarcodeFormat.UPC: UPCA
+}
+
+def render_barcode_png(text: str, format_type: str = BarcodeFormat.CODE128.value, profile: PngProfile = DEFAULT_PNG_PROFILE) -> bytes:
+    """
+    Encode already validated text as a barcode and return the PNG bytes
+    
+    CODE128, EAN13, EAN8 and UPC are drawn by the vectorized raster engine;
+    any other python-barcode name falls back to ImageWriter (which ignores profile).
+    
+    Args:
+        text: Text to encode
+        format_type: Any barcode name known to python-barcode
+        profile: PNG encoding profile: "fast", "balanced" or "small" (PNG_PROFILE)
+        
+    Returns:
+        bytes: PNG image
+    """
+    if supports_format(format_type):
+        return render_linear_png(text, format_type, profile=profile)
+    return render_barcode_png_imagewriter(text, format_type)
+
+def render_barcode_png_imagewriter(text: str, format_type: str = BarcodeFormat.CODE128.value) -> bytes:
+    """Reference PNG path through python-barcode's ImageWriter (PIL ImageDraw and a TrueType font)"""
+    barcode_class = barcode_lib.get_barcode_class(str(format_type).lower())
+    # ImageWriter encodes, draws and compresses in one call
+    with stage("rasterize", symbology=str(format_type).lower(), size_bucket="linear"):
+        barcode = barcode_class(text, writer=ImageWriter())
+        
+        buffer = io.BytesIO()
+        barcode.write(buffer)
+        return buffer.getvalue()
+
+# SVG layout in module units, proportioned like ImageWriter's defaults
+SVG_QUIET_ZONE = 11
+SVG_BAR_HEIGHT = 60
+SVG_GUARD_EXTENSION = 5
+SVG_FONT_SIZE = 12
+SVG_MODULE_PIXELS = 2
+
+def render_barcode_svg(text: str, format_type: str = BarcodeFormat.CODE128.value) -> bytes:
+    """
+    Encode already validated text as a barcode and return SVG bytes built from the bar pattern
+    
+    Args:
+        text: Text to encode
+        format_type: Any barcode name known to python-barcode
+        
+    Returns:
+        bytes: SVG image
+    """
+    barcode_class = barcode_lib.get_barcode_class(str(format_type).lower())
+    with stage_labels(symbology=str(format_type).lower(), size_bucket="linear"):
+        with stage("encode"):
+            barcode = barcode_class(text)
+            modules = barcode.build()[0]
+        
+        with stage("vectorize"):
+            # Guard bars extend below the others, as in the PNG raster engine
+            dark = [m in "1G" for m in modules]
+            guard_modules = guard_mask(format_type, len(modules))
+            bars = modules_to_path([dark], x_offset=SVG_QUIET_ZONE, row_height=SVG_BAR_HEIGHT)
+            guards = modules_to_path([[d and g for d, g in zip(dark, guard_modules)]], x_offset=SVG_QUIET_ZONE, y_offset=SVG_BAR_HEIGHT, row_height=SVG_GUARD_EXTENSION)
+            
+            width = len(modules) + 2 * SVG_QUIET_ZONE
+            text_y = SVG_BAR_HEIGHT + SVG_GUARD_EXTENSION + SVG_FONT_SIZE
+            label = svg_text(width / 2, text_y, barcode.get_fullcode(), SVG_FONT_SIZE)
+            return svg_document(width, text_y + SVG_FONT_SIZE / 2, bars + guards, scale=SVG_MODULE_PIXELS, extra=label)
+
+BARCODE_RENDERERS = {
+    OutputFormat.PNG: render_barcode_png,
+    OutputFormat.SVG: render_barcode_svg
+}
+
+def validate_barcode_text(text: str, format_type: BarcodeFormat) -> str:
+    """Validate and format text based on barcode type"""
+    if format_type == BarcodeFormat.EAN13:
+        # EAN13 needs 12 digits (13th is checksum)
+        digits = ''.join(filter(str.isdigit, text))
+        if len(digits) < 12:
+            digits = digits.ljust(12, '0')
+        return digits[:12]
+    
+    elif format_type == BarcodeFormat.EAN8:
+        # EAN8 needs 7 digits (8th is checksum)
+        digits = ''.join(filter(str.isdigit, text))
+        if len(digits) < 7:
+            digits = digits.ljust(7, '0')
+        return digits[:7]
+    
+    elif format_type == BarcodeFormat.UPC:
+        # UPC needs 11 digits (12th is checksum)
+        digits = ''.join(filter(str.isdigit, text))
+        if len(digits) < 11:
+            digits = digits.ljust(11, '0')
+        return digits[:11]
+    
+    # CODE128 can handle any text
+    return text
+
+def prepare_barcode(text: str, format_type: BarcodeFormat) -> tuple[str, str]:
+    """Return (validated_text, symbology), falling back to CODE128 for unknown formats"""
+    validated_text = validate_barcode_text(text, format_type)
+    symbology = BarcodeFormat(format_type).value if format_type in BARCODE_CLASSES else BarcodeFormat.CODE128.value
+    return validated_text, symbology
 
 class BarcodeService:
     """Service class for barcode generation following Single Responsibility Principle"""
     
     def __init__(self, output_dir: str = "static/images"):
         self.output_dir = output_dir
-        os.makedirs(output_dir, exist_ok=True)
+        # Images are persisted to the pack store and served from /static/images
+        self.persist_sink = persist_sink(output_dir)
         
         # Barcode format mapping
-        self.format_map = {
-            BarcodeFormat.CODE128: Code128,
-            BarcodeFormat.EAN13: EAN13,
-            BarcodeFormat.EAN8: EAN8,
-            BarcodeFormat.UPC: UPCA
-        }
+        self.format_map = BARCODE_CLASSES
     
-    def generate_barcode(self, text: str, format_type: BarcodeFormat = BarcodeFormat.CODE128) -> tuple[str, str]:
+    def generate_barcode(self, text: str, format_type: BarcodeFormat = BarcodeFormat.CODE128, use_cache: bool = True, output_format: OutputFormat = OutputFormat.PNG, persist: bool = True, profile: PngProfile = DEFAULT_PNG_PROFILE) -> tuple[Optional[str], str]:
         """
         Generate barcode and return file path and base64 string
         
         Args:
             text: Text to encode
             format_type: Barcode format
+            use_cache: Reuse a previously rendered image when available
+            output_format: PNG or SVG
+            persist: Also persist the image, served from output_dir (in the background)
+            profile: PNG encoding profile (fast, balanced or small)
             
         Returns:
-            tuple: (file_path, base64_string)
+            tuple: (file_path or None when not persisted, base64_string)
         """
         try:
-            # Get barcode class
-            barcode_class = self.format_map.get(format_type, Code128)
-            
-            # Validate text for specific formats
-            validated_text = self._validate_text_for_format(text, format_type)
-            
-            # Create barcode
-            barcode = barcode_class(validated_text, writer=ImageWriter())
+            output_format = OutputFormat(output_format)
+            validated_text, symbology = self._prepare(text, format_type)
+            artifact = render_pipeline.render_sync(
+                make_render_key(validated_text, symbology, output_format=output_format.value, profile=PngProfile(profile).value), output_format, "barcode",
+                BARCODE_RENDERERS[output_format], validated_text, symbology,
+                use_cache=use_cache,
+                sinks=self._sinks(use_cache, persist),
+                profile=profile
+            )
+            return artifact.file_path, artifact.base64
             
-            # Generate unique filename
-            filename = f"barcode_{uuid.uuid4().hex[:8]}"
-            file_path = os.path.join(self.output_dir, filename)
-            
-            # Save barcode
-            barcode.save(file_path)
-            full_path = f"{file_path}.png"
-            
-            # Convert to base64
-            with open(full_path, 'rb') as img_file:
-                img_base64 = base64.b64encode(img_file.read()).decode()
+        except Exception as e:
+            raise Exception(f"Barcode generation failed: {str(e)}")
+    
+    async def generate_barcode_async(self, text: str, format_type: BarcodeFormat = BarcodeFormat.CODE128, use_cache: bool = True, output_format: OutputFormat = OutputFormat.PNG, persist: bool = True, profile: PngProfile = DEFAULT_PNG_PROFILE) -> tuple[Optional[str], str]:
+        """
+        Generate barcode on the render executor without blocking the event loop
+        
+        Args:
+            text: Text to encode
+            format_type: Barcode format
+            use_cache: Reuse a previously rendered image when available
+            output_format: PNG or SVG
+            persist: Also persist the image, served from output_dir (in the background)
+            profile: PNG encoding profile (fast, balanced or small)
             
-            return full_path, img_base64
+        Returns:
+            tuple: (file_path or None when not persisted, base64_string)
+        """
+        try:
+            output_format = OutputFormat(output_format)
+            validated_text, symbology = self._prepare(text, format_type)
+            artifact = await render_pipeline.render(
+                make_render_key(validated_text, symbology, output_format=output_format.value, profile=PngProfile(profile).value), output_format, "barcode",
+                BARCODE_RENDERERS[output_format], validated_text, symbology,
+                use_cache=use_cache,
+                sinks=self._sinks(use_cache, persist),
+                profile=profile
+            )
+            return artifact.file_path, artifact.base64
             
         except Exception as e:
             raise Exception(f"Barcode generation failed: {str(e)}")
     
+    def _prepare(self, text: str, format_type: BarcodeFormat) -> tuple[str, str]:
+        """Return (validated_text, symbology), falling back to CODE128 for unknown formats"""
+        return prepare_barcode(text, format_type)
+    
+    def _sinks(self, use_cache: bool, persist: bool) -> list:
+        """Sinks for one render: the cache store and, when a file is wanted, disk"""
+        sinks = []
+        if use_cache:
+            sinks.append(cache_sink)
+        if persist:
+            sinks.append(self.persist_sink)
+        return sinks
+    
     def _validate_text_for_format(self, text: str, format_type: BarcodeFormat) -> str:
         """Validate and format text based on barcode type"""
-        if format_type == BarcodeFormat.EAN13:
-            # EAN13 needs 12 digits (13th is checksum)
-            digits = ''.join(filter(str.isdigit, text))
-            if len(digits) < 12:
-                digits = digits.ljust(12, '0')
-            return digits[:12]
-        
-        elif format_type == BarcodeFormat.EAN8:
-            # EAN8 needs 7 digits (8th is checksum)
-            digits = ''.join(filter(str.isdigit, text))
-            if len(digits) < 7:
-                digits = digits.ljust(7, '0')
-            return digits[:7]
-        
-        elif format_type == BarcodeFormat.UPC:
-            # UPC needs 11 digits (12th is checksum)
-            digits = ''.join(filter(str.isdigit, text))
-            if len(digits) < 11:
-                digits = digits.ljust(11, '0')
-            return digits[:11]
-        
-        # CODE128 can handle any text
-        return text
-    
-    def cleanup_old_files(self, max_files: int = 100):
-        """Clean up old barcode files to prevent storage overflow"""
-        try:
-            files = [f for f in os.listdir(self.output_dir) if f.startswith('barcode_')]
-            if len(files) > max_files:
-                files.sort(key=lambda x: os.path.getctime(os.path.join(self.output_dir, x)))
-                for file in files[:-max_files]:
-                    os.remove(os.path.join(self.output_dir, file))
-        except Exception:
-            pass  # Silent cleanup failure
\ No newline at end of file
+        return validate_barcode_text(text, format_type)
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+# A JSON array is parsed whole before the first item renders; larger batches must use NDJSON
+MAX_JSON_BATCH_BYTES = int(os.getenv("BATCH_MAX_JSON_BYTES", str(8 * 1024 * 1024)))
+
+
+async def iter_json_items(items: Iterable[Any]) -> AsyncIterator[Any]:
+    """Adapt an already parsed JSON array to the async item source used by stream_batch"""
+    for item in items:
+        yield item
+
+
+async def iter_ndjson_lines(body: bytes) -> AsyncIterator[str]:
+    """
+    Yield the lines of an NDJSON body one at a time
+
+    The body has to be read before the streamed response starts (the response
+    listens for client disconnects on the same receive channel), but lines are
+    decoded lazily so only the raw bytes are held, never the parsed items.
+
+    Args:
+        body: Raw request body
+
+    Yields:
+        str: Each non-blank line
+    """
+    start = 0
+    length = len(body)
+    while start < length:
+        end = body.find(b"\n", start)
+        if end == -1:
+            end = length
+        line = body[start:end]
+        start = end + 1
+        if line.strip():
+            yield line.decode("utf-8", errors="replace")
+
+
+async def _run_item(index: int, item: Any, render_item: Callable[[Any], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Render one item, turning any failure into an inline error result"""
+    try:
+        if isinstance(item, str):
+            item = json.loads(item)  # NDJSON line, parsed first so a failed item keeps its id
+        result = await render_item(item)
+        return {"index": index, "success": True, **result}
+    except Exception as e:
+        item_id = item.get("id") if isinstance(item, dict) else None
+        return {"index": index, "id": item_id, "success": False, "error": str(e)}
+
+
+async def stream_batch(
+    items: AsyncIterator[Any],
+    render_item: Callable[[Any], Awaitable[Dict[str, Any]]],
+    concurrency: int
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Render batch items concurrently and yield each result as soon as it is ready
+
+    At most `concurrency` items are in flight, so memory stays flat no matter
+    how long the batch is. Results carry their input `index` because they are
+    yielded in completion order.
+
+    Args:
+        items: Async source of raw items (dicts or NDJSON lines)
+        render_item: Coroutine validating and rendering one parsed item
+        concurrency: Maximum number of items rendered at once
+
+    Yields:
+        dict: One result per item, with "success" and either the image or "error"
+    """
+    pending = set()
+    index = 0
+    try:
+        async for item in items:
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+            pending.add(asyncio.ensure_future(_run_item(index, item, render_item)))
+            index += 1
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # Client went away or the source failed: don't leave renders running
+        for task in pending:
+            task.cancel()
+        logger.info(f"Batch finished after {index} items")
+
+
+async def stream_ndjson(results: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """Serialize batch results as NDJSON lines"""
+    async for result in results:
+        yield json.dumps(result) + "\n"
@@ -0,0 +1,385 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from src.utils.metrics import gauge_lines, registry
+from src.utils.telex_client import TelexClient
+
+logger = logging.getLogger(__name__)
+
+OUTBOUND_MESSAGES_TOTAL = registry.counter("qrbar_outbound_messages_total", "Outbound Telex messages by outcome", ["outcome"])
+
+
+class OutboundQueueFull(Exception):
+    """Raised when both the in-memory queue and the spill file are full; callers should back off"""
+
+
+class OutboundMessage:
+    """One message waiting for delivery"""
+
+    __slots__ = ("channel_id", "message", "image_data", "attempts", "enqueued_at", "spill_id")
+
+    def __init__(self, channel_id: str, message: str, image_data: Optional[str] = None, attempts: int = 0,
+                 enqueued_at: Optional[float] = None, spill_id: Optional[int] = None):
+        self.channel_id = channel_id
+        self.message = message
+        self.image_data = image_data
+        self.attempts = attempts
+        self.enqueued_at = enqueued_at if enqueued_at is not None else time.time()
+        self.spill_id = spill_id
+
+
+def coalesce(messages: List[OutboundMessage]) -> List[List[OutboundMessage]]:
+    """
+    Group one channel's messages into deliveries
+
+    Consecutive texts are merged; a webhook payload carries at most one
+    image, so each image closes the delivery holding the texts before it.
+
+    Args:
+        messages: Messages for a single channel, oldest first
+
+    Returns:
+        list: Deliveries, each a list of messages sent as one POST
+    """
+    deliveries, current = [], []
+    for message in messages:
+        current.append(message)
+        if message.image_data:
+            deliveries.append(current)
+            current = []
+    if current:
+        deliveries.append(current)
+    return deliveries
+
+
+class SpillStore:
+    """Durable FIFO of undelivered messages in a SQLite file (WAL journal)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbound ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, channel_id TEXT NOT NULL, message TEXT NOT NULL, "
+            "image_data TEXT, attempts INTEGER NOT NULL DEFAULT 0, enqueued_at REAL NOT NULL)"
+        )
+        self.count = self._db.execute("SELECT COUNT(*) FROM outbound").fetchone()[0]
+
+    def push(self, messages: List[OutboundMessage]) -> None:
+        with self._lock:
+            self._db.execute("BEGIN")
+            for message in messages:
+                if message.spill_id is None:
+                    cursor = self._db.execute(
+                        "INSERT INTO outbound (channel_id, message, image_data, attempts, enqueued_at) VALUES (?, ?, ?, ?, ?)",
+                        (message.channel_id, message.message, message.image_data, message.attempts, message.enqueued_at)
+                    )
+                    message.spill_id = cursor.lastrowid
+                    self.count += 1
+                else:
+                    # Already on disk: only the attempt counter changes
+                    self._db.execute("UPDATE outbound SET attempts = ? WHERE id = ?", (message.attempts, message.spill_id))
+            self._db.execute("COMMIT")
+
+    def peek(self, limit: int) -> List[OutboundMessage]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, channel_id, message, image_data, attempts, enqueued_at FROM outbound ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        return [OutboundMessage(channel_id, message, image_data, attempts, enqueued_at, spill_id)
+                for spill_id, channel_id, message, image_data, attempts, enqueued_at in rows]
+
+    def delete(self, messages: List[OutboundMessage]) -> None:
+        ids = [(message.spill_id,) for message in messages if message.spill_id is not None]
+        if not ids:
+            return
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("DELETE FROM outbound WHERE id = ?", ids)
+            self._db.execute("COMMIT")
+            self.count = self._db.execute("SELECT COUNT(*) FROM outbound").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class OutboundQueue:
+    """
+    Delivery queue in front of TelexClient
+
+    Messages are held in a bounded in-memory queue and delivered by one
+    background task, which coalesces messages to the same channel that
+    arrive within a short window. When memory is full or the webhook is
+    failing, messages spill to SQLite and are drained, oldest first, once
+    deliveries succeed again. The first message to spill takes the memory
+    backlog to disk ahead of it, and once anything is on disk new messages
+    follow it there, so per-channel order is kept.
+    """
+
+    def __init__(
+        self,
+        client: TelexClient,
+        spill_path: Optional[str] = None,
+        max_memory: Optional[int] = None,
+        max_spill: Optional[int] = None,
+        coalesce_window: Optional[float] = None,
+        max_batch: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        retry_backoff_max: float = 60.0
+    ):
+        """
+        Args:
+            client: Client used for delivery
+            spill_path: SQLite spill file (OUTBOUND_SPILL_PATH)
+            max_memory: Messages held in memory before spilling (OUTBOUND_MAX_MEMORY)
+            max_spill: Messages held on disk before enqueue raises OutboundQueueFull (OUTBOUND_MAX_SPILL)
+            coalesce_window: Seconds to wait for more messages to the same channel (OUTBOUND_COALESCE_WINDOW)
+            max_batch: Messages taken per drain round (OUTBOUND_MAX_BATCH)
+            max_attempts: Failed deliveries before a message is dropped (OUTBOUND_MAX_ATTEMPTS)
+            retry_backoff_max: Longest pause between drain rounds while the webhook is failing
+        """
+        self.client = client
+        self.max_memory = max_memory or int(os.getenv("OUTBOUND_MAX_MEMORY", "1000"))
+        self.max_spill = max_spill or int(os.getenv("OUTBOUND_MAX_SPILL", "100000"))
+        self.coalesce_window = coalesce_window if coalesce_window is not None else float(os.getenv("OUTBOUND_COALESCE_WINDOW", "0.05"))
+        self.max_batch = max_batch or int(os.getenv("OUTBOUND_MAX_BATCH", "100"))
+        self.max_attempts = max_attempts or int(os.getenv("OUTBOUND_MAX_ATTEMPTS", "10"))
+        self.retry_backoff_max = retry_backoff_max
+        self.spill = SpillStore(spill_path or os.getenv("OUTBOUND_SPILL_PATH", "data/outbound.sqlite3"))
+
+        self._memory: Deque[OutboundMessage] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._consecutive_failures = 0
+        # Held while a batch taken from memory is out for delivery, since its failures go back to disk
+        self._memory_drain = asyncio.Lock()
+
+        self.enqueued = 0
+        self.spilled = 0
+        self.delivered = 0
+        self.deliveries = 0
+        self.failed_deliveries = 0
+        self.dropped = 0
+
+    @property
+    def webhook_up(self) -> bool:
+        return self._consecutive_failures == 0
+
+    def _memory_open(self) -> bool:
+        return len(self._memory) < self.max_memory and self.spill.count == 0 and self.webhook_up
+
+    @property
+    def pressure(self) -> float:
+        """Fill level from 0 (empty) to 1 (enqueue will raise)"""
+        return max(len(self._memory) / self.max_memory, self.spill.count / self.max_spill)
+
+    async def enqueue(self, channel_id: str, message: str, image_data: Optional[str] = None) -> str:
+        """
+        Queue a message for delivery
+
+        Args:
+            channel_id: Target channel ID
+            message: Text message
+            image_data: Optional base64 image data
+
+        Returns:
+            str: "memory" or "spilled" (already durable; a sign of pressure)
+
+        Raises:
+            OutboundQueueFull: Memory and spill file are both full
+        """
+        outbound = OutboundMessage(channel_id, message, image_data)
+
+        if self._memory_open():
+            self.enqueued += 1
+            self._memory.append(outbound)
+            self._wake()
+            return "memory"
+
+        # A batch out for delivery may come back as retries, which have to reach the file first
+        async with self._memory_drain:
+            if self._memory_open():
+                self.enqueued += 1
+                self._memory.append(outbound)
+                self._wake()
+                return "memory"
+
+            if self.spill.count + len(self._memory) >= self.max_spill:
+                OUTBOUND_MESSAGES_TOTAL.inc(outcome="rejected")
+                raise OutboundQueueFull(f"Outbound queue full ({len(self._memory)} in memory, {self.spill.count} spilled)")
+
+            # Older messages still in memory go to disk ahead of this one
+            backlog = list(self._memory) + [outbound]
+            self._memory.clear()
+            self.enqueued += 1
+            await asyncio.get_running_loop().run_in_executor(None, self.spill.push, backlog)
+        self.spilled += len(backlog)
+        OUTBOUND_MESSAGES_TOTAL.inc(len(backlog), outcome="spilled")
+        self._wake()
+        return "spilled"
+
+    def _wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _deliver(self, batch: List[OutboundMessage]) -> bool:
+        """POST one coalesced delivery"""
+        text = "\n".join(message.message for message in batch)
+        image = next((message.image_data for message in batch if message.image_data), None)
+        self.deliveries += 1
+        return await self.client.send_message(batch[0].channel_id, text, image)
+
+    async def _deliver_channel(self, messages: List[OutboundMessage]) -> Tuple[List[OutboundMessage], List[OutboundMessage]]:
+        """Deliver one channel's messages in order; returns (delivered, undelivered) and stops at the first failure"""
+        delivered: List[OutboundMessage] = []
+        batches = coalesce(messages)
+        for index, batch in enumerate(batches):
+            if await self._deliver(batch):
+                delivered.extend(batch)
+                continue
+            self.failed_deliveries += 1
+            for message in batch:
+                message.attempts += 1
+            return delivered, [message for rest in batches[index:] for message in rest]
+        return delivered, []
+
+    async def drain_once(self) -> int:
+        """
+        Deliver one round of messages: spilled ones first, otherwise from memory
+
+        Channels are delivered concurrently, each channel's messages in order.
+
+        Returns:
+            int: Messages delivered
+        """
+        if self.spill.count > 0:
+            taken = await asyncio.get_running_loop().run_in_executor(None, self.spill.peek, self.max_batch)
+            return await self._deliver_taken(taken, from_spill=True)
+        async with self._memory_drain:
+            taken = [self._memory.popleft() for _ in range(min(self.max_batch, len(self._memory)))]
+            return await self._deliver_taken(taken, from_spill=False)
+
+    async def _deliver_taken(self, taken: List[OutboundMessage], from_spill: bool) -> int:
+        """Deliver a batch taken from the spill file or memory, then record what was sent, dropped or must be retried"""
+        if not taken:
+            return 0
+        loop = asyncio.get_running_loop()
+
+        channels: Dict[str, List[OutboundMessage]] = {}
+        for message in taken:
+            channels.setdefault(message.channel_id, []).append(message)
+        results = await asyncio.gather(*(self._deliver_channel(messages) for messages in channels.values()))
+
+        delivered = [message for sent, _ in results for message in sent]
+        position = {id(message): index for index, message in enumerate(taken)}
+        undelivered = sorted((message for _, unsent in results for message in unsent), key=lambda m: position[id(m)])
+        dropped = [message for message in undelivered if message.attempts >= self.max_attempts]
+        retry = [message for message in undelivered if message.attempts < self.max_attempts]
+
+        if dropped:
+            logger.error(f"Dropping {len(dropped)} outbound message(s) after {self.max_attempts} failed attempts")
+        if retry:
+            if not from_spill:
+                # Newer messages still in memory must stay behind the failed ones, so they move to disk too
+                retry.extend(self._memory)
+                self._memory.clear()
+                self.spilled += len(retry)
+            await loop.run_in_executor(None, self.spill.push, retry)
+        await loop.run_in_executor(None, self.spill.delete, delivered + dropped)
+
+        self.delivered += len(delivered)
+        self.dropped += len(dropped)
+        OUTBOUND_MESSAGES_TOTAL.inc(len(delivered), outcome="delivered")
+        OUTBOUND_MESSAGES_TOTAL.inc(len(dropped), outcome="dropped")
+        self._consecutive_failures = self._consecutive_failures + 1 if undelivered and not delivered else 0
+        return len(delivered)
+
+    def _retry_delay(self) -> float:
+        return min(self.retry_backoff_max, 0.5 * (2 ** (self._consecutive_failures - 1)))
+
+    async def _run(self) -> None:
+        while True:
+            if not self._memory and self.spill.count == 0:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            elif self._consecutive_failures:
+                # Webhook is failing: wait before the next attempt, but wake early for shutdown
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self._retry_delay())
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+            # Let messages to the same channel gather before taking a batch
+            if self.coalesce_window:
+                await asyncio.sleep(self.coalesce_window)
+            try:
+                await self.drain_once()
+            except Exception as e:
+                logger.error(f"Outbound drain failed: {str(e)}")
+                self._consecutive_failures += 1
+
+    def start(self) -> None:
+        """Start the background drain on the running loop (idempotent)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        if self._memory or self.spill.count:
+            self._wakeup.set()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self, flush_timeout: float = 5.0) -> None:
+        """Try to flush, then persist whatever is still in memory and stop the drain"""
+        if self._task is not None:
+            deadline = time.monotonic() + flush_timeout
+            while (self._memory or self.spill.count) and self.webhook_up and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._memory:
+            self.spill.push(list(self._memory))
+            self._memory.clear()
+
+    def close(self) -> None:
+        self.spill.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_memory": len(self._memory),
+            "spilled_pending": self.spill.count,
+            "max_memory": self.max_memory,
+            "max_spill": self.max_spill,
+            "pressure": round(self.pressure, 4),
+            "webhook_up": self.webhook_up,
+            "enqueued": self.enqueued,
+            "spilled": self.spilled,
+            "delivered": self.delivered,
+            "deliveries": self.deliveries,
+            "failed_deliveries": self.failed_deliveries,
+            "dropped": self.dropped,
+            "running": self._task is not None and not self._task.done()
+        }
+
+    def metric_lines(self) -> List[str]:
+        """Queue depth gauges, for registry.register_collector"""
+        return (
+            gauge_lines("qrbar_outbound_queue_memory", "Outbound messages held in memory", len(self._memory)) +
+            gauge_lines("qrbar_outbound_queue_spilled", "Outbound messages waiting in the spill file", self.spill.count)
+        )
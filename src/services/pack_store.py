@@ -0,0 +1,570 @@
+import asyncio
+import contextlib
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# The store needs os.pread/os.pwrite and flock, so PACK_STORE defaults to off without them
+POSIX_FILES = fcntl is not None and hasattr(os, "pread")
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_INTERVAL_SECONDS = 300
+INITIAL_SLOTS = 4096
+MAX_LOAD = 0.7  # index slots in use before the table doubles
+GARBAGE_RATIO = 0.25  # unreachable share of the pack file that triggers compaction
+
+FORMATS = ("png", "svg")
+
+# images.pack: header, then records appended back to back
+PACK_HEADER = struct.Struct(">8sQ")  # magic, generation
+PACK_MAGIC = b"QRPACK01"
+RECORD = struct.Struct(">4sI32sB3xI")  # magic, data length, key, format, CRC-32 of data
+RECORD_MAGIC = b"QRPK"
+
+# images.idx: header, then an open-addressing hash table of fixed-size slots
+INDEX_HEADER = struct.Struct("<8sQQQQ")  # magic, pack generation, slots, entries, committed pack length
+INDEX_MAGIC = b"QRIDX001"
+SLOT = struct.Struct("<32sQIIB7x")  # key, record offset (0 = empty), data length, created, format
+
+
+def key_bytes(key: str) -> bytes:
+    """32-byte index key for a render key (SHA-256 hex digests are used as is)"""
+    try:
+        raw = bytes.fromhex(key)
+        if len(raw) == 32:
+            return raw
+    except ValueError:
+        pass
+    return hashlib.sha256(key.encode("utf-8")).digest()
+
+
+class PackStore:
+    """
+    Persistent content-addressed image store: one append-only pack file and a memory-mapped index
+
+    Records are appended to images.pack and then published in images.idx, a
+    linear-probing hash table keyed by the render key, so a lookup is a few
+    slot reads in the mapped index. Reads return memoryviews into the mapped
+    pack file, which can be sent without copying.
+
+    A record only counts once its index slot and the committed pack length
+    are written. When the store is opened, anything after the committed
+    length is re-validated by CRC: complete records are indexed again and a
+    torn tail is truncated. An index that doesn't match the pack file is
+    rebuilt by scanning the pack. Compaction rewrites the live records into
+    a new pack and index (dropping expired entries and, oldest first, whatever
+    exceeds the byte budget) and swaps them in with os.replace.
+
+    Several processes (e.g. uvicorn workers) can share a directory. Appends
+    and compaction are serialized with flock on images.lock. A writer first
+    catches up with what other processes appended or replaced, and a reader
+    does the same after a miss.
+
+    Readers only take a short lock around the mapped views (_map_lock); the
+    writer holds it while it publishes slots or swaps mappings, never while
+    it writes or syncs files. get() may still open the store or catch up
+    with other processes, so callers on an event loop run it in a thread.
+    """
+
+    def __init__(
+        self,
+        directory: str = "data/images",
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        interval_seconds: float = DEFAULT_INTERVAL_SECONDS,
+        fsync: bool = False
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.interval_seconds = interval_seconds
+        self.fsync = fsync
+        self.pack_path = os.path.join(directory, "images.pack")
+        self.index_path = os.path.join(directory, "images.idx")
+        self.lock_path = os.path.join(directory, "images.lock")
+
+        self._lock = threading.RLock()
+        self._map_lock = threading.RLock()  # guards the mapped index and pack views
+        self._lock_fd = -1
+        self._lock_depth = 0
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pack-store")
+        self._task: Optional[asyncio.Task] = None
+        self._opened = False
+        self._pack_fd = -1
+        self._pack_ino = 0
+        self._pack_map: Optional[mmap.mmap] = None
+        self._pack_size = 0
+        self._generation = 0
+        self._index_file = None
+        self._index_ino = 0
+        self._index: Optional[mmap.mmap] = None
+        self._slots = 0
+        self._entries = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.appends = 0
+        self.deduplicated = 0
+        self.recovered = 0
+        self.truncated_bytes = 0
+        self.compactions = 0
+        self.evicted = 0
+
+    @contextlib.contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        """Hold the store against other threads and, through flock, other processes (reentrant)"""
+        with self._lock:
+            if self._lock_depth == 0:
+                if self._lock_fd < 0:
+                    os.makedirs(self.directory, exist_ok=True)
+                    self._lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                if fcntl is not None:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and fcntl is not None:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    # Opening and recovery
+
+    def open(self) -> None:
+        """Open (or create) the pack and index, recovering from an interrupted append (idempotent)"""
+        if self._opened:
+            return
+        with self._exclusive():
+            if not self._opened:
+                self._load()
+                self._opened = True
+
+    def _load(self) -> None:
+        self._open_pack()
+        committed = self._open_index()
+        if committed is None:
+            self._write_index([], INITIAL_SLOTS, PACK_HEADER.size)
+            committed = PACK_HEADER.size
+        self._recover(committed)
+
+    def _open_pack(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        fd = os.open(self.pack_path, os.O_RDWR | os.O_CREAT, 0o644)
+        with self._map_lock:
+            if self._pack_fd >= 0:
+                os.close(self._pack_fd)
+            self._pack_fd = fd
+            self._pack_map = None
+        stat = os.fstat(self._pack_fd)
+        self._pack_ino = stat.st_ino
+        self._pack_size = stat.st_size
+        header = os.pread(self._pack_fd, PACK_HEADER.size, 0)
+        if len(header) < PACK_HEADER.size or PACK_HEADER.unpack(header)[0] != PACK_MAGIC:
+            # New (or unrecognizable) pack file: start over
+            self._generation = int.from_bytes(os.urandom(8), "big")
+            os.ftruncate(self._pack_fd, 0)
+            os.pwrite(self._pack_fd, PACK_HEADER.pack(PACK_MAGIC, self._generation), 0)
+            self._pack_size = PACK_HEADER.size
+        else:
+            self._generation = PACK_HEADER.unpack(header)[1]
+
+    def _open_index(self) -> Optional[int]:
+        """Map images.idx when it matches the pack file; returns its committed length or None"""
+        try:
+            index_file = open(self.index_path, "r+b")
+        except FileNotFoundError:
+            return None
+        size = os.fstat(index_file.fileno()).st_size
+        if size >= INDEX_HEADER.size:
+            magic, generation, slots, entries, committed = INDEX_HEADER.unpack(index_file.read(INDEX_HEADER.size))
+            if (magic == INDEX_MAGIC and generation == self._generation and slots > 0 and
+                    size == INDEX_HEADER.size + slots * SLOT.size and committed <= self._pack_size):
+                self._map_index(index_file, slots, entries)
+                return committed
+        index_file.close()
+        logger.warning(f"Rebuilding {self.index_path} from {self.pack_path}")
+        return None
+
+    def _map_index(self, index_file, slots: int, entries: int) -> None:
+        index = mmap.mmap(index_file.fileno(), 0)
+        with self._map_lock:
+            if self._index is not None:
+                self._index.close()
+                self._index_file.close()
+            self._index_file = index_file
+            self._index_ino = os.fstat(index_file.fileno()).st_ino
+            self._index = index
+            self._slots = slots
+            self._entries = entries
+
+    def _replaced(self) -> bool:
+        """Whether another process swapped in a new pack or index file since we opened ours"""
+        try:
+            return (os.stat(self.pack_path).st_ino != self._pack_ino or
+                    os.stat(self.index_path).st_ino != self._index_ino)
+        except FileNotFoundError:
+            return True
+
+    def _sync(self) -> None:
+        """Catch up with appends, index growth and compactions by other processes (caller holds _exclusive)"""
+        if self._replaced():
+            self._load()
+            return
+        with self._map_lock:
+            _, _, self._slots, self._entries, committed = INDEX_HEADER.unpack_from(self._index, 0)
+        self._pack_size = os.fstat(self._pack_fd).st_size
+        if self._pack_size != committed:
+            # Another process died between its append and its index update
+            self._recover(committed)
+
+    def _recover(self, committed: int) -> None:
+        """Index complete records after the committed length and truncate a torn tail"""
+        offset = committed
+        for record_offset, key, length, format_id, valid in self._scan(offset, self._pack_size):
+            if not valid:
+                break
+            self._insert(key, record_offset, length, int(time.time()), format_id, replace=False)
+            self.recovered += 1
+            offset = record_offset + RECORD.size + length
+
+        if offset < self._pack_size:
+            logger.warning(f"Truncating {self._pack_size - offset} bytes of incomplete records from {self.pack_path}")
+            self.truncated_bytes += self._pack_size - offset
+            with self._map_lock:
+                # A mapping over the truncated tail would fault on access
+                self._pack_map = None
+                os.ftruncate(self._pack_fd, offset)
+            self._pack_size = offset
+
+        # Slots written just before a crash may point past the end; count what is really there
+        entries = list(self._iter_slots())
+        valid = [entry for entry in entries if entry[1] + RECORD.size + entry[2] <= self._pack_size]
+        if len(valid) != len(entries):
+            self._write_index(valid, self._slots, offset)
+        self._entries = len(valid)
+        with self._map_lock:
+            self._commit(offset)
+
+    def _scan(self, start: int, end: int) -> Iterator[Tuple[int, bytes, int, int, bool]]:
+        """Walk records between two offsets: (offset, key, length, format, valid)"""
+        offset = start
+        while offset < end:
+            header = os.pread(self._pack_fd, RECORD.size, offset)
+            if len(header) < RECORD.size:
+                yield offset, b"", 0, 0, False
+                return
+            magic, length, key, format_id, crc = RECORD.unpack(header)
+            data = os.pread(self._pack_fd, length, offset + RECORD.size) if magic == RECORD_MAGIC else b""
+            if magic != RECORD_MAGIC or len(data) < length or zlib.crc32(data) != crc or format_id >= len(FORMATS):
+                yield offset, key, length, format_id, False
+                return
+            yield offset, key, length, format_id, True
+            offset += RECORD.size + length
+
+    # Index table
+
+    def _slot_offset(self, slot: int) -> int:
+        return INDEX_HEADER.size + slot * SLOT.size
+
+    def _find(self, key: bytes) -> Tuple[int, bool]:
+        """Slot holding key, or the empty slot where it would go"""
+        slot = int.from_bytes(key[:8], "little") % self._slots
+        while True:
+            stored, offset = struct.unpack_from("<32sQ", self._index, self._slot_offset(slot))
+            if offset == 0:
+                return slot, False
+            if stored == key:
+                return slot, True
+            slot = (slot + 1) % self._slots
+
+    def _insert(self, key: bytes, offset: int, length: int, created: int, format_id: int, replace: bool = True) -> None:
+        if (self._entries + 1) > self._slots * MAX_LOAD:
+            self._write_index(list(self._iter_slots()), self._slots * 2, self._committed())
+        with self._map_lock:
+            slot, found = self._find(key)
+            if found and not replace:
+                return
+            SLOT.pack_into(self._index, self._slot_offset(slot), key, offset, length, created, format_id)
+            if not found:
+                self._entries += 1
+
+    def _iter_slots(self) -> Iterator[Tuple[bytes, int, int, int, int]]:
+        """(key, offset, length, created, format) of every used slot"""
+        for key, offset, length, created, format_id in SLOT.iter_unpack(self._index[INDEX_HEADER.size:]):
+            if offset:
+                yield key, offset, length, created, format_id
+
+    def _committed(self) -> int:
+        return INDEX_HEADER.unpack_from(self._index, 0)[4]
+
+    def _commit(self, pack_length: int) -> None:
+        """Publish inserted slots: entries and committed pack length go in the header last"""
+        INDEX_HEADER.pack_into(self._index, 0, INDEX_MAGIC, self._generation, self._slots, self._entries, pack_length)
+
+    def _write_index(self, entries: List[Tuple[bytes, int, int, int, int]], slots: int, committed: int, path: Optional[str] = None) -> None:
+        """Write a fresh index file with these entries and map it (atomically replacing path)"""
+        path = path or self.index_path
+        table = bytearray(INDEX_HEADER.size + slots * SLOT.size)
+        INDEX_HEADER.pack_into(table, 0, INDEX_MAGIC, self._generation, slots, len(entries), committed)
+        for key, offset, length, created, format_id in entries:
+            slot = int.from_bytes(key[:8], "little") % slots
+            while struct.unpack_from("<Q", table, self._slot_offset(slot) + 32)[0]:
+                slot = (slot + 1) % slots
+            SLOT.pack_into(table, self._slot_offset(slot), key, offset, length, created, format_id)
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(table)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._map_index(open(path, "r+b"), slots, len(entries))
+
+    # Reads and appends
+
+    def get(self, key: str) -> Optional[Tuple[memoryview, str]]:
+        """
+        Look up an image by render key
+
+        Returns:
+            tuple: (zero-copy view of the encoded bytes, format) or None
+        """
+        raw_key = key_bytes(key)
+        self.open()
+        with self._map_lock:
+            found = self._read(raw_key)
+        if found is None and self._replaced():
+            # Added since another process compacted or grew the index
+            with self._exclusive():
+                self._sync()
+            with self._map_lock:
+                found = self._read(raw_key)
+        if found is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return found
+
+    def _read(self, raw_key: bytes) -> Optional[Tuple[memoryview, str]]:
+        slot, found = self._find(raw_key)
+        if not found:
+            return None
+        _, offset, length, _, format_id = SLOT.unpack_from(self._index, self._slot_offset(slot))
+        start = offset + RECORD.size
+        if self._pack_map is None or start + length > len(self._pack_map):
+            # Views handed out earlier keep the previous mapping alive
+            self._pack_map = mmap.mmap(self._pack_fd, 0, access=mmap.ACCESS_READ)
+        if start + length > len(self._pack_map) or format_id >= len(FORMATS):
+            return None
+        # The slot may be mid-update by another process; trust it only if the record agrees
+        magic, record_length, record_key, _, _ = RECORD.unpack_from(self._pack_map, offset)
+        if magic != RECORD_MAGIC or record_length != length or record_key != raw_key:
+            return None
+        return memoryview(self._pack_map)[start:start + length], FORMATS[format_id]
+
+    def put(self, key: str, data: bytes, output_format: str = "png") -> bool:
+        """
+        Append an image unless the key is already stored
+
+        Returns:
+            bool: True when a record was appended
+        """
+        format_id = FORMATS.index(getattr(output_format, "value", output_format))
+        raw_key = key_bytes(key)
+        with self._exclusive():
+            self.open()
+            self._sync()
+            if self._find(raw_key)[1]:
+                self.deduplicated += 1
+                return False
+
+            offset = self._pack_size
+            record = RECORD.pack(RECORD_MAGIC, len(data), raw_key, format_id, zlib.crc32(data)) + bytes(data)
+            os.pwrite(self._pack_fd, record, offset)
+            if self.fsync:
+                os.fsync(self._pack_fd)
+            self._pack_size += len(record)
+
+            self._insert(raw_key, offset, len(data), int(time.time()), format_id)
+            with self._map_lock:
+                self._commit(self._pack_size)
+            self.appends += 1
+            return True
+
+    def put_async(self, key: str, data: bytes, output_format: str = "png") -> None:
+        """Append on the store's writer thread, off the request path"""
+        self._writer.submit(self._put_logged, key, data, output_format)
+
+    def _put_logged(self, key: str, data: bytes, output_format: str) -> None:
+        try:
+            self.put(key, data, output_format)
+        except OSError as e:
+            logger.error(f"Failed to append to {self.pack_path}: {str(e)}")
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Block until queued appends are written"""
+        self._writer.submit(lambda: None).result(timeout=timeout)
+
+    # Compaction
+
+    def compact(self, now: Optional[float] = None, force: bool = False) -> int:
+        """
+        Rewrite live records into a new pack, dropping expired and over-budget entries
+
+        Records are copied without holding the lock; appends made meanwhile
+        are carried over before the files are swapped.
+
+        Args:
+            now: Reference time (defaults to time.time())
+            force: Compact even when there is nothing to drop
+
+        Returns:
+            int: Number of entries evicted
+        """
+        now = time.time() if now is None else now
+        with self._exclusive():
+            self.open()
+            self._sync()
+            entries = list(self._iter_slots())
+            snapshot = self._pack_size
+            generation = self._generation
+
+        # Newest first within the TTL, until the byte budget is spent
+        keep, budget = [], self.max_bytes
+        for entry in sorted(entries, key=lambda e: e[3], reverse=True):
+            size = RECORD.size + entry[2]
+            if now - entry[3] >= self.ttl_seconds or size > budget:
+                continue
+            keep.append(entry)
+            budget -= size
+        garbage = snapshot - PACK_HEADER.size - sum(RECORD.size + e[2] for e in entries)
+        if not force and len(keep) == len(entries) and garbage <= snapshot * GARBAGE_RATIO:
+            return 0
+
+        new_generation = int.from_bytes(os.urandom(8), "big")
+        tmp_path = f"{self.pack_path}.{os.getpid()}.tmp"
+        new_entries = []
+        # Our own descriptor, in case another thread reopens the pack meanwhile
+        source = os.open(self.pack_path, os.O_RDONLY)
+        try:
+            with open(tmp_path, "wb") as pack:
+                pack.write(PACK_HEADER.pack(PACK_MAGIC, new_generation))
+                stale = PACK_HEADER.unpack(os.pread(source, PACK_HEADER.size, 0))[1] != generation
+                if not stale:
+                    for key, offset, length, created, format_id in sorted(keep, key=lambda e: e[1]):
+                        new_entries.append((key, pack.tell(), length, created, format_id))
+                        pack.write(os.pread(source, RECORD.size + length, offset))
+
+                with self._exclusive():
+                    self._sync()
+                    if stale or self._generation != generation:
+                        # Another process compacted first
+                        os.remove(tmp_path)
+                        return 0
+                    # Carry over records appended since the snapshot
+                    for offset, key, length, format_id, valid in self._scan(snapshot, self._pack_size):
+                        new_entries.append((key, pack.tell(), length, int(now), format_id))
+                        pack.write(os.pread(self._pack_fd, RECORD.size + length, offset))
+                    pack.flush()
+                    if self.fsync:
+                        os.fsync(pack.fileno())
+                    committed = pack.tell()
+
+                    # A crash between the two replaces leaves a generation mismatch, so the index is rebuilt
+                    os.replace(tmp_path, self.pack_path)
+                    self._open_pack()
+                    slots = INITIAL_SLOTS
+                    while len(new_entries) > slots * MAX_LOAD:
+                        slots *= 2
+                    self._write_index(new_entries, slots, committed)
+
+                    evicted = len(entries) - len(keep)
+                    self.evicted += evicted
+                    self.compactions += 1
+                    return evicted
+        finally:
+            os.close(source)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self.open)
+        except OSError as e:
+            # Lookups count as misses and appends are logged until the directory is usable
+            logger.error(f"Failed to open the pack store in {self.directory}: {str(e)}")
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await loop.run_in_executor(None, self.compact)
+            except Exception as e:
+                logger.error(f"Pack store compaction failed: {str(e)}")
+
+    def start(self) -> None:
+        """Open the store in the background and start periodic compaction on the running loop (idempotent)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel compaction and write queued appends and the index to disk"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.get_running_loop().run_in_executor(None, self.flush)
+        with self._lock:
+            if self._index is not None:
+                self._index.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._exclusive():
+            self.open()
+            self._sync()
+            return {
+                "directory": self.directory,
+                "entries": self._entries,
+                "live_bytes": sum(RECORD.size + length for _, _, length, _, _ in self._iter_slots()),
+                "pack_bytes": self._pack_size,
+                "index_slots": self._slots,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "interval_seconds": self.interval_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "appends": self.appends,
+                "deduplicated": self.deduplicated,
+                "recovered": self.recovered,
+                "truncated_bytes": self.truncated_bytes,
+                "compactions": self.compactions,
+                "evicted": self.evicted,
+                "running": self._task is not None and not self._task.done()
+            }
+
+
+# Shared by the render pipeline, the services and /static/images (PACK_STORE=0 disables it)
+pack_store = PackStore(
+    os.getenv("PACK_STORE_DIR", "data/images"),
+    int(os.getenv("PACK_STORE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+    float(os.getenv("PACK_STORE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+    float(os.getenv("PACK_STORE_INTERVAL_SECONDS", DEFAULT_INTERVAL_SECONDS)),
+    os.getenv("PACK_STORE_FSYNC", "0") == "1"
+) if os.getenv("PACK_STORE", "1" if POSIX_FILES else "0") == "1" else None
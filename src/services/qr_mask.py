@@ -0,0 +1,140 @@
+import functools
+import os
+from typing import Tuple
+
+import numpy as np
+import qrcode
+
+# exact: vectorized ISO 18004 penalty scoring (same mask as qrcode's best_mask_pattern)
+# reference: qrcode's own pure-Python scoring
+# fast: skip scoring and use QR_FAST_MASK; every mask is valid, but the symbol
+#       may contain finder-like patterns or large blocks that slow some scanners
+MASK_MODES = ("exact", "reference", "fast")
+DEFAULT_MASK_MODE = os.getenv("QR_MASK_MODE", "exact").lower()
+FAST_MASK = int(os.getenv("QR_FAST_MASK", "0"))
+
+# 1:1:3:1:1 finder-like pattern with four light modules on one side (rule 3)
+FINDER_PATTERNS = (
+    (1, 0, 1, 1, 1, 0, 1, 0, 0, 0, 0),
+    (0, 0, 0, 0, 1, 0, 1, 1, 1, 0, 1)
+)
+
+
+def _mask_patterns(n: int) -> np.ndarray:
+    """The eight mask conditions as an (8, n, n) bool array, i = row and j = column"""
+    i, j = np.indices((n, n))
+    return np.stack([
+        (i + j) % 2 == 0,
+        i % 2 == 0,
+        j % 3 == 0,
+        (i + j) % 3 == 0,
+        (i // 2 + j // 3) % 2 == 0,
+        (i * j) % 2 + (i * j) % 3 == 0,
+        ((i * j) % 2 + (i * j) % 3) % 2 == 0,
+        ((i * j) % 3 + (i + j) % 2) % 2 == 0
+    ])
+
+
+@functools.lru_cache(maxsize=None)
+def _layout(version: int) -> np.ndarray:
+    """Mask patterns restricted to the data region of a version, (8, n, n) bool"""
+    n = version * 4 + 17
+    qr = qrcode.QRCode(version=version)
+    qr.modules_count = n
+    qr.modules = [[None] * n for _ in range(n)]
+    qr.setup_position_probe_pattern(0, 0)
+    qr.setup_position_probe_pattern(n - 7, 0)
+    qr.setup_position_probe_pattern(0, n - 7)
+    qr.setup_position_adjust_pattern()
+    qr.setup_timing_pattern()
+    qr.setup_type_info(True, 0)
+    if version >= 7:
+        qr.setup_type_number(True)
+    data_region = np.array([[module is None for module in row] for row in qr.modules])
+    return _mask_patterns(n) & data_region
+
+
+def _run_penalty(matrices: np.ndarray) -> np.ndarray:
+    """Rule 1 along rows: runs of 5+ same-colour modules score length - 2"""
+    count, n, _ = matrices.shape
+    rows = matrices.reshape(count * n, n)
+    # A change marker before column 0 and after column n - 1 keeps runs inside their row
+    changes = np.ones((count * n, n + 1), dtype=bool)
+    changes[:, 1:n] = rows[:, 1:] != rows[:, :-1]
+    edges = np.flatnonzero(changes)
+    lengths = np.diff(edges)
+    long_runs = lengths >= 5
+    owners = edges[:-1][long_runs] // ((n + 1) * n)
+    return np.bincount(owners, weights=lengths[long_runs] - 2, minlength=count)
+
+
+def _finder_penalty(matrices: np.ndarray) -> np.ndarray:
+    """Rule 3 along rows: 40 per finder-like pattern"""
+    width = matrices.shape[2] - 10
+    light = ~matrices
+    total = np.zeros(matrices.shape[0], dtype=np.int64)
+    for pattern in FINDER_PATTERNS:
+        found = np.ones(matrices.shape[:2] + (width,), dtype=bool)
+        for offset, dark in enumerate(pattern):
+            found &= (matrices if dark else light)[:, :, offset:offset + width]
+        total += found.sum(axis=(1, 2))
+    return 40 * total
+
+
+def penalty_scores(matrices: np.ndarray) -> np.ndarray:
+    """
+    ISO 18004 mask penalty (rules 1-4) of each matrix, scored like qrcode.util.lost_point
+
+    Args:
+        matrices: (count, n, n) bool array, True = dark
+
+    Returns:
+        np.ndarray: (count,) penalty per matrix
+    """
+    count, n, _ = matrices.shape
+    columns = np.ascontiguousarray(matrices.transpose(0, 2, 1))
+
+    runs = _run_penalty(matrices) + _run_penalty(columns)
+
+    top_left = matrices[:, :-1, :-1]
+    blocks = (
+        (top_left == matrices[:, 1:, :-1]) &
+        (top_left == matrices[:, :-1, 1:]) &
+        (top_left == matrices[:, 1:, 1:])
+    ).sum(axis=(1, 2)) * 3
+
+    finders = _finder_penalty(matrices) + _finder_penalty(columns)
+
+    # Every 5% the dark share departs from 50% costs 10, computed exactly as qrcode does
+    dark = matrices.sum(axis=(1, 2))
+    balance = np.array([int(abs(float(d) / (n ** 2) * 100 - 50) / 5) * 10 for d in dark])
+
+    return runs.astype(np.int64) + blocks + finders + balance
+
+
+def best_mask_pattern(qr: qrcode.QRCode) -> int:
+    """
+    Vectorized qr.best_mask_pattern(): lay out the data once and score all eight masks together
+
+    Args:
+        qr: QRCode whose version is already fitted
+
+    Returns:
+        int: Mask pattern 0-7 with the lowest penalty (the first on ties, as qrcode)
+    """
+    qr.makeImpl(True, 0)
+    masks = _layout(qr.version)
+    unmasked = np.array(qr.modules, dtype=bool) ^ masks[0]
+    candidates = unmasked[np.newaxis] ^ masks
+    return int(np.argmin(penalty_scores(candidates)))
+
+
+def select_mask(qr: qrcode.QRCode, mode: str = DEFAULT_MASK_MODE) -> int:
+    """Pick the mask for a fitted QRCode according to a MASK_MODES entry"""
+    if mode == "exact":
+        return best_mask_pattern(qr)
+    if mode == "reference":
+        return qr.best_mask_pattern()
+    if mode == "fast":
+        return FAST_MASK
+    raise ValueError(f"Unknown QR mask mode: {mode} (expected one of {', '.join(MASK_MODES)})")
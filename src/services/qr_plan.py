@@ -0,0 +1,164 @@
+import bisect
+from typing import List, Sequence, Tuple
+
+import qrcode
+from qrcode import util
+from qrcode.exceptions import DataOverflowError
+
+ERROR_CORRECTION_LEVELS = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H
+}
+ECC_ORDER = ("L", "M", "Q", "H")  # increasing recovery capacity
+
+# Data bits available per version (index 0 unused), from qrcode's RS block table
+CAPACITY_BITS = {level: util.BIT_LIMIT_TABLE[value] for level, value in ERROR_CORRECTION_LEVELS.items()}
+
+# Versions sharing character count indicator widths (ISO 18004 table 3)
+VERSION_GROUPS = ((1, 9), (10, 26), (27, 40))
+
+NUMERIC, ALPHANUMERIC, BYTE = util.MODE_NUMBER, util.MODE_ALPHA_NUM, util.MODE_8BIT_BYTE
+MODES = (BYTE, ALPHANUMERIC, NUMERIC)
+
+_DIGITS = frozenset(b"0123456789")
+_ALPHANUMERIC = frozenset(util.ALPHA_NUM)
+
+# Per-character cost in sixths of a bit: 8 bits, 5.5 bits (11 per pair), 3.33 bits (10 per triple)
+_CHAR_COSTS = {BYTE: 48, ALPHANUMERIC: 33, NUMERIC: 20}
+
+
+class QRPlan:
+    """Segments, version and error correction level chosen for a payload"""
+
+    __slots__ = ("segments", "version", "ecc", "bits")
+
+    def __init__(self, segments: List[util.QRData], version: int, ecc: str, bits: int):
+        self.segments = segments
+        self.version = version
+        self.ecc = ecc
+        self.bits = bits
+
+    def __repr__(self) -> str:
+        modes = "+".join(f"{segment.mode}:{len(segment)}" for segment in self.segments)
+        return f"QRPlan(version={self.version}, ecc={self.ecc}, bits={self.bits}, segments={modes})"
+
+
+def segment_bits(segments: Sequence[Tuple[int, bytes]], version: int) -> int:
+    """Exact encoded length of (mode, data) segments at a version, headers included"""
+    total = 0
+    for mode, data in segments:
+        length = len(data)
+        total += 4 + util.length_in_bits(mode, version)
+        if mode == NUMERIC:
+            total += 10 * (length // 3) + (0, 4, 7)[length % 3]
+        elif mode == ALPHANUMERIC:
+            total += 11 * (length // 2) + 6 * (length % 2)
+        else:
+            total += 8 * length
+    return total
+
+
+def segment(data: bytes, version: int) -> List[Tuple[int, bytes]]:
+    """
+    Split data into numeric/alphanumeric/byte segments of minimal total length
+
+    Dynamic programme over characters in sixths of a bit: each state is the
+    cheapest encoding of the prefix that ends in a given mode, and switching
+    modes rounds up to whole bits and pays the next segment's header.
+
+    Args:
+        data: UTF-8 payload
+        version: Any version of the target group (sets the count field widths)
+
+    Returns:
+        list: (mode, bytes) segments in order
+    """
+    if not data:
+        return [(BYTE, b"")]
+
+    # Uniform payloads need no search
+    if all(byte in _DIGITS for byte in data):
+        return [(NUMERIC, data)]
+    if not any(byte in _ALPHANUMERIC for byte in data):
+        return [(BYTE, data)]
+
+    head = {mode: (4 + util.length_in_bits(mode, version)) * 6 for mode in MODES}
+    previous = dict(head)
+    choices = []  # choices[i][mode]: mode of character i given the state after it ends in mode
+
+    for byte in data:
+        current = {BYTE: previous[BYTE] + 48}
+        chosen = {BYTE: BYTE}
+        if byte in _ALPHANUMERIC:
+            current[ALPHANUMERIC] = previous[ALPHANUMERIC] + 33
+            chosen[ALPHANUMERIC] = ALPHANUMERIC
+            if byte in _DIGITS:
+                current[NUMERIC] = previous[NUMERIC] + 20
+                chosen[NUMERIC] = NUMERIC
+
+        # Close the segment after this character and open one in another mode
+        encodable = list(current.items())
+        for to_mode in MODES:
+            for from_mode, cost in encodable:
+                switched = (cost + 5) // 6 * 6 + head[to_mode]
+                if to_mode not in current or switched < current[to_mode]:
+                    current[to_mode] = switched
+                    chosen[to_mode] = from_mode
+
+        choices.append(chosen)
+        previous = current
+
+    mode = min(MODES, key=lambda m: previous[m])
+    modes = [0] * len(data)
+    for index in range(len(data) - 1, -1, -1):
+        mode = choices[index][mode]
+        modes[index] = mode
+
+    segments = []
+    start = 0
+    for index in range(1, len(data) + 1):
+        if index == len(data) or modes[index] != modes[start]:
+            segments.append((modes[start], data[start:index]))
+            start = index
+    return segments
+
+
+def plan_qr(text: str, min_version: int = 1, ecc: str = "L", boost_ecc: bool = True) -> QRPlan:
+    """
+    Choose segments, the smallest fitting version and the error correction level
+
+    Args:
+        text: Payload (encoded as UTF-8, like qrcode does)
+        min_version: Smallest version to consider
+        ecc: Minimum error correction level (L, M, Q or H)
+        boost_ecc: Raise the level as far as the chosen version still fits
+
+    Returns:
+        QRPlan
+
+    Raises:
+        DataOverflowError: The payload doesn't fit in version 40 at this level
+    """
+    data = text.encode("utf-8")
+    util.check_version(min_version)
+
+    for first, last in VERSION_GROUPS:
+        if last < min_version:
+            continue
+        segments = segment(data, first)
+        bits = segment_bits(segments, first)
+        version = bisect.bisect_left(CAPACITY_BITS[ecc], bits, max(first, min_version), last + 1)
+        if version <= last:
+            break
+    else:
+        raise DataOverflowError(f"Data too long for a version 40 QR code at level {ecc}")
+
+    if boost_ecc:
+        for level in ECC_ORDER[ECC_ORDER.index(ecc) + 1:]:
+            if bits > CAPACITY_BITS[level][version]:
+                break
+            ecc = level
+
+    return QRPlan([util.QRData(chunk, mode, check_data=False) for mode, chunk in segments], version, ecc, bits)
@@ -1,68 +1,182 @@
 import qrcode
 from PIL import Image
 import io
-import base64
-from typing import Optional
-import uuid
 import os
+from typing import Optional
+from src.models.request_models import DEFAULT_PNG_PROFILE, OutputFormat, PngProfile, qr_box_size
+from src.services.render_cache import make_render_key
+from src.services.render_pipeline import persist_sink, render_pipeline, cache_sink
+from src.services.qr_mask import DEFAULT_MASK_MODE, select_mask
+from src.services.qr_plan import ERROR_CORRECTION_LEVELS, plan_qr
+from src.utils.svg_builder import modules_to_path, svg_document
+from src.utils.metrics import qr_size_bucket, stage, stage_labels, update_stage_labels
+from src.utils.png_encoder import encode_module_matrix_png
+
+# Widest image a QR render may produce; larger box sizes are reduced to fit
+MAX_QR_PIXELS = int(os.getenv("QR_MAX_PIXELS", "2048"))
+
+def fit_box_size(version: int, box_size: int, border: int) -> int:
+    """Largest box size up to box_size that keeps the image within MAX_QR_PIXELS (at least 1)"""
+    dimension = version * 4 + 17 + 2 * border
+    return max(1, min(box_size, MAX_QR_PIXELS // dimension))
+
+def _make_qr(text: str, version: int, box_size: int, border: int, ecc: str, mask_mode: str = DEFAULT_MASK_MODE) -> qrcode.QRCode:
+    """Build the QR module matrix for text, choosing the mask per mask_mode (see qr_mask.MASK_MODES)"""
+    # Optimal mixed-mode segments, the smallest version that fits and the strongest ECC it allows
+    with stage("plan"):
+        plan = plan_qr(text, version, ecc)
+        update_stage_labels(size_bucket=qr_size_bucket(plan.version))
+    
+    qr = qrcode.QRCode(
+        version=plan.version,
+        error_correction=ERROR_CORRECTION_LEVELS[plan.ecc],
+        box_size=fit_box_size(plan.version, box_size, border),
+        border=border,
+    )
+    qr.data_list = plan.segments
+    
+    # qr.make(), split so mask selection is timed separately and can be vectorized
+    with stage("mask"):
+        mask_pattern = select_mask(qr, mask_mode)
+    with stage("matrix"):
+        qr.makeImpl(False, mask_pattern)
+    return qr
+
+def render_qr_png(text: str, version: int = 1, box_size: int = 10, border: int = 4, ecc: str = "L", profile: PngProfile = DEFAULT_PNG_PROFILE, mask_mode: str = DEFAULT_MASK_MODE) -> bytes:
+    """
+    Encode text as a QR code and return the PNG bytes
+    
+    The module matrix is rasterized directly into a 1-bit PNG, skipping
+    qrcode's per-module PIL drawing; the pixels are identical.
+    
+    Args:
+        text: Text to encode
+        version: Minimum QR version (grown to fit the data)
+        box_size: Pixels per module (reduced so the image is at most MAX_QR_PIXELS wide)
+        border: Quiet zone width in modules
+        ecc: Minimum error correction level (L, M, Q or H), raised when the version has room
+        profile: PNG encoding profile: "fast", "balanced" or "small" (PNG_PROFILE)
+        mask_mode: "exact", "reference" or "fast" (QR_MASK_MODE)
+        
+    Returns:
+        bytes: PNG image
+    """
+    with stage_labels(symbology="qr"):
+        qr = _make_qr(text, version, box_size, border, ecc, mask_mode)
+        return encode_module_matrix_png(qr.modules, qr.box_size, border, profile=profile)
+
+def render_qr_png_pil(text: str, version: int = 1, box_size: int = 10, border: int = 4, ecc: str = "L") -> bytes:
+    """Reference PNG rendering through qrcode's PIL image factory (used to verify and benchmark render_qr_png)"""
+    qr = _make_qr(text, version, box_size, border, ecc, "reference")
+    img = qr.make_image(fill_color="black", back_color="white")
+    
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def render_qr_svg(text: str, version: int = 1, box_size: int = 10, border: int = 4, ecc: str = "L", mask_mode: str = DEFAULT_MASK_MODE) -> bytes:
+    """
+    Encode text as a QR code and return SVG bytes built straight from the module matrix
+    
+    Args:
+        text: Text to encode
+        version: Minimum QR version (grown to fit the data)
+        box_size: Pixels per module (sets the default display size, capped like render_qr_png)
+        border: Quiet zone width in modules
+        ecc: Minimum error correction level (L, M, Q or H), raised when the version has room
+        mask_mode: "exact", "reference" or "fast" (QR_MASK_MODE)
+        
+    Returns:
+        bytes: SVG image
+    """
+    with stage_labels(symbology="qr"):
+        qr = _make_qr(text, version, box_size, border, ecc, mask_mode)
+        
+        dimension = qr.modules_count + 2 * border
+        with stage("vectorize"):
+            path_data = modules_to_path(qr.modules, x_offset=border, y_offset=border)
+            return svg_document(dimension, dimension, path_data, scale=qr.box_size)
+
+QR_RENDERERS = {
+    OutputFormat.PNG: render_qr_png,
+    OutputFormat.SVG: render_qr_svg
+}
 
 class QRCodeService:
     """Service class for QR code generation following Single Responsibility Principle"""
     
     def __init__(self, output_dir: str = "static/images"):
         self.output_dir = output_dir
-        os.makedirs(output_dir, exist_ok=True)
+        # Images are persisted to the pack store and served from /static/images
+        self.persist_sink = persist_sink(output_dir)
     
-    def generate_qr_code(self, text: str, size: int = 10) -> tuple[str, str]:
+    def generate_qr_code(self, text: str, size: int = 10, use_cache: bool = True, output_format: OutputFormat = OutputFormat.PNG, persist: bool = True, profile: PngProfile = DEFAULT_PNG_PROFILE) -> tuple[Optional[str], str]:
         """
         Generate QR code and return file path and base64 string
         
         Args:
             text: Text to encode
-            size: QR code box size
+            size: Module size in pixels (1-40, at least QR_MIN_BOX_SIZE)
+            use_cache: Reuse a previously rendered image when available
+            output_format: PNG or SVG
+            persist: Also persist the image, served from output_dir (in the background)
+            profile: PNG encoding profile (fast, balanced or small)
             
         Returns:
-            tuple: (file_path, base64_string)
+            tuple: (file_path or None when not persisted, base64_string)
         """
         try:
-            # Create QR code instance
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=size,
-                border=4,
+            output_format = OutputFormat(output_format)
+            artifact = render_pipeline.render_sync(
+                self._render_key(text, size, output_format, profile), output_format, "qr",
+                QR_RENDERERS[output_format], text, 1, qr_box_size(size), 4, "L",
+                use_cache=use_cache,
+                sinks=self._sinks(use_cache, persist),
+                profile=profile
             )
+            return artifact.file_path, artifact.base64
             
-            qr.add_data(text)
-            qr.make(fit=True)
-            
-            # Create image
-            img = qr.make_image(fill_color="black", back_color="white")
-            
-            # Generate unique filename
-            filename = f"qr_{uuid.uuid4().hex[:8]}.png"
-            file_path = os.path.join(self.output_dir, filename)
-            
-            # Save image
-            img.save(file_path)
-            
-            # Convert to base64
-            buffer = io.BytesIO()
-            img.save(buffer, format='PNG')
-            img_base64 = base64.b64encode(buffer.getvalue()).decode()
+        except Exception as e:
+            raise Exception(f"QR code generation failed: {str(e)}")
+    
+    async def generate_qr_code_async(self, text: str, size: int = 10, use_cache: bool = True, output_format: OutputFormat = OutputFormat.PNG, persist: bool = True, profile: PngProfile = DEFAULT_PNG_PROFILE) -> tuple[Optional[str], str]:
+        """
+        Generate QR code on the render executor without blocking the event loop
+        
+        Args:
+            text: Text to encode
+            size: Module size in pixels (1-40, at least QR_MIN_BOX_SIZE)
+            use_cache: Reuse a previously rendered image when available
+            output_format: PNG or SVG
+            persist: Also persist the image, served from output_dir (in the background)
+            profile: PNG encoding profile (fast, balanced or small)
             
-            return file_path, img_base64
+        Returns:
+            tuple: (file_path or None when not persisted, base64_string)
+        """
+        try:
+            output_format = OutputFormat(output_format)
+            artifact = await render_pipeline.render(
+                self._render_key(text, size, output_format, profile), output_format, "qr",
+                QR_RENDERERS[output_format], text, 1, qr_box_size(size), 4, "L",
+                use_cache=use_cache,
+                sinks=self._sinks(use_cache, persist),
+                profile=profile
+            )
+            return artifact.file_path, artifact.base64
             
         except Exception as e:
             raise Exception(f"QR code generation failed: {str(e)}")
     
-    def cleanup_old_files(self, max_files: int = 100):
-        """Clean up old QR code files to prevent storage overflow"""
-        try:
-            files = [f for f in os.listdir(self.output_dir) if f.startswith('qr_')]
-            if len(files) > max_files:
-                files.sort(key=lambda x: os.path.getctime(os.path.join(self.output_dir, x)))
-                for file in files[:-max_files]:
-                    os.remove(os.path.join(self.output_dir, file))
-        except Exception:
-            pass  # Silent cleanup failure
\ No newline at end of file
+    def _render_key(self, text: str, size: int, output_format: OutputFormat, profile: PngProfile) -> str:
+        """Cache key for a QR code rendered with this service's settings"""
+        return make_render_key(text, "qr", size=1, box_size=qr_box_size(size), border=4, ecc="L", output_format=output_format.value, profile=PngProfile(profile).value)
+    
+    def _sinks(self, use_cache: bool, persist: bool) -> list:
+        """Sinks for one render: the cache store and, when a file is wanted, disk"""
+        sinks = []
+        if use_cache:
+            sinks.append(cache_sink)
+        if persist:
+            sinks.append(self.persist_sink)
+        return sinks
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def make_render_key(
+    payload: str,
+    symbology: str,
+    size: Optional[int] = None,
+    box_size: Optional[int] = None,
+    border: Optional[int] = None,
+    ecc: Optional[str] = None,
+    output_format: str = "png",
+    profile: Optional[str] = None
+) -> str:
+    """
+    Build a content-addressed cache key for a render request
+
+    Args:
+        payload: Text encoded in the symbol
+        symbology: "qr" or a barcode format name
+        size: QR version (or other symbology-specific size)
+        box_size: Pixels per module
+        border: Quiet zone width in modules
+        ecc: Error correction level
+        output_format: Encoded output format, e.g. "png"
+        profile: PNG encoding profile (ignored for other formats)
+
+    Returns:
+        str: SHA-256 hex digest identifying the rendered output
+    """
+    output_format = getattr(output_format, "value", output_format).lower()
+    profile = getattr(profile, "value", profile).lower() if profile is not None and output_format == "png" else None
+    canonical = json.dumps(
+        [payload, str(symbology).lower(), size, box_size, border, ecc, output_format, profile],
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """In-process LRU cache of encoded images bounded by a total byte budget"""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return cached bytes for key and mark them as recently used"""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store bytes under key, evicting least recently used entries as needed"""
+        size = len(data)
+        if size > self.max_bytes:
+            return  # Never let a single entry flush the whole cache
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= len(previous)
+
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+                self.evictions += 1
+
+            self._entries[key] = data
+            self.current_bytes += size
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache counters and occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+# Shared by the REST endpoints, the A2A handler and the services
+render_cache = RenderCache(int(os.getenv("RENDER_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)))
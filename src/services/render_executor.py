@@ -0,0 +1,211 @@
+import asyncio
+import functools
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from src.services.render_scheduler import API, BULK, RenderScheduler, tenant_weights_from_env
+from src.utils.metrics import METRICS_ENABLED, replay_stages, run_capturing_stages
+
+logger = logging.getLogger(__name__)
+
+
+class RenderQueueFull(Exception):
+    """Raised instead of queueing a render when too many are already waiting for a slot"""
+
+    def __init__(self, waiting: int, retry_after: int = 1):
+        super().__init__(f"Render queue is full ({waiting} waiting), retry later")
+        self.waiting = waiting
+        self.retry_after = retry_after
+
+
+class RenderExecutor:
+    """
+    Runs CPU-bound encode/PNG work in a process pool so the event loop stays responsive
+
+    Jobs wait for one of max_queue slots in the scheduler, which serves chat
+    replies before API calls and API calls before bulk batches (see
+    RenderScheduler). Any object with the same slot(), waiting(), stats()
+    and metric_lines() can be plugged in instead. Once max_waiting jobs are
+    waiting, run() raises RenderQueueFull instead of queueing another.
+
+    Where worker processes can't be started (no /dev/shm, no fork, a
+    sandbox), the failure is logged once and renders run on a thread pool
+    instead, as with mode "thread".
+
+    Recycling workers after max_tasks_per_child jobs is off by default. It
+    needs Python 3.11 and makes ProcessPoolExecutor use the spawn start
+    method, so every new and recycled worker re-imports the app stack
+    (hundreds of milliseconds each), and the main module, which fails when
+    it was read from stdin or a REPL. On older Pythons recycling is skipped.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        max_tasks_per_child: Optional[int] = None,
+        mode: Optional[str] = None,
+        scheduler: Optional[Any] = None,
+        max_waiting: Optional[int] = None
+    ):
+        """
+        Args:
+            max_workers: Worker processes (RENDER_WORKERS, defaults to the CPU count)
+            max_queue: Jobs allowed in flight before callers wait (RENDER_QUEUE_SIZE)
+            max_tasks_per_child: Jobs a worker runs before it is recycled, 0 for never (RENDER_MAX_TASKS_PER_CHILD, default 0)
+            mode: "process", "thread" or "sync"; "sync" renders inline, for tests (RENDER_EXECUTOR)
+            scheduler: Orders jobs waiting for a slot (a RenderScheduler with max_queue slots by default)
+            max_waiting: Jobs allowed to wait for a slot before run() refuses more (RENDER_MAX_WAITING, default 4 * max_queue)
+        """
+        self.mode = (mode or os.getenv("RENDER_EXECUTOR", "process")).lower()
+        self.max_workers = max_workers or int(os.getenv("RENDER_WORKERS", "0")) or (os.cpu_count() or 1)
+        self.max_queue = max_queue or int(os.getenv("RENDER_QUEUE_SIZE", "64"))
+        if max_tasks_per_child is None:
+            max_tasks_per_child = int(os.getenv("RENDER_MAX_TASKS_PER_CHILD", "0"))
+        if max_tasks_per_child and sys.version_info < (3, 11):
+            logger.warning("Render worker recycling needs Python 3.11; workers are not recycled")
+            max_tasks_per_child = 0
+        self.max_tasks_per_child = max_tasks_per_child
+        self.max_waiting = max_waiting or int(os.getenv("RENDER_MAX_WAITING", "0")) or self.max_queue * 4
+
+        self._pool: Optional[Executor] = None
+        self._pool_lock = threading.Lock()
+        self.fallback_reason: Optional[str] = None
+        self.scheduler = scheduler or RenderScheduler(
+            self.max_queue,
+            max_wait={
+                API: float(os.getenv("RENDER_MAX_WAIT_API", "1")),
+                BULK: float(os.getenv("RENDER_MAX_WAIT_BULK", "5"))
+            },
+            tenant_weights=tenant_weights_from_env()
+        )
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.pool_restarts = 0
+
+    def _get_pool(self) -> Executor:
+        """Create the worker pool on first use"""
+        with self._pool_lock:
+            if self._pool is None and self.mode == "process":
+                try:
+                    # max_tasks_per_child switches the pool to the spawn start method
+                    options = {"max_tasks_per_child": self.max_tasks_per_child} if self.max_tasks_per_child else {}
+                    self._pool = ProcessPoolExecutor(max_workers=self.max_workers, **options)
+                except (OSError, NotImplementedError, ImportError) as e:
+                    self._fall_back(e)
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="render")
+            return self._pool
+
+    def _fall_back(self, error: BaseException) -> None:
+        """Render on threads from now on (called with _pool_lock held)"""
+        logger.error(f"Render worker processes can't be started ({error!r}); rendering on threads instead")
+        self.mode = "thread"
+        self.fallback_reason = repr(error)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _submit(self, call: Callable[[], Any]) -> Future:
+        """Hand a job to the pool; workers are started here, so a platform that can't start them is caught here too"""
+        try:
+            return self._get_pool().submit(call)
+        except (OSError, NotImplementedError) as e:
+            with self._pool_lock:
+                if self.mode != "process":
+                    raise
+                self._fall_back(e)
+            return self._get_pool().submit(call)
+
+    def _reset_pool(self) -> None:
+        """Discard a broken pool so the next job starts fresh workers"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+                self.pool_restarts += 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run fn(*args, **kwargs) on a worker and await its result
+
+        Args:
+            fn: Module-level (picklable) render function
+            *args: Positional arguments for fn
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            The value returned by fn
+
+        Raises:
+            RenderQueueFull: When max_waiting jobs are already waiting for a slot
+        """
+        waiting = self.scheduler.waiting()
+        if waiting >= self.max_waiting:
+            self.rejected += 1
+            raise RenderQueueFull(waiting)
+        self.submitted += 1
+
+        async with self.scheduler.slot():
+            self.in_flight += 1
+            try:
+                if self.mode == "sync":
+                    result = fn(*args, **kwargs)
+                    self.completed += 1
+                    return result
+                if METRICS_ENABLED:
+                    # Stage timings recorded in the worker are shipped back with the result
+                    result, stages = await asyncio.wrap_future(self._submit(functools.partial(run_capturing_stages, fn, *args, **kwargs)))
+                    replay_stages(stages)
+                else:
+                    result = await asyncio.wrap_future(self._submit(functools.partial(fn, *args, **kwargs)))
+                self.completed += 1
+                return result
+            except BrokenProcessPool:
+                logger.error("Render worker died, restarting pool")
+                self.failed += 1
+                self._reset_pool()
+                raise
+            except Exception:
+                self.failed += 1
+                raise
+            finally:
+                self.in_flight -= 1
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker processes"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait, cancel_futures=True)
+                self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return executor configuration and job counters"""
+        return {
+            "mode": self.mode,
+            "fallback_reason": self.fallback_reason,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "max_waiting": self.max_waiting,
+            "max_tasks_per_child": self.max_tasks_per_child,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "in_flight": self.in_flight,
+            "pool_restarts": self.pool_restarts,
+            "scheduler": self.scheduler.stats()
+        }
+
+
+# Shared by the REST endpoints, the A2A handler and the services
+render_executor = RenderExecutor()
@@ -0,0 +1,259 @@
+import asyncio
+import base64
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Sequence
+
+from src.models.request_models import OutputFormat
+from src.services.render_cache import RenderCache, render_cache
+from src.services.pack_store import PackStore, pack_store
+from src.services.render_executor import RenderExecutor, render_executor
+from src.services.retention import RetentionManager, retention_manager
+from src.services.shared_cache import SharedCache, shared_cache
+from src.services.single_flight import SingleFlight
+from src.utils.metrics import ERRORS_TOTAL, stage
+
+logger = logging.getLogger(__name__)
+
+
+class RenderArtifact:
+    """An image encoded exactly once and shared by every sink and the response"""
+
+    def __init__(self, key: str, data: bytes, output_format: OutputFormat, prefix: str, from_cache: bool = False):
+        self.key = key
+        self.data = data
+        self.output_format = OutputFormat(output_format)
+        self.prefix = prefix
+        self.from_cache = from_cache
+        self.file_path: Optional[str] = None
+
+    @property
+    def base64(self) -> str:
+        with stage("base64", symbology=self.prefix, size_bucket="all"):
+            return base64.b64encode(self.data).decode()
+
+    @property
+    def data_uri(self) -> str:
+        return f"data:{self.output_format.mime_type};base64,{self.base64}"
+
+
+class CacheSink:
+    """Stores freshly rendered artifacts in the render cache, the cache shared with other workers and, so they survive restarts, the pack store"""
+
+    def __init__(self, cache: RenderCache = render_cache, store: Optional[PackStore] = pack_store, shared: Optional[SharedCache] = shared_cache):
+        self.cache = cache
+        self.store = store
+        self.shared = shared
+
+    def emit(self, artifact: RenderArtifact) -> None:
+        if not artifact.from_cache:
+            self.cache.put(artifact.key, artifact.data)
+            if self.shared is not None:
+                self.shared.put(artifact.key, artifact.data)
+            if self.store is not None:
+                self.store.put_async(artifact.key, artifact.data, artifact.output_format.value)
+
+
+class PackSink:
+    """Persists artifacts to the pack store under a name derived from the render key"""
+
+    def __init__(self, output_dir: str = "static/images", store: PackStore = pack_store):
+        self.output_dir = output_dir
+        self.store = store
+
+    def emit(self, artifact: RenderArtifact) -> None:
+        """Name the artifact after its key (served from /static/images) and append it in the background"""
+        artifact.file_path = os.path.join(self.output_dir, packed_name(artifact.prefix, artifact.key, artifact.output_format))
+        self.store.put_async(artifact.key, artifact.data, artifact.output_format.value)
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Block until queued appends are written"""
+        self.store.flush(timeout)
+
+
+def packed_name(prefix: str, key: str, output_format: OutputFormat) -> str:
+    """File name a packed image is served under, e.g. qr_<render key>.png"""
+    return f"{prefix}_{key}.{OutputFormat(output_format).value}"
+
+
+def persist_sink(output_dir: str = "static/images") -> Any:
+    """Sink the services persist through: the pack store, or files in output_dir when PACK_STORE=0"""
+    return PackSink(output_dir) if pack_store is not None else DiskSink(output_dir)
+
+
+class DiskSink:
+    """Persists artifacts to a directory on a background thread, off the request path"""
+
+    def __init__(self, output_dir: str = "static/images", retention: Optional[RetentionManager] = retention_manager):
+        self.output_dir = output_dir
+        self.retention = retention
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="render-disk")
+
+    def emit(self, artifact: RenderArtifact) -> None:
+        """Assign the artifact a file path now and write it in the background"""
+        filename = f"{artifact.prefix}_{uuid.uuid4().hex[:8]}.{artifact.output_format.value}"
+        artifact.file_path = os.path.join(self.output_dir, filename)
+
+        self._writer.submit(self._write, artifact.file_path, artifact.data)
+
+    def _write(self, file_path: str, data: bytes) -> None:
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            # Write then rename so /static never serves a partial file
+            tmp_path = f"{file_path}.tmp"
+            with open(tmp_path, 'wb') as img_file:
+                img_file.write(data)
+            os.replace(tmp_path, file_path)
+            if self.retention is not None:
+                self.retention.record(file_path, len(data))
+        except OSError as e:
+            logger.error(f"Failed to persist {file_path}: {str(e)}")
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Block until queued writes are on disk"""
+        # The single writer thread runs jobs in order, so a no-op marks the end of the queue
+        self._writer.submit(lambda: None).result(timeout=timeout)
+
+
+class RenderPipeline:
+    """
+    Renders an image once (or takes it from the cache) and fans it out to sinks
+
+    The caller always gets the encoded bytes back in memory; sinks such as
+    CacheSink and PackSink decide what else happens to them. A render cache
+    miss falls back to the cache shared by all workers (when SHARED_CACHE=1)
+    and then the pack store before rendering. Concurrent
+    renders of the same key share one encode (see SingleFlight), whether or
+    not the cache is used.
+    """
+
+    def __init__(
+        self,
+        cache: RenderCache = render_cache,
+        executor: RenderExecutor = render_executor,
+        store: Optional[PackStore] = pack_store,
+        shared: Optional[SharedCache] = shared_cache
+    ):
+        self.cache = cache
+        self.executor = executor
+        self.store = store
+        self.shared = shared
+        self.flights = SingleFlight()
+
+    def _lookup(self, key: str, use_cache: bool) -> Optional[bytes]:
+        """Look the key up in the memory caches (no file I/O)"""
+        if not use_cache:
+            return None
+        data = self.cache.get(key)
+        if data is None and self.shared is not None:
+            # Rendered by another worker
+            data = self.shared.get(key)
+            if data is not None:
+                self.cache.put(key, data)
+        return data
+
+    def _lookup_store(self, key: str) -> Optional[bytes]:
+        """Look the key up in the pack store; a store that can't be read counts as a miss"""
+        try:
+            stored = self.store.get(key)
+        except OSError as e:
+            logger.warning(f"Pack store lookup failed: {str(e)}")
+            return None
+        if stored is None:
+            return None
+        # Promote images persisted by an earlier process into the in-memory caches
+        data = bytes(stored[0])
+        self.cache.put(key, data)
+        if self.shared is not None:
+            self.shared.put(key, data)
+        return data
+
+    def _profile_kwargs(self, output_format: OutputFormat, profile: Optional[str]) -> dict:
+        # SVG renderers take no encoding profile
+        if profile is None or OutputFormat(output_format) is not OutputFormat.PNG:
+            return {}
+        return {"profile": getattr(profile, "value", profile)}
+
+    def _emit(self, artifact: RenderArtifact, sinks: Sequence[Any]) -> RenderArtifact:
+        for sink in sinks:
+            sink.emit(artifact)
+        return artifact
+
+    async def render(
+        self,
+        key: str,
+        output_format: OutputFormat,
+        prefix: str,
+        render: Callable[..., bytes],
+        *args: Any,
+        use_cache: bool = True,
+        sinks: Sequence[Any] = (),
+        profile: Optional[str] = None
+    ) -> RenderArtifact:
+        """
+        Render on the executor unless cached, then emit to sinks
+
+        Args:
+            key: Key built with make_render_key
+            output_format: Format produced by render
+            prefix: Artifact name prefix, e.g. "qr" or "barcode"
+            render: Module-level render function
+            *args: Arguments for render
+            use_cache: Look the key up in the cache first
+            sinks: Sinks receiving the artifact
+            profile: PNG encoding profile passed to render (PNG output only)
+
+        Returns:
+            RenderArtifact: The encoded image
+        """
+        data = self._lookup(key, use_cache)
+        if data is None and use_cache and self.store is not None:
+            # Opening the store or catching up with other workers touches the disk: keep it off the loop
+            data = await asyncio.get_running_loop().run_in_executor(None, self._lookup_store, key)
+        artifact = RenderArtifact(key, data, output_format, prefix, from_cache=data is not None)
+        if data is None:
+            kwargs = self._profile_kwargs(output_format, profile)
+            artifact.data = await self.flights.do(key, lambda: self._run(prefix, render, args, kwargs))
+        return self._emit(artifact, sinks)
+
+    async def _run(self, prefix: str, render: Callable[..., bytes], args: Sequence[Any], kwargs: dict) -> bytes:
+        try:
+            return await self.executor.run(render, *args, **kwargs)
+        except Exception:
+            ERRORS_TOTAL.inc(source=prefix)
+            raise
+
+    def render_sync(
+        self,
+        key: str,
+        output_format: OutputFormat,
+        prefix: str,
+        render: Callable[..., bytes],
+        *args: Any,
+        use_cache: bool = True,
+        sinks: Sequence[Any] = (),
+        profile: Optional[str] = None
+    ) -> RenderArtifact:
+        """Blocking variant of render that encodes in the calling thread"""
+        data = self._lookup(key, use_cache)
+        if data is None and use_cache and self.store is not None:
+            data = self._lookup_store(key)
+        artifact = RenderArtifact(key, data, output_format, prefix, from_cache=data is not None)
+        if data is None:
+            kwargs = self._profile_kwargs(output_format, profile)
+            artifact.data = self.flights.do_sync(key, lambda: self._run_sync(prefix, render, args, kwargs))
+        return self._emit(artifact, sinks)
+
+    def _run_sync(self, prefix: str, render: Callable[..., bytes], args: Sequence[Any], kwargs: dict) -> bytes:
+        try:
+            return render(*args, **kwargs)
+        except Exception:
+            ERRORS_TOTAL.inc(source=prefix)
+            raise
+
+
+# Shared by the REST endpoints, the A2A handler and the services
+render_pipeline = RenderPipeline()
+cache_sink = CacheSink()
@@ -0,0 +1,332 @@
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+
+from src.utils.metrics import REQUEST_BUCKETS, labelled_gauge_lines, registry
+
+INTERACTIVE = "interactive"
+API = "api"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, API, BULK)  # highest first
+PRIORITY_RANK = {priority: rank for rank, priority in enumerate(PRIORITIES)}
+DEFAULT_PRIORITY = API
+ANONYMOUS = "anonymous"
+
+# Seconds a job may wait before it is served ahead of higher classes
+DEFAULT_MAX_WAIT = {API: 1.0, BULK: 5.0}
+MAX_IDLE_TENANTS = 1024  # finish tags kept for tenants with nothing queued
+
+RENDER_QUEUE_WAIT_SECONDS = registry.histogram(
+    "qrbar_render_queue_wait_seconds",
+    "Time a render waited for an executor slot, by priority class",
+    ["priority"],
+    (0.0,) + REQUEST_BUCKETS
+)
+RENDER_STARVATION_PROMOTIONS_TOTAL = registry.counter(
+    "qrbar_render_starvation_promotions_total",
+    "Renders served ahead of higher priority classes after waiting too long",
+    ["priority"]
+)
+
+# Priority class and tenant of the renders started in the current context
+_render_priority: contextvars.ContextVar[Optional[Tuple[str, str]]] = contextvars.ContextVar("render_priority", default=None)
+# Set for renders shared by several callers, whose class can be raised after they start
+_shared_priority: contextvars.ContextVar[Optional["SharedPriority"]] = contextvars.ContextVar("shared_priority", default=None)
+
+
+@contextlib.contextmanager
+def render_priority(priority: str, tenant: Optional[str] = None) -> Iterator[None]:
+    """Run renders started in this block (and tasks created in it) under a priority class and tenant"""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown render priority: {priority}")
+    token = _render_priority.set((priority, tenant or ANONYMOUS))
+    try:
+        yield
+    finally:
+        _render_priority.reset(token)
+
+
+def current_priority() -> Tuple[str, str]:
+    """(priority, tenant) set with render_priority, or the API class for an anonymous tenant"""
+    return _render_priority.get() or (DEFAULT_PRIORITY, ANONYMOUS)
+
+
+class SharedPriority:
+    """
+    Priority class and tenant of one render awaited by several callers
+
+    It starts as the class of the caller that started the render and is
+    raised to the class of any higher caller that joins, moving the job
+    if it is already waiting for a slot. A chat reply that joins a render
+    a batch started therefore doesn't wait in the bulk queue.
+    """
+
+    __slots__ = ("priority", "tenant", "_scheduler", "_job")
+
+    def __init__(self, priority: str, tenant: str):
+        self.priority = priority
+        self.tenant = tenant
+        self._scheduler: Optional["RenderScheduler"] = None
+        self._job: Optional["_Job"] = None
+
+    def raise_to(self, priority: str, tenant: str) -> None:
+        """Serve the render at least at this priority class, on behalf of tenant"""
+        if PRIORITY_RANK[priority] >= PRIORITY_RANK[self.priority]:
+            return
+        self.priority = priority
+        self.tenant = tenant
+        if self._job is not None and self._job.live:
+            self._scheduler._requeue(self._job, priority, tenant)
+
+
+@contextlib.contextmanager
+def shared_priority() -> Iterator[SharedPriority]:
+    """Start renders in this block (and tasks created in it) at the current priority, raisable through the handle"""
+    handle = SharedPriority(*current_priority())
+    token = _shared_priority.set(handle)
+    try:
+        yield handle
+    finally:
+        _shared_priority.reset(token)
+
+
+class _Job:
+    __slots__ = ("future", "priority", "tenant", "cost", "enqueued", "finish", "state")
+
+    def __init__(self, future: "asyncio.Future[None]", priority: str, tenant: str, cost: float, enqueued: float, finish: float):
+        self.future = future
+        self.priority = priority
+        self.tenant = tenant
+        self.cost = cost
+        self.enqueued = enqueued
+        self.finish = finish
+        self.state = "waiting"  # then "running" or "cancelled"
+
+    @property
+    def live(self) -> bool:
+        # A cancelled caller's future is done before its except block marks the job
+        return self.state == "waiting" and not self.future.done()
+
+
+class _ClassQueue:
+    """Waiting jobs of one priority class, ordered by weighted fair queuing between tenants"""
+
+    def __init__(self, priority: str):
+        self.priority = priority
+        self.heap: List[Tuple[float, int, _Job]] = []
+        self.arrivals: Deque[_Job] = deque()  # enqueue order, for starvation checks
+        self.virtual_time = 0.0
+        self.last_finish: Dict[str, float] = {}
+        self.waiting = 0
+        self.dispatched = 0
+        self.promoted = 0
+
+    def _queued(self, job: _Job) -> bool:
+        # Jobs moved to a higher class leave a stale entry behind
+        return job.live and job.priority == self.priority
+
+    def oldest(self) -> Optional[_Job]:
+        while self.arrivals and not self._queued(self.arrivals[0]):
+            self.arrivals.popleft()
+        return self.arrivals[0] if self.arrivals else None
+
+    def fairest(self) -> Optional[_Job]:
+        while self.heap and not self._queued(self.heap[0][2]):
+            heapq.heappop(self.heap)
+        return self.heap[0][2] if self.heap else None
+
+    def push(self, job: _Job, sequence: int) -> None:
+        heapq.heappush(self.heap, (job.finish, sequence, job))
+        # Keep arrivals in enqueue order, which a moved job may predate
+        index = len(self.arrivals)
+        while index and self.arrivals[index - 1].enqueued > job.enqueued:
+            index -= 1
+        self.arrivals.insert(index, job)
+        self.waiting += 1
+
+    def finish_tag(self, tenant: str, cost: float, weight: float) -> float:
+        start = max(self.virtual_time, self.last_finish.get(tenant, 0.0))
+        self.last_finish[tenant] = start + cost / weight
+        return self.last_finish[tenant]
+
+
+class RenderScheduler:
+    """
+    Hands out the render executor's slots by priority class, tenant and wait time
+
+    Jobs queue in three classes: interactive (chat replies), api and bulk
+    (batches). A free slot goes to the highest class with a waiting job.
+    Within a class, tenants share slots by weighted fair queuing: each job
+    gets a virtual finish tag (the tenant's previous tag, or the class's
+    virtual time if later, plus cost / weight), and the lowest tag goes
+    next. A tenant flooding the queue therefore only delays itself.
+
+    To prevent starvation, a job in a lower class that has waited longer
+    than its class's max_wait is served before the higher classes.
+
+    The scheduler is bound to one event loop, like the executor's queue.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        max_wait: Optional[Dict[str, float]] = None,
+        tenant_weights: Optional[Dict[str, float]] = None
+    ):
+        """
+        Args:
+            capacity: Jobs allowed to run at once
+            max_wait: Seconds before a waiting api or bulk job jumps the higher classes
+            tenant_weights: Relative share per tenant (default 1)
+        """
+        self.capacity = capacity
+        self.max_wait = {**DEFAULT_MAX_WAIT, **(max_wait or {})}
+        self.tenant_weights = dict(tenant_weights or {})
+        self.running = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sequence = itertools.count()
+        self._queues = {priority: _ClassQueue(priority) for priority in PRIORITIES}
+
+    def _bind(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Futures from another loop can't be resumed here; start over
+            self._loop = loop
+            self.running = 0
+            for queue in self._queues.values():
+                queue.heap.clear()
+                queue.arrivals.clear()
+                queue.waiting = 0
+
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: Optional[str] = None, tenant: Optional[str] = None, cost: float = 1.0) -> AsyncIterator[None]:
+        """Hold one executor slot, waiting in line for it first"""
+        shared = None
+        if priority is None:
+            shared = _shared_priority.get()
+            priority, tenant = (shared.priority, shared.tenant) if shared is not None else current_priority()
+        await self.acquire(priority, tenant or ANONYMOUS, cost, shared)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, priority: str, tenant: str, cost: float = 1.0, shared: Optional[SharedPriority] = None) -> None:
+        self._bind()
+        queue = self._queues[priority]
+        if self.running < self.capacity and not any(q.waiting for q in self._queues.values()):
+            self.running += 1
+            queue.dispatched += 1
+            RENDER_QUEUE_WAIT_SECONDS.observe(0.0, priority=priority)
+            return
+
+        finish = queue.finish_tag(tenant, cost, self.tenant_weights.get(tenant, 1.0))
+        job = _Job(self._loop.create_future(), priority, tenant, cost, time.monotonic(), finish)
+        queue.push(job, next(self._sequence))
+        if shared is not None:
+            shared._scheduler, shared._job = self, job
+        self._fill()  # slots may be free while cancelled jobs still count as waiting
+        try:
+            await job.future
+        except asyncio.CancelledError:
+            if job.state == "running":
+                self.release()  # granted just as the caller went away
+            else:
+                job.state = "cancelled"
+                self._queues[job.priority].waiting -= 1
+            raise
+
+    def _requeue(self, job: _Job, priority: str, tenant: str) -> None:
+        """Move a waiting job to another class, keeping its enqueue time"""
+        self._queues[job.priority].waiting -= 1
+        queue = self._queues[priority]
+        job.priority = priority
+        job.tenant = tenant
+        job.finish = queue.finish_tag(tenant, job.cost, self.tenant_weights.get(tenant, 1.0))
+        queue.push(job, next(self._sequence))
+
+    def release(self) -> None:
+        self.running -= 1
+        self._fill()
+
+    def _fill(self) -> None:
+        while self.running < self.capacity:
+            job = self._next()
+            if job is None:
+                break
+            self._dispatch(job)
+
+    def _next(self) -> Optional[_Job]:
+        now = time.monotonic()
+        overdue = None
+        for priority in PRIORITIES[1:]:
+            oldest = self._queues[priority].oldest()
+            if oldest is not None and now - oldest.enqueued >= self.max_wait[priority]:
+                if overdue is None or oldest.enqueued < overdue.enqueued:
+                    overdue = oldest
+        if overdue is not None:
+            self._queues[overdue.priority].promoted += 1
+            RENDER_STARVATION_PROMOTIONS_TOTAL.inc(priority=overdue.priority)
+            return overdue
+        for priority in PRIORITIES:
+            job = self._queues[priority].fairest()
+            if job is not None:
+                return job
+        return None
+
+    def _dispatch(self, job: _Job) -> None:
+        queue = self._queues[job.priority]
+        job.state = "running"
+        queue.waiting -= 1
+        queue.dispatched += 1
+        queue.virtual_time = max(queue.virtual_time, job.finish)
+        if len(queue.last_finish) > MAX_IDLE_TENANTS:
+            # Tenants behind the virtual time start from it anyway
+            queue.last_finish = {t: f for t, f in queue.last_finish.items() if f > queue.virtual_time}
+        self.running += 1
+        RENDER_QUEUE_WAIT_SECONDS.observe(time.monotonic() - job.enqueued, priority=job.priority)
+        job.future.set_result(None)
+
+    def waiting(self, priorities: Tuple[str, ...] = PRIORITIES) -> int:
+        """Jobs queued for a slot in these classes"""
+        return sum(self._queues[priority].waiting for priority in priorities)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return slots in use and, per class, queue depth, dispatches and starvation promotions"""
+        now = time.monotonic()
+        classes = {}
+        for priority, queue in self._queues.items():
+            oldest = queue.oldest()
+            classes[priority] = {
+                "waiting": queue.waiting,
+                "dispatched": queue.dispatched,
+                "promoted": queue.promoted,
+                "oldest_wait_seconds": round(now - oldest.enqueued, 6) if oldest is not None else None,
+                "max_wait_seconds": self.max_wait.get(priority)
+            }
+        return {"capacity": self.capacity, "running": self.running, "classes": classes}
+
+    def metric_lines(self) -> List[str]:
+        """Queue depth per class, for registry.register_collector"""
+        return labelled_gauge_lines(
+            "qrbar_render_queue_depth",
+            "Renders waiting for an executor slot",
+            "priority",
+            {priority: queue.waiting for priority, queue in self._queues.items()}
+        )
+
+
+def tenant_weights_from_env() -> Dict[str, float]:
+    """RENDER_TENANT_WEIGHTS, e.g. "channel:ops=4,channel:marketing=0.5\""""
+    weights = {}
+    for pair in os.getenv("RENDER_TENANT_WEIGHTS", "").split(","):
+        tenant, _, weight = pair.strip().rpartition("=")
+        if tenant:
+            weights[tenant] = float(weight)
+    return weights
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_INTERVAL_SECONDS = 60
+
+# Only generated artifacts are managed; anything else kept in the directory is left alone
+ARTIFACT_PREFIXES = ("qr_", "barcode_")
+
+
+class RetentionManager:
+    """
+    Keeps generated images within a byte budget and a TTL
+
+    Files are indexed in memory as they are written (the directory is only
+    scanned once, at startup), oldest first, so a sweep walks the front of
+    the index instead of listing and stat-ing the whole directory. Only
+    qr_* and barcode_* files are indexed, so nothing else in the directory
+    is ever deleted.
+    """
+
+    def __init__(
+        self,
+        directory: str = "static/images",
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        interval_seconds: float = DEFAULT_INTERVAL_SECONDS
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.interval_seconds = interval_seconds
+
+        self._index: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()  # path -> (bytes, created)
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.current_bytes = 0
+        self.evicted_ttl = 0
+        self.evicted_budget = 0
+        self.sweeps = 0
+
+    def rebuild(self) -> int:
+        """Index generated files already on disk; returns the number of files found"""
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.startswith(ARTIFACT_PREFIXES) and not entry.name.endswith(".tmp") and entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.path, stat.st_size))
+        except FileNotFoundError:
+            pass
+
+        scanned = {path for _, path, _ in entries}
+        with self._lock:
+            # Files recorded while the scan ran off the event loop are newer than anything it found
+            recorded = [(path, entry) for path, entry in self._index.items() if path not in scanned]
+            self._index.clear()
+            self.current_bytes = 0
+            for created, path, size in sorted(entries):
+                self._index[path] = (size, created)
+                self.current_bytes += size
+            for path, (size, created) in recorded:
+                self._index[path] = (size, created)
+                self.current_bytes += size
+        return len(entries)
+
+    def record(self, path: str, size: int, created: Optional[float] = None) -> None:
+        """Add a freshly written file to the index"""
+        with self._lock:
+            previous = self._index.pop(path, None)
+            if previous is not None:
+                self.current_bytes -= previous[0]
+            self._index[path] = (size, created if created is not None else time.time())
+            self.current_bytes += size
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Delete expired files, then the oldest files until the byte budget is met
+
+        Args:
+            now: Reference time (defaults to time.time())
+
+        Returns:
+            int: Number of files evicted
+        """
+        now = time.time() if now is None else now
+        expired, over_budget = [], []
+
+        with self._lock:
+            self.sweeps += 1
+            while self._index:
+                path, (size, created) = next(iter(self._index.items()))
+                if now - created >= self.ttl_seconds:
+                    expired.append(path)
+                elif self.current_bytes > self.max_bytes:
+                    over_budget.append(path)
+                else:
+                    break
+                self._index.popitem(last=False)
+                self.current_bytes -= size
+            self.evicted_ttl += len(expired)
+            self.evicted_budget += len(over_budget)
+
+        # Unlink outside the lock so writers recording new files never wait on the disk
+        for path in expired + over_budget:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to remove {path}: {str(e)}")
+        return len(expired) + len(over_budget)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            # The startup scan stats every file, so it stays off the event loop too
+            await loop.run_in_executor(None, self.rebuild)
+            await loop.run_in_executor(None, self.sweep)
+        except Exception as e:
+            logger.error(f"Retention startup scan failed: {str(e)}")
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await loop.run_in_executor(None, self.sweep)
+            except Exception as e:
+                logger.error(f"Retention sweep failed: {str(e)}")
+
+    def start(self) -> None:
+        """Start the background task that rebuilds the index, sweeps, then sweeps periodically (idempotent)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the periodic sweep"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            oldest = next(iter(self._index.values()))[1] if self._index else None
+            return {
+                "directory": self.directory,
+                "files": len(self._index),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "interval_seconds": self.interval_seconds,
+                "oldest_age_seconds": round(time.time() - oldest, 1) if oldest is not None else None,
+                "evicted_ttl": self.evicted_ttl,
+                "evicted_budget": self.evicted_budget,
+                "sweeps": self.sweeps,
+                "running": self._task is not None and not self._task.done()
+            }
+
+
+# Shared by every DiskSink writing to static/images
+retention_manager = RetentionManager(
+    os.getenv("RETENTION_DIR", "static/images"),
+    int(os.getenv("RETENTION_MAX_BYTES", DEFAULT_MAX_BYTES)),
+    float(os.getenv("RETENTION_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+    float(os.getenv("RETENTION_INTERVAL_SECONDS", DEFAULT_INTERVAL_SECONDS))
+)
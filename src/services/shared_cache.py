@@ -0,0 +1,329 @@
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, Optional
+
+from src.services.pack_store import key_bytes
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single process, so the thread lock is enough
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAME = "qrbar-render-cache"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_SLOTS = 16384
+WAYS = 8  # slots per bucket; a full bucket replaces its oldest slot
+
+# Segment layout: header, index of fixed-size slots, then the slab (a ring of records)
+HEADER = struct.Struct("<8sIIQQQQQQQ")  # magic, slots, ways, slab bytes, head, tail, puts, evictions, recovered, generation
+MAGIC = b"QRSHM001"
+HEAD, TAIL, PUTS, EVICTIONS, RECOVERED = 24, 32, 40, 48, 56  # header offsets of the shared counters
+SLOT = struct.Struct("<Q32sQII")  # sequence (odd while being written), key, record position, data length, created
+SEQUENCE = struct.Struct("<Q")
+RECORD = struct.Struct("<32sII")  # key (all zeros for padding), data length, CRC-32 of data
+PADDING_KEY = bytes(32)
+EMPTY_SLOT = SLOT.pack(0, PADDING_KEY, 0, 0, 0)[8:]
+
+
+class SharedCache:
+    """
+    Render cache shared by every worker process through one shared memory segment
+
+    Each uvicorn worker keeps its own RenderCache; this tier sits behind it so
+    an image rendered by one worker is a hit for the others. The segment holds
+    a set-associative index and a fixed-size slab used as a ring: records are
+    written at the head and the oldest are evicted from the tail (FIFO), so
+    memory use never grows.
+
+    Reads take no lock. Every index slot is a seqlock: its sequence number is
+    odd while a writer updates it, and a reader that sees it odd or changed
+    after copying the data treats the lookup as a miss. The record's key and
+    CRC-32 are checked as well, so data overwritten by the ring is never
+    returned. Writers are serialized with flock on a lock file, which the
+    kernel releases when a worker dies. A slot left odd by a worker that crashed
+    mid-write is reset by the next writer that finds it. The same happens to
+    every such slot when a process attaches.
+    """
+
+    def __init__(
+        self,
+        name: str = DEFAULT_NAME,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        slots: int = DEFAULT_SLOTS,
+        lock_path: Optional[str] = None
+    ):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.slots = max(WAYS, slots - slots % WAYS)
+        self.lock_path = lock_path or os.path.join(tempfile.gettempdir(), f"{name}.lock")
+
+        self._thread_lock = threading.Lock()
+        self._lock_fd = -1
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._buf: Optional[memoryview] = None
+        self._slab_start = HEADER.size + self.slots * SLOT.size
+        self.created = False
+        self._unusable = False
+
+        # Per process; puts, evictions and recoveries are counted in the segment
+        self.hits = 0
+        self.misses = 0
+        self.torn_reads = 0
+
+    # Attaching
+
+    def attach(self) -> bool:
+        """Attach to the segment, creating it if no worker has yet (idempotent); False if unusable"""
+        if self._buf is not None or self._unusable:
+            return self._buf is not None
+        try:
+            with self._writer():
+                if self._buf is not None:
+                    return True
+                size = self._slab_start + self.max_bytes
+                try:
+                    shm = shared_memory.SharedMemory(self.name)
+                except FileNotFoundError:
+                    shm = shared_memory.SharedMemory(self.name, create=True, size=size)
+                    HEADER.pack_into(shm.buf, 0, MAGIC, self.slots, WAYS, self.max_bytes, 0, 0, 0, 0, 0, int(time.time()))
+                    self.created = True
+                # Every worker attaches; the segment must outlive any one of them (see unlink)
+                resource_tracker.unregister(shm._name, "shared_memory")
+
+                magic, slots, ways, slab_bytes = HEADER.unpack_from(shm.buf, 0)[:4]
+                if magic != MAGIC or slots != self.slots or ways != WAYS or slab_bytes != self.max_bytes or shm.size < size:
+                    logger.warning(f"Shared cache {self.name} has a different layout; not using it")
+                    shm.close()
+                    self._unusable = True
+                    return False
+                self._shm = shm
+                self._buf = shm.buf
+                self._recover()
+                return True
+        except OSError as e:
+            # No /dev/shm, ENOSPC/ENOMEM or an unwritable lock file: run with the per-worker cache only
+            logger.warning(f"Shared cache {self.name} unavailable ({e}); not using it")
+            self._unusable = True
+            return False
+
+    def _recover(self) -> None:
+        """Reset slots a crashed writer left half-written (caller holds the writer lock)"""
+        for slot in range(self.slots):
+            if SEQUENCE.unpack_from(self._buf, self._slot_offset(slot))[0] & 1:
+                self._clear_slot(slot)
+                self._add_counter(RECOVERED, 1)
+
+    def close(self) -> None:
+        """Detach this process from the segment"""
+        with self._thread_lock:
+            if self._shm is not None:
+                self._buf = None
+                self._shm.close()
+                self._shm = None
+
+    def unlink(self) -> None:
+        """Remove the segment once every worker is gone (called by the process that launched them)"""
+        self.close()
+        try:
+            shm = shared_memory.SharedMemory(self.name)
+        except FileNotFoundError:
+            return
+        shm.close()
+        shm.unlink()
+
+    # Locking
+
+    def _writer(self) -> "_WriterLock":
+        return _WriterLock(self)
+
+    def _acquire(self) -> None:
+        self._thread_lock.acquire()
+        if fcntl is not None:
+            try:
+                if self._lock_fd < 0:
+                    self._lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            except OSError:
+                self._thread_lock.release()
+                raise
+
+    def _release(self) -> None:
+        if fcntl is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+    # Layout helpers
+
+    def _slot_offset(self, slot: int) -> int:
+        return HEADER.size + slot * SLOT.size
+
+    def _bucket(self, key: bytes) -> range:
+        first = (int.from_bytes(key[:8], "little") % (self.slots // WAYS)) * WAYS
+        return range(first, first + WAYS)
+
+    def _counter(self, offset: int) -> int:
+        return struct.unpack_from("<Q", self._buf, offset)[0]
+
+    def _add_counter(self, offset: int, value: int) -> None:
+        struct.pack_into("<Q", self._buf, offset, self._counter(offset) + value)
+
+    def _clear_slot(self, slot: int) -> None:
+        offset = self._slot_offset(slot)
+        sequence = SEQUENCE.unpack_from(self._buf, offset)[0]
+        SEQUENCE.pack_into(self._buf, offset, sequence | 1)
+        self._buf[offset + 8:offset + SLOT.size] = EMPTY_SLOT
+        SEQUENCE.pack_into(self._buf, offset, (sequence | 1) + 1)
+
+    # Reads
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return a copy of the cached bytes for key, without taking any lock"""
+        if not self.attach():
+            return None
+        raw_key = key_bytes(key)
+        buf = self._buf
+        for slot in self._bucket(raw_key):
+            offset = self._slot_offset(slot)
+            sequence, stored, position, length, _ = SLOT.unpack_from(buf, offset)
+            if stored != raw_key or sequence & 1 or not length:
+                continue
+            start = self._slab_start + position % self.max_bytes
+            record_key, record_length, crc = RECORD.unpack_from(buf, start)
+            data = bytes(buf[start + RECORD.size:start + RECORD.size + length])
+            if (SEQUENCE.unpack_from(buf, offset)[0] != sequence or record_key != raw_key or
+                    record_length != length or zlib.crc32(data) != crc):
+                # Rewritten or evicted while we copied it
+                self.torn_reads += 1
+                break
+            self.hits += 1
+            return data
+        self.misses += 1
+        return None
+
+    # Writes
+
+    def put(self, key: str, data: bytes) -> bool:
+        """
+        Copy an image into the slab, evicting the oldest records to make room
+
+        Returns:
+            bool: True when stored (False if too large, already present or the segment is unusable)
+        """
+        size = RECORD.size + len(data)
+        if not data or size > self.max_bytes // 4 or not self.attach():
+            return False
+        raw_key = key_bytes(key)
+        with self._writer():
+            buf = self._buf
+            bucket = self._bucket(raw_key)
+            for slot in bucket:
+                offset = self._slot_offset(slot)
+                if SEQUENCE.unpack_from(buf, offset)[0] & 1:
+                    self._clear_slot(slot)  # a writer died here
+                    self._add_counter(RECOVERED, 1)
+                elif SLOT.unpack_from(buf, offset)[1] == raw_key:
+                    return False
+
+            # Records never wrap: pad to the start of the ring when the end is too short
+            head = self._counter(HEAD)
+            room = self.max_bytes - head % self.max_bytes
+            padding = room if room < size else 0
+            self._evict(head + padding + size)
+            if padding:
+                if padding >= RECORD.size:
+                    RECORD.pack_into(buf, self._slab_start + head % self.max_bytes, PADDING_KEY, padding - RECORD.size, 0)
+                head += padding
+
+            start = self._slab_start + head % self.max_bytes
+            RECORD.pack_into(buf, start, raw_key, len(data), zlib.crc32(data))
+            buf[start + RECORD.size:start + size] = data
+            struct.pack_into("<Q", buf, HEAD, head + size)
+
+            # Publish in an empty slot, or replace the bucket's oldest
+            slot = min(bucket, key=lambda s: (SLOT.unpack_from(buf, self._slot_offset(s))[3] != 0,
+                                              SLOT.unpack_from(buf, self._slot_offset(s))[2]))
+            offset = self._slot_offset(slot)
+            sequence = SEQUENCE.unpack_from(buf, offset)[0]
+            SEQUENCE.pack_into(buf, offset, sequence + 1)
+            buf[offset + 8:offset + SLOT.size] = SLOT.pack(0, raw_key, head, len(data), int(time.time()))[8:]
+            SEQUENCE.pack_into(buf, offset, sequence + 2)
+            self._add_counter(PUTS, 1)
+            return True
+
+    def _evict(self, end: int) -> None:
+        """Advance the tail, unpublishing records, until the slab holds everything before end"""
+        buf = self._buf
+        tail = self._counter(TAIL)
+        while end - tail > self.max_bytes:
+            room = self.max_bytes - tail % self.max_bytes
+            if room < RECORD.size:
+                tail += room
+                continue
+            raw_key, length, _ = RECORD.unpack_from(buf, self._slab_start + tail % self.max_bytes)
+            if raw_key != PADDING_KEY:
+                for slot in self._bucket(raw_key):
+                    _, stored, position, _, _ = SLOT.unpack_from(buf, self._slot_offset(slot))
+                    if stored == raw_key and position == tail:
+                        self._clear_slot(slot)
+                        self._add_counter(EVICTIONS, 1)
+            tail += RECORD.size + length
+        struct.pack_into("<Q", buf, TAIL, tail)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return segment occupancy, shared write counters and this process's hits and misses"""
+        if not self.attach():
+            return {"name": self.name, "attached": False}
+        _, slots, _, slab_bytes, head, tail, puts, evictions, recovered, _ = HEADER.unpack_from(self._buf, 0)
+        entries = sum(1 for slot in range(slots) if SLOT.unpack_from(self._buf, self._slot_offset(slot))[3])
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "attached": True,
+            "entries": entries,
+            "slots": slots,
+            "bytes": head - tail,
+            "max_bytes": slab_bytes,
+            "puts": puts,
+            "evictions": evictions,
+            "recovered": recovered,
+            "hits": self.hits,
+            "misses": self.misses,
+            "torn_reads": self.torn_reads,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class _WriterLock:
+    """Context manager holding the thread lock and the cross-process flock"""
+
+    __slots__ = ("cache",)
+
+    def __init__(self, cache: SharedCache):
+        self.cache = cache
+
+    def __enter__(self) -> None:
+        self.cache._acquire()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.cache._release()
+
+
+def shared_cache_from_env() -> SharedCache:
+    """Build a SharedCache from the SHARED_CACHE_* environment variables"""
+    return SharedCache(
+        os.getenv("SHARED_CACHE_NAME", DEFAULT_NAME),
+        int(os.getenv("SHARED_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+        int(os.getenv("SHARED_CACHE_SLOTS", DEFAULT_SLOTS))
+    )
+
+
+# Shared by the render pipeline in every worker (SHARED_CACHE=1, set by run.py when WORKERS > 1)
+shared_cache = shared_cache_from_env() if os.getenv("SHARED_CACHE", "0") == "1" else None
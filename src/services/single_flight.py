@@ -0,0 +1,114 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from src.services.render_scheduler import SharedPriority, current_priority, shared_priority
+
+
+class _Call:
+    """A blocking computation shared by every thread asking for the same key"""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one computation
+
+    The first caller for a key (the leader) starts the work; callers arriving
+    before it finishes wait for the same result or exception instead of
+    starting their own. Nothing is remembered once the work is done, so this
+    complements the render cache rather than replacing it: it covers the
+    window before the cache is filled.
+
+    The work runs at the highest render priority among its callers: a
+    caller from a higher class raises it when joining (see SharedPriority).
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Tuple[int, str], Tuple["asyncio.Future[Any]", SharedPriority]] = {}
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.collapsed = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn() once per key among concurrent callers
+
+        The work runs in its own task and callers await it through
+        asyncio.shield, so a caller that is cancelled (e.g. the client went
+        away) leaves the render running for everyone else.
+
+        Args:
+            key: Normalized identity of the work, e.g. a render key
+            fn: Coroutine function started by the leader
+
+        Returns:
+            The value returned by fn (its exception is raised to every caller)
+        """
+        # Tasks belong to one event loop
+        slot = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            flight = self._tasks.get(slot)
+            if flight is None:
+                with shared_priority() as priority:
+                    task = asyncio.ensure_future(fn())
+                task.add_done_callback(lambda finished: self._forget(slot, finished))
+                self._tasks[slot] = (task, priority)
+                self.leaders += 1
+            else:
+                task, priority = flight
+                priority.raise_to(*current_priority())
+                self.collapsed += 1
+        return await asyncio.shield(task)
+
+    def do_sync(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Blocking variant of do for callers on different threads"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.collapsed += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _forget(self, slot: Tuple[int, str], task: "asyncio.Future[Any]") -> None:
+        with self._lock:
+            flight = self._tasks.get(slot)
+            if flight is not None and flight[0] is task:
+                del self._tasks[slot]
+        # Mark the exception as retrieved even when every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return in-flight work and how many calls were collapsed onto it"""
+        with self._lock:
+            return {
+                "in_flight": len(self._tasks) + len(self._calls),
+                "leaders": self.leaders,
+                "collapsed": self.collapsed
+            }
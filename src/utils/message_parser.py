@@ -1,13 +1,15 @@
 import re
-from typing import Dict, Any
-from src.models.request_models import BarcodeFormat
+from typing import Dict, Any, Optional
+from src.models.request_models import BarcodeFormat, OutputFormat, PngProfile
+from src.utils.metrics import stage
 
 class MessageParser:
     """Utility class for parsing Telex messages following Single Responsibility Principle"""
     
     def __init__(self):
-        self.qr_pattern = re.compile(r'^qr\s+(?:size:(\d+)\s+)?(.+)', re.IGNORECASE)
-        self.barcode_pattern = re.compile(r'^barcode\s+(?:format:(\w+)\s+)?(.+)', re.IGNORECASE)
+        self.qr_pattern = re.compile(r'^qr\s+((?:(?:size:\d+|format:\w+|profile:\w+)\s+)*)(.+)', re.IGNORECASE)
+        self.barcode_pattern = re.compile(r'^barcode\s+((?:(?:format:\w+|profile:\w+)\s+)*)(.+)', re.IGNORECASE)
+        self.option_pattern = re.compile(r'(\w+):(\w+)')
     
     def parse_message(self, message: str) -> Dict[str, Any]:
         """
@@ -19,23 +21,42 @@ class MessageParser:
         Returns:
             Dict containing parsed command information
         """
+        with stage("parse", symbology="none", size_bucket="none"):
+            return self._parse(message)
+    
+    def _parse(self, message: str) -> Dict[str, Any]:
+        """Match message against the command patterns"""
         message = message.strip()
         
         # Check for QR command
         qr_match = self.qr_pattern.match(message)
         if qr_match:
-            size = int(qr_match.group(1)) if qr_match.group(1) else 10
+            options = self._parse_options(qr_match.group(1))
+            size = int(options["size"]) if "size" in options else 10
             text = qr_match.group(2).strip()
             return {
                 "type": "qr",
                 "text": text,
-                "size": min(max(size, 1), 40)  # Clamp between 1-40
+                "size": min(max(size, 1), 40),  # Clamp between 1-40
+                "output_format": self._output_format(options.get("format")),
+                "profile": self._profile(options.get("profile"))
             }
         
         # Check for barcode command
         barcode_match = self.barcode_pattern.match(message)
         if barcode_match:
-            format_str = barcode_match.group(1) if barcode_match.group(1) else "code128"
+            # format: names either the symbology or the output format (png/svg)
+            format_str = "code128"
+            output_format = OutputFormat.PNG
+            profile = None
+            for value in self.option_pattern.findall(barcode_match.group(1)):
+                if value[0].lower() == "profile":
+                    profile = self._profile(value[1])
+                    continue
+                try:
+                    output_format = OutputFormat(value[1].lower())
+                except ValueError:
+                    format_str = value[1]
             text = barcode_match.group(2).strip()
             
             # Validate format
@@ -47,7 +68,9 @@ class MessageParser:
             return {
                 "type": "barcode",
                 "text": text,
-                "format": barcode_format
+                "format": barcode_format,
+                "output_format": output_format,
+                "profile": profile
             }
         
         # Check for help commands
@@ -59,11 +82,30 @@ class MessageParser:
             return {
                 "type": "qr",
                 "text": message,
-                "size": 10
+                "size": 10,
+                "output_format": OutputFormat.PNG
             }
         
         return {"type": "help"}
     
+    def _parse_options(self, options: str) -> Dict[str, str]:
+        """Parse leading key:value options into a dict (later values win)"""
+        return {key.lower(): value for key, value in self.option_pattern.findall(options or "")}
+    
+    def _output_format(self, value: str) -> OutputFormat:
+        """Map a format: option to an output format, defaulting to PNG"""
+        try:
+            return OutputFormat((value or "png").lower())
+        except ValueError:
+            return OutputFormat.PNG
+    
+    def _profile(self, value: Optional[str]) -> Optional[PngProfile]:
+        """Map a profile: option to a PNG encoding profile (None when absent or unknown)"""
+        try:
+            return PngProfile(value.lower()) if value else None
+        except ValueError:
+            return None
+    
     def extract_url_from_text(self, text: str) -> str:
         """Extract URL from text if present"""
         url_pattern = re.compile(r'https?://[^\s]+')
@@ -0,0 +1,302 @@
+import bisect
+import contextlib
+import contextvars
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Each stage observation costs a few microseconds (a handful per render); METRICS_ENABLED=false turns it off
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() not in ("0", "false", "no", "off")
+
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed set of label names"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = STAGE_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # per-bucket counts, then sum, then count
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        self.observe_key(value, tuple(str(labels.get(name, "")) for name in self.labelnames))
+
+    def observe_key(self, value: float, key: Tuple[str, ...]) -> None:
+        """observe() with label values already ordered like labelnames (the hot path)"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    """Holds metrics and renders them in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = STAGE_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], List[str]]) -> None:
+        """Add a callable returning exposition lines computed at scrape time"""
+        self._collectors.append(collector)
+
+    def expose(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+def counter_lines(name: str, documentation: str, value: float) -> List[str]:
+    """Exposition lines for an unlabelled counter read from elsewhere (e.g. cache stats)"""
+    return [f"# HELP {name} {documentation}", f"# TYPE {name} counter", f"{name} {_format_value(value)}"]
+
+
+def gauge_lines(name: str, documentation: str, value: float) -> List[str]:
+    """Exposition lines for an unlabelled gauge read at scrape time (e.g. queue depth)"""
+    return [f"# HELP {name} {documentation}", f"# TYPE {name} gauge", f"{name} {_format_value(value)}"]
+
+
+def labelled_gauge_lines(name: str, documentation: str, label: str, values: Dict[str, float]) -> List[str]:
+    """Exposition lines for a gauge with one label read at scrape time (e.g. queue depth per class)"""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+    for value_label, value in values.items():
+        lines.append(f"{name}{_format_labels((label,), (value_label,))} {_format_value(value)}")
+    return lines
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "qrbar_render_stage_seconds",
+    "Time spent in each generation stage",
+    ["stage", "symbology", "size_bucket"]
+)
+REQUEST_SECONDS = registry.histogram(
+    "qrbar_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["endpoint"],
+    REQUEST_BUCKETS
+)
+REQUESTS_TOTAL = registry.counter("qrbar_http_requests_total", "HTTP responses by route and status class", ["endpoint", "status"])
+ERRORS_TOTAL = registry.counter("qrbar_errors_total", "Failed requests and renders", ["source"])
+BYTES_OUT_TOTAL = registry.counter("qrbar_response_bytes_total", "Response body bytes sent by route", ["endpoint"])
+
+
+# Labels applied to stages recorded in the current context, e.g. symbology="qr"
+_stage_labels: contextvars.ContextVar[Optional[Dict[str, str]]] = contextvars.ContextVar("stage_labels", default=None)
+# When set, stages are appended here instead of observed (used inside render worker processes)
+_stage_capture: contextvars.ContextVar[Optional[List[Tuple[str, Dict[str, str], float]]]] = contextvars.ContextVar("stage_capture", default=None)
+
+_NO_LABELS: Dict[str, str] = {}
+
+
+def qr_size_bucket(version: int) -> str:
+    """Bucket QR versions into the small/medium/large ranges of ISO 18004"""
+    if version <= 9:
+        return "v1-9"
+    if version <= 26:
+        return "v10-26"
+    return "v27-40"
+
+
+def observe_stage(name: str, seconds: float, labels: Optional[Dict[str, str]] = None) -> None:
+    """Record the duration of one pipeline stage"""
+    if not METRICS_ENABLED:
+        return
+    labels = labels if labels is not None else (_stage_labels.get() or _NO_LABELS)
+    captured = _stage_capture.get()
+    if captured is not None:
+        captured.append((name, dict(labels), seconds))
+        return
+    STAGE_SECONDS.observe_key(seconds, (name, labels.get("symbology", "none"), labels.get("size_bucket", "none")))
+
+
+class _StageTimer:
+    __slots__ = ("name", "labels", "started")
+
+    def __init__(self, name: str, labels: Optional[Dict[str, str]]):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe_stage(self.name, time.perf_counter() - self.started, self.labels)
+        return False
+
+
+_NOOP = contextlib.nullcontext()
+
+
+def stage(name: str, **labels: str):
+    """Time a block as a pipeline stage; labels default to those set with stage_labels"""
+    if not METRICS_ENABLED:
+        return _NOOP
+    return _StageTimer(name, labels or None)
+
+
+@contextlib.contextmanager
+def stage_labels(**labels: str) -> Iterator[Dict[str, str]]:
+    """Set labels for stages in this block; the yielded dict can be updated as they become known"""
+    current = dict(labels)
+    token = _stage_labels.set(current)
+    try:
+        yield current
+    finally:
+        _stage_labels.reset(token)
+
+
+def update_stage_labels(**labels: str) -> None:
+    """Update the labels of the enclosing stage_labels block, if any"""
+    current = _stage_labels.get()
+    if current is not None:
+        current.update(labels)
+
+
+def run_capturing_stages(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[Any, List[Tuple[str, Dict[str, str], float]]]:
+    """Run fn in a worker process and return (result, stage_records) for replay_stages in the parent"""
+    records: List[Tuple[str, Dict[str, str], float]] = []
+    token = _stage_capture.set(records)
+    try:
+        return fn(*args, **kwargs), records
+    finally:
+        _stage_capture.reset(token)
+
+
+def replay_stages(records: List[Tuple[str, Dict[str, str], float]]) -> None:
+    """Observe stage records captured in another process"""
+    for name, labels, seconds in records:
+        observe_stage(name, seconds, labels)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status and bytes out per route
+
+    The endpoint label is the route's path template (e.g. /api/v1/qr.{extension}),
+    so it stays low-cardinality whatever the request path is.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths: Dict[Any, str] = {}
+
+    def _endpoint_label(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            for route in getattr(scope.get("app"), "routes", []):
+                if getattr(route, "endpoint", None) is not None:
+                    self._route_paths[route.endpoint] = route.path
+            path = self._route_paths.get(endpoint, "unmatched")
+        return path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        body_bytes = 0
+
+        async def send_wrapper(message):
+            nonlocal status, body_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                body_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            endpoint = self._endpoint_label(scope)
+            REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+            REQUESTS_TOTAL.inc(endpoint=endpoint, status=f"{status // 100}xx")
+            BYTES_OUT_TOTAL.inc(body_bytes, endpoint=endpoint)
+            if status >= 500:
+                ERRORS_TOTAL.inc(source="http")
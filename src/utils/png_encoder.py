@@ -0,0 +1,133 @@
+import struct
+import zlib
+from typing import Optional, Tuple
+
+import numpy as np
+
+from src.utils.metrics import stage
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+DEFAULT_COMPRESS_LEVEL = 6  # zlib's default, which is what Pillow uses for PNG
+
+
+class EncodingProfile:
+    """zlib settings for one named PNG profile; with several candidates the smallest stream wins"""
+
+    __slots__ = ("name", "levels", "strategies")
+
+    def __init__(self, name: str, levels: Tuple[int, ...], strategies: Tuple[int, ...] = (zlib.Z_DEFAULT_STRATEGY,)):
+        self.name = name
+        self.levels = levels
+        self.strategies = strategies
+
+    def compress(self, raw: bytes) -> bytes:
+        """Deflate raw scanlines with every level/strategy pair and keep the shortest result"""
+        best = None
+        for level in self.levels:
+            for strategy in self.strategies:
+                compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS, 9, strategy)
+                data = compressor.compress(raw) + compressor.flush()
+                if best is None or len(data) < len(best):
+                    best = data
+        return best
+
+
+# Scanlines are always 1-bit grayscale with filter type None: on bilevel rows the
+# Sub/Up/Paeth filters and a PLTE palette only make the file larger, so "small"
+# searches zlib levels and strategies instead
+PNG_PROFILES = {
+    # Interactive (A2A) traffic: one cheap deflate pass
+    "fast": EncodingProfile("fast", (1,)),
+    "balanced": EncodingProfile("balanced", (DEFAULT_COMPRESS_LEVEL,)),
+    # CDN-cached output, encoded once and served many times
+    "small": EncodingProfile("small", (6, 9), (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED))
+}
+
+
+def png_profile(name: str) -> EncodingProfile:
+    """Look up a PNG_PROFILES entry by name"""
+    try:
+        return PNG_PROFILES[str(getattr(name, "value", name)).lower()]
+    except KeyError:
+        raise ValueError(f"Unknown PNG profile: {name} (expected one of {', '.join(PNG_PROFILES)})")
+
+
+def _chunk(tag: bytes, data: bytes) -> bytes:
+    """Build a PNG chunk: length, tag, data, CRC"""
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+
+def bilevel_scanlines(light: np.ndarray, scale_x: int = 1, scale_y: int = 1) -> bytes:
+    """
+    Build the raw (unfiltered, uncompressed) 1-bit scanlines for a boolean matrix
+
+    Every matrix row is widened with np.repeat, bit-packed once with
+    np.packbits and then repeated scale_y times as identical scanlines, so
+    the work is proportional to the number of module rows rather than pixels.
+
+    Args:
+        light: 2-D bool array, True for white pixels
+        scale_x: Pixels per cell horizontally
+        scale_y: Pixels per cell vertically
+
+    Returns:
+        bytes: Scanlines, each prefixed with filter type 0
+    """
+    light = np.asarray(light, dtype=bool)
+    rows = light.shape[0]
+    packed = np.packbits(np.repeat(light, scale_x, axis=1), axis=1)
+    # Filter type 0 (None) at the start of every scanline
+    scanlines = np.concatenate([np.zeros((rows, 1), dtype=np.uint8), packed], axis=1)
+    return np.repeat(scanlines, scale_y, axis=0).tobytes()
+
+
+def png_from_scanlines(raw: bytes, width: int, height: int, compress_level: int = DEFAULT_COMPRESS_LEVEL, profile: Optional[str] = None) -> bytes:
+    """Compress 1-bit grayscale scanlines (at compress_level, or per a PNG_PROFILES name) and wrap them in PNG chunks"""
+    header = struct.pack(">IIBBBBB", width, height, 1, 0, 0, 0, 0)
+    idat = png_profile(profile).compress(raw) if profile is not None else zlib.compress(raw, compress_level)
+    return b"".join([
+        PNG_SIGNATURE,
+        _chunk(b"IHDR", header),
+        _chunk(b"IDAT", idat),
+        _chunk(b"IEND", b"")
+    ])
+
+
+def encode_bilevel_png(light: np.ndarray, scale_x: int = 1, scale_y: int = 1, compress_level: int = DEFAULT_COMPRESS_LEVEL, profile: Optional[str] = None) -> bytes:
+    """
+    Encode a boolean matrix as a 1-bit grayscale PNG, scaling each cell up
+
+    Args:
+        light: 2-D bool array, True for white pixels
+        scale_x: Pixels per cell horizontally
+        scale_y: Pixels per cell vertically
+        compress_level: zlib level 0-9 (0 = store, 1 = fastest, 9 = smallest)
+        profile: PNG_PROFILES name, overriding compress_level
+
+    Returns:
+        bytes: PNG image
+    """
+    rows, cols = np.shape(light)
+    with stage("rasterize"):
+        raw = bilevel_scanlines(light, scale_x, scale_y)
+    with stage("compress"):
+        return png_from_scanlines(raw, cols * scale_x, rows * scale_y, compress_level, profile)
+
+
+def encode_module_matrix_png(modules, box_size: int, border: int, compress_level: int = DEFAULT_COMPRESS_LEVEL, profile: Optional[str] = None) -> bytes:
+    """
+    Rasterize a QR-style module matrix (truthy = dark) with a quiet zone straight to PNG
+
+    Args:
+        modules: Square module matrix without border
+        box_size: Pixels per module
+        border: Quiet zone width in modules
+        compress_level: zlib level 0-9
+        profile: PNG_PROFILES name, overriding compress_level
+
+    Returns:
+        bytes: 1-bit PNG, pixel-identical to qrcode's PIL image factory output
+    """
+    dark = np.array(modules, dtype=bool)
+    light = np.pad(~dark, border, constant_values=True)
+    return encode_bilevel_png(light, box_size, box_size, compress_level, profile)
@@ -0,0 +1,107 @@
+from typing import Dict, Iterator, List, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+
+def row_runs(row: Sequence[bool]) -> Iterator[Tuple[int, int]]:
+    """
+    Yield (start, length) for each run of dark modules in a row
+
+    Args:
+        row: Module values, truthy for dark
+
+    Yields:
+        tuple: (start_index, run_length)
+    """
+    start = None
+    for x, dark in enumerate(row):
+        if dark and start is None:
+            start = x
+        elif not dark and start is not None:
+            yield start, x - start
+            start = None
+    if start is not None:
+        yield start, len(row) - start
+
+
+def modules_to_path(rows: Sequence[Sequence[bool]], x_offset: float = 0, y_offset: float = 0, row_height: float = 1) -> str:
+    """
+    Convert a module matrix into compact SVG path data
+
+    Horizontal runs of dark modules become one rectangle, and identical runs on
+    consecutive rows are merged vertically, so a path has far fewer segments
+    than there are modules.
+
+    Args:
+        rows: Module matrix, one sequence per row
+        x_offset: Horizontal offset in module units (quiet zone)
+        y_offset: Vertical offset in module units
+        row_height: Height of one row in module units
+
+    Returns:
+        str: Path data for the d attribute
+    """
+    rects: List[Tuple[float, float, int, float]] = []  # (y, x, width, height)
+    open_rects: Dict[Tuple[int, int], int] = {}  # (start, length) -> first row
+
+    for y, row in enumerate(rows):
+        current = list(row_runs(row))
+        current_set = set(current)
+        for run in [run for run in open_rects if run not in current_set]:
+            first_row = open_rects.pop(run)
+            rects.append((first_row, run[0], run[1], y - first_row))
+        for run in current:
+            open_rects.setdefault(run, y)
+
+    for run, first_row in open_rects.items():
+        rects.append((first_row, run[0], run[1], len(rows) - first_row))
+
+    # Emit top-to-bottom, left-to-right with relative moves between rectangles
+    segments: List[str] = []
+    last_x = last_y = None
+    for first_row, start, length, rows_spanned in sorted(rects):
+        x = start + x_offset
+        y = first_row * row_height + y_offset
+        if last_x is None:
+            segments.append(f"M{_num(x)} {_num(y)}")
+        else:
+            segments.append(f"m{_num(x - last_x)} {_num(y - last_y)}")
+        segments.append(f"h{length}v{_num(rows_spanned * row_height)}h-{length}z")
+        last_x, last_y = x, y
+
+    return "".join(segments)
+
+
+def svg_document(width: float, height: float, path_data: str, scale: float = 1, extra: str = "") -> bytes:
+    """
+    Wrap path data in a minimal standalone SVG document
+
+    Args:
+        width: Width in module units
+        height: Height in module units
+        path_data: Dark module path data
+        scale: Pixels per module for the width/height attributes
+        extra: Additional SVG elements (already escaped)
+
+    Returns:
+        bytes: UTF-8 encoded SVG
+    """
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{_num(width * scale)}" height="{_num(height * scale)}" '
+        f'viewBox="0 0 {_num(width)} {_num(height)}" shape-rendering="crispEdges">'
+        f'<rect width="100%" height="100%" fill="#fff"/>'
+        f'<path fill="#000" d="{path_data}"/>'
+        f'{extra}</svg>'
+    ).encode("utf-8")
+
+
+def svg_text(x: float, y: float, text: str, font_size: float) -> str:
+    """Return a centred, escaped SVG text element"""
+    return (
+        f'<text x="{_num(x)}" y="{_num(y)}" font-family="monospace" font-size="{_num(font_size)}" '
+        f'text-anchor="middle">{escape(text)}</text>'
+    )
+
+
+def _num(value: float) -> str:
+    """Format a number without a trailing .0"""
+    return f"{value:g}"
@@ -1,25 +1,187 @@
-import requests
 import asyncio
+import httpx
+import random
+import time
 from typing import Optional, Dict, Any
 import logging
 import os
 from datetime import datetime
+from src.utils.metrics import registry
 
 logger = logging.getLogger(__name__)
 
+TELEX_REQUESTS_TOTAL = registry.counter("qrbar_telex_requests_total", "Telex webhook calls by operation and outcome", ["operation", "outcome"])
+TELEX_RETRIES_TOTAL = registry.counter("qrbar_telex_retries_total", "Telex webhook retry attempts", ["operation"])
+TELEX_REQUEST_SECONDS = registry.histogram(
+    "qrbar_telex_request_seconds",
+    "Telex webhook call latency including retries",
+    ["operation"],
+    (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+# Statuses worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
 class TelexClient:
     """Client for communicating with Telex.im platform following A2A protocol"""
     
-    def __init__(self):
-        self.webhook_url = os.getenv("TELEX_WEBHOOK_URL", "https://api.telex.im/webhook")
-        self.agent_name = os.getenv("AGENT_NAME", "QRBarcodeBot")
-        self.session = requests.Session()
-        self.session.headers.update({
+    def __init__(
+        self,
+        webhook_url: Optional[str] = None,
+        agent_name: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        timeout: Optional[float] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        """
+        Args:
+            webhook_url: Telex webhook (TELEX_WEBHOOK_URL)
+            agent_name: Sender name (AGENT_NAME)
+            max_connections: Pooled keep-alive connections (TELEX_MAX_CONNECTIONS)
+            max_concurrency: Calls in flight before callers wait (TELEX_MAX_CONCURRENCY)
+            max_retries: Retries after the first attempt (TELEX_MAX_RETRIES)
+            timeout: Per-attempt timeout in seconds (TELEX_TIMEOUT)
+            backoff_base: First retry delay ceiling in seconds (TELEX_BACKOFF_BASE)
+            backoff_max: Largest retry delay ceiling in seconds (TELEX_BACKOFF_MAX)
+            transport: Custom httpx transport, e.g. httpx.MockTransport in tests
+        """
+        self.webhook_url = webhook_url or os.getenv("TELEX_WEBHOOK_URL", "https://api.telex.im/webhook")
+        self.agent_name = agent_name or os.getenv("AGENT_NAME", "QRBarcodeBot")
+        self.max_connections = max_connections or int(os.getenv("TELEX_MAX_CONNECTIONS", "10"))
+        self.max_concurrency = max_concurrency or int(os.getenv("TELEX_MAX_CONCURRENCY", "10"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("TELEX_MAX_RETRIES", "3"))
+        self.timeout = timeout or float(os.getenv("TELEX_TIMEOUT", "10"))
+        self.backoff_base = backoff_base or float(os.getenv("TELEX_BACKOFF_BASE", "0.5"))
+        self.backoff_max = backoff_max or float(os.getenv("TELEX_BACKOFF_MAX", "8"))
+        self.headers = {
             "Content-Type": "application/json",
             "User-Agent": f"{self.agent_name}/1.0"
-        })
+        }
+        self._transport = transport
+        
+        # The pool and the semaphore belong to the event loop that first uses them
+        self._client: Optional[httpx.AsyncClient] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    async def _bind_loop(self) -> httpx.AsyncClient:
+        """Return the pooled client and concurrency semaphore for the running loop, closing the previous loop's pool"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            stale, stale_loop = self._client, self._loop
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                transport=self._transport
+            )
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+            if stale is not None:
+                await self._close_pool(stale, stale_loop)
+        return self._client
+    
+    @staticmethod
+    async def _close_pool(client: httpx.AsyncClient, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        """Close a pool on the event loop that owns its connections"""
+        if loop is not None and loop is not asyncio.get_running_loop() and loop.is_running():
+            # Still serving another thread: its connections must be closed there
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            return
+        try:
+            await client.aclose()
+        except RuntimeError as e:
+            # The old loop is closed, so its sockets can't be shut down cleanly; they go with the client
+            logger.debug(f"Telex client pool from a closed event loop dropped: {e}")
+    
+    def _backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Exponential backoff with full jitter, never shorter than a server's Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+    
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> Optional[float]:
+        try:
+            return float(response.headers["Retry-After"])
+        except (KeyError, ValueError):
+            return None
+    
+    async def _post(self, operation: str, url: str, payload: Dict[str, Any], deadline: Optional[float] = None) -> bool:
+        """
+        POST payload with bounded concurrency and retries
+        
+        Args:
+            operation: Metrics label, e.g. "send_message"
+            url: Target URL
+            payload: JSON body
+            deadline: Total seconds allowed for waiting and all attempts (defaults to no limit beyond the retries)
+        
+        Returns:
+            bool: True once a 2xx response is received
+        """
+        client = await self._bind_loop()
+        started = time.perf_counter()
+        expires = started + deadline if deadline is not None else None
+        outcome = "error"
+        
+        try:
+            # Waiting for a slot counts against the deadline (or one timeout without one)
+            wait = expires - time.perf_counter() if expires is not None else self.timeout
+            try:
+                await asyncio.wait_for(self._slots.acquire(), max(wait, 0))
+            except asyncio.TimeoutError:
+                outcome = "queue_timeout"
+                logger.error(f"Telex {operation} gave up: no free slot within {max(wait, 0):.2f}s")
+                return False
+            
+            try:
+                for attempt in range(self.max_retries + 1):
+                    remaining = expires - time.perf_counter() if expires is not None else self.timeout
+                    if remaining <= 0:
+                        outcome = "deadline"
+                        logger.error(f"Telex {operation} gave up: deadline exceeded")
+                        return False
+                    
+                    retry_after = None
+                    try:
+                        response = await client.post(url, json=payload, timeout=min(self.timeout, remaining))
+                        if response.is_success:
+                            outcome = "success"
+                            return True
+                        outcome = "http_error"
+                        if response.status_code not in RETRYABLE_STATUSES:
+                            logger.error(f"Telex {operation} failed: HTTP {response.status_code}")
+                            return False
+                        retry_after = self._retry_after(response)
+                        logger.warning(f"Telex {operation} attempt {attempt + 1} got HTTP {response.status_code}")
+                    except httpx.TransportError as e:
+                        outcome = "transport_error"
+                        logger.warning(f"Telex {operation} attempt {attempt + 1} failed: {str(e) or type(e).__name__}")
+                    
+                    if attempt == self.max_retries:
+                        break
+                    delay = self._backoff(attempt, retry_after)
+                    if expires is not None and time.perf_counter() + delay >= expires:
+                        outcome = "deadline"
+                        break
+                    TELEX_RETRIES_TOTAL.inc(operation=operation)
+                    await asyncio.sleep(delay)
+                
+                logger.error(f"Telex {operation} failed after {attempt + 1} attempt(s) ({outcome})")
+                return False
+            finally:
+                self._slots.release()
+        finally:
+            TELEX_REQUESTS_TOTAL.inc(operation=operation, outcome=outcome)
+            TELEX_REQUEST_SECONDS.observe(time.perf_counter() - started, operation=operation)
     
-    async def send_message(self, channel_id: str, message: str, image_data: Optional[str] = None) -> bool:
+    async def send_message(self, channel_id: str, message: str, image_data: Optional[str] = None, deadline: Optional[float] = None) -> bool:
         """
         Send message to Telex channel
         
@@ -27,32 +189,27 @@ class TelexClient:
             channel_id: Target channel ID
             message: Text message to send
             image_data: Optional base64 image data
-            
+            deadline: Total seconds allowed, including retries
+        
         Returns:
             bool: Success status
         """
-        try:
-            payload = {
-                "channel_id": channel_id,
-                "agent_name": self.agent_name,
-                "message": message,
-                "timestamp": datetime.utcnow().isoformat(),
-                "type": "text"
-            }
-            
-            if image_data:
-                payload["image"] = image_data
-                payload["type"] = "image"
-            
-            response = self.session.post(self.webhook_url, json=payload, timeout=10)
-            response.raise_for_status()
-            
+        payload = {
+            "channel_id": channel_id,
+            "agent_name": self.agent_name,
+            "message": message,
+            "timestamp": datetime.utcnow().isoformat(),
+            "type": "text"
+        }
+        
+        if image_data:
+            payload["image"] = image_data
+            payload["type"] = "image"
+        
+        sent = await self._post("send_message", self.webhook_url, payload, deadline)
+        if sent:
             logger.info(f"Message sent successfully to channel {channel_id}")
-            return True
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to send message to Telex: {str(e)}")
-            return False
+        return sent
     
     async def send_proactive_message(self, channel_id: str) -> bool:
         """
@@ -60,7 +217,7 @@ class TelexClient:
         
         Args:
             channel_id: Target channel ID
-            
+        
         Returns:
             bool: Success status
         """
@@ -74,7 +231,6 @@ class TelexClient:
             "💡 QR Tip: Use QR codes for restaurant menus - contactless and updatable!"
         ]
         
-        import random
         daily_tip = random.choice(tips)
         
         return await self.send_message(channel_id, daily_tip)
@@ -85,31 +241,40 @@ class TelexClient:
         
         Args:
             response_data: Response data to validate
-            
+        
         Returns:
             bool: Validation result
         """
         required_fields = ["text", "type"]
         return all(field in response_data for field in required_fields)
     
-    async def register_agent(self, agent_config: Dict[str, Any]) -> bool:
+    async def register_agent(self, agent_config: Dict[str, Any], deadline: Optional[float] = None) -> bool:
         """
         Register agent with Telex platform
         
         Args:
             agent_config: Agent configuration
-            
+            deadline: Total seconds allowed, including retries
+        
         Returns:
             bool: Registration success
         """
-        try:
-            registration_url = f"{self.webhook_url}/register"
-            response = self.session.post(registration_url, json=agent_config, timeout=10)
-            response.raise_for_status()
-            
+        registration_url = f"{self.webhook_url}/register"
+        registered = await self._post("register_agent", registration_url, agent_config, deadline)
+        if registered:
             logger.info("Agent registered successfully with Telex")
-            return True
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to register agent: {str(e)}")
-            return False
\ No newline at end of file
+        return registered
+    
+    async def aclose(self) -> None:
+        """Close pooled connections"""
+        if self._client is not None:
+            client, loop = self._client, self._loop
+            self._client = None
+            self._loop = None
+            await self._close_pool(client, loop)
+    
+    async def __aenter__(self) -> "TelexClient":
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
@@ -20,17 +20,28 @@ def start_server():
     print(f"   GET  http://localhost:{port}/.well-known/agent.json")
     print(f"Press Ctrl+C to stop the server\n")
     
+    # Several workers can't reload; they share rendered images through shared memory instead
+    workers = int(os.environ.get("WORKERS", 1))
+    if workers > 1:
+        os.environ.setdefault("SHARED_CACHE", "1")
+        mode = ["--workers", str(workers)]
+    else:
+        mode = ["--reload"]
+    
     try:
         # Start uvicorn server
         subprocess.run([
             sys.executable, "-m", "uvicorn", 
             "src.main:app", 
             "--host", "0.0.0.0", 
-            "--port", str(port),
-            "--reload"
-        ])
+            "--port", str(port)
+        ] + mode)
     except KeyboardInterrupt:
         print("\nServer stopped")
+    finally:
+        if workers > 1 and os.environ["SHARED_CACHE"] == "1":
+            from src.services.shared_cache import shared_cache_from_env
+            shared_cache_from_env().unlink()
 
 if __name__ == "__main__":
     start_server()
\ No newline at end of file
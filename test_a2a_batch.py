@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test script for JSON-RPC batch handling in A2AHandler (no server needed)
+"""
+
+import asyncio
+import os
+
+os.environ.setdefault("RENDER_EXECUTOR", "sync")
+
+from src.services.a2a_handler import A2AHandler
+
+def rpc(text, request_id=None, method="message/send"):
+    request = {
+        "jsonrpc": "2.0",
+        "method": method,
+        "params": {"message": {"role": "user", "parts": [{"kind": "text", "text": text}]}}
+    }
+    if request_id is not None:
+        request["id"] = request_id
+    return request
+
+def test_batch_order_and_notifications():
+    """Responses come back in request order; notifications get none; bad items fail alone"""
+    async def run():
+        handler = A2AHandler()
+        responses = await handler.handle_request([
+            rpc("qr https://example.com", 1),
+            rpc("qr not answered"),
+            rpc("barcode format:ean13 123456789012", "two"),
+            rpc("hello", 3, method="tasks/unknown"),
+            "not an object",
+            rpc("help", 4)
+        ])
+        assert [r["id"] for r in responses] == [1, "two", 3, None, 4]
+        assert responses[0]["result"]["parts"][1]["contentType"] == "image/png"
+        assert responses[1]["result"]["parts"][1]["contentType"] == "image/png"
+        assert responses[2]["error"]["code"] == -32601
+        assert responses[3]["error"]["code"] == -32600
+        assert "Commands" in responses[4]["result"]["parts"][0]["text"]
+    asyncio.run(run())
+
+def test_batch_edge_cases():
+    """Empty and oversized batches are invalid; a batch of notifications returns nothing"""
+    async def run():
+        handler = A2AHandler(max_batch=2)
+        assert (await handler.handle_request([]))["error"]["code"] == -32600
+        assert (await handler.handle_request([rpc("help", i) for i in range(3)]))["error"]["code"] == -32600
+        assert await handler.handle_request([rpc("help"), rpc("help")]) is None
+        assert (await handler.handle_request(rpc("help", 7)))["id"] == 7
+    asyncio.run(run())
+
+def test_batch_concurrency_cap():
+    """Items overlap but never more than batch_concurrency at once"""
+    async def run():
+        handler = A2AHandler(batch_concurrency=3)
+        active = 0
+        max_active = 0
+
+        async def slow_send(params):
+            nonlocal active, max_active
+            active += 1
+            max_active = max(max_active, active)
+            await asyncio.sleep(0.02)
+            active -= 1
+            return handler._create_help_message()
+
+        handler._handle_message_send = slow_send
+        responses = await handler.handle_request([rpc("help", i) for i in range(10)])
+        assert [r["id"] for r in responses] == list(range(10))
+        assert max_active == 3, max_active
+    asyncio.run(run())
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing A2A JSON-RPC batches")
+    print("=" * 60)
+
+    tests = [
+        test_batch_order_and_notifications,
+        test_batch_edge_cases,
+        test_batch_concurrency_cap
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
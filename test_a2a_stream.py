@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test script for A2A message/stream over Server-Sent Events (no server needed)
+"""
+
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("RENDER_EXECUTOR", "sync")
+
+import httpx
+
+from src.services.a2a_handler import A2AHandler
+
+def stream_request(*texts):
+    return {
+        "jsonrpc": "2.0",
+        "method": "message/stream",
+        "id": 1,
+        "params": {"message": {"role": "user", "parts": [{"kind": "text", "text": text} for text in texts]}}
+    }
+
+def events(frames):
+    return [json.loads(frame[len("data: "):])["result"] for frame in frames if frame.startswith("data: ")]
+
+def slow_handler(delays, **kwargs):
+    """Handler whose commands are "<index>" and take delays[index] seconds"""
+    handler = A2AHandler(**kwargs)
+    handler.cancelled = []
+
+    async def respond(text):
+        index = int(text)
+        try:
+            await asyncio.sleep(delays[index])
+        except asyncio.CancelledError:
+            handler.cancelled.append(index)
+            raise
+        return {"role": "agent", "parts": [{"kind": "text", "text": text}], "kind": "message"}
+
+    handler._respond_to_text = respond
+    return handler
+
+def test_status_first_and_artifacts_as_rendered():
+    """The working status arrives at once; artifacts arrive in completion order; completed is last"""
+    async def run():
+        handler = slow_handler([0.3, 0.1, 0.2])
+        stream = handler.stream_request(stream_request("0", "1", "2"))
+        started = time.perf_counter()
+        first = await stream.__anext__()
+        assert time.perf_counter() - started < 0.05, "status event should not wait for renders"
+        frames = [first] + [frame async for frame in stream]
+
+        results = events(frames)
+        assert results[0]["kind"] == "status-update" and results[0]["status"]["state"] == "working"
+        assert [r["artifact"]["metadata"]["index"] for r in results[1:-1]] == [1, 2, 0]
+        assert results[-1]["status"]["state"] == "completed" and results[-1]["final"]
+        assert len({r["taskId"] for r in results}) == 1
+    asyncio.run(run())
+
+def test_heartbeat():
+    """A comment frame is sent while a render is slower than the heartbeat interval"""
+    async def run():
+        handler = slow_handler([0.25], heartbeat_interval=0.05)
+        frames = [frame async for frame in handler.stream_request(stream_request("0"))]
+        assert any(frame.startswith(":") for frame in frames)
+        assert len(events(frames)) == 3
+    asyncio.run(run())
+
+def test_disconnect_cancels_renders():
+    """Closing the stream (client gone) cancels renders still in flight"""
+    async def run():
+        handler = slow_handler([0.01, 5.0, 5.0])
+        stream = handler.stream_request(stream_request("0", "1", "2"))
+        await stream.__anext__()
+        artifact = events([await stream.__anext__()])[0]
+        assert artifact["artifact"]["metadata"]["index"] == 0
+        await stream.aclose()
+        await asyncio.sleep(0)
+        assert sorted(handler.cancelled) == [1, 2]
+    asyncio.run(run())
+
+def test_sse_endpoint_renders_codes():
+    """POST /a2a with message/stream returns text/event-stream with one image per command line"""
+    async def run():
+        from src.main import app
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            request = stream_request("qr https://example.com\nbarcode format:ean8 1234567")
+            async with client.stream("POST", "/a2a", json=request) as response:
+                assert response.headers["content-type"].startswith("text/event-stream")
+                frames = [line async for line in response.aiter_lines() if line]
+        results = events(frames)
+        artifacts = [r["artifact"] for r in results if r["kind"] == "artifact-update"]
+        assert len(artifacts) == 2
+        assert all(a["parts"][1]["contentType"] == "image/png" for a in artifacts)
+        assert results[-1]["status"]["state"] == "completed"
+    asyncio.run(run())
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing A2A message/stream")
+    print("=" * 60)
+
+    tests = [
+        test_status_first_and_artifacts_as_rendered,
+        test_heartbeat,
+        test_disconnect_cancels_renders,
+        test_sse_endpoint_renders_codes
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test script for the linear barcode raster engine against python-barcode's own encoder (no server needed)
+"""
+
+import io
+from itertools import groupby
+
+import barcode
+import numpy as np
+from PIL import Image
+
+from src.services.barcode_raster import (
+    BAR_HEIGHT, GUARD_EXTENSION, GUARD_RANGES, MARGIN, MODULE_WIDTH, QUIET_ZONES,
+    render_linear_batch, render_linear_png
+)
+
+CASES = [
+    ("code128", "12345678"),
+    ("code128", "Hello, World!"),
+    ("ean13", "590123412345"),
+    ("ean8", "9638507"),
+    ("upc", "03600029145")
+]
+
+def reference_pattern(text, format_type):
+    """Module pattern straight from python-barcode, guard modules counted as bars"""
+    return barcode.get_barcode_class(format_type)(text).build()[0].replace("G", "1")
+
+def decode(png):
+    """PNG bytes to a (height, width) bool array, True for light pixels"""
+    return np.asarray(Image.open(io.BytesIO(png)).convert("L")) > 127
+
+def runs(row):
+    """(is_light, length) runs of a pixel or module row"""
+    return [(bool(value), len(list(group))) for value, group in groupby(row)]
+
+def test_bars_match_the_encoder():
+    """Every bar and space is as wide as python-barcode's pattern says, in whole modules"""
+    for format_type, text in CASES:
+        pattern = reference_pattern(text, format_type)
+        image = decode(render_linear_png(text, format_type))
+        left, right = QUIET_ZONES[format_type]
+        assert image.shape[1] == (left + len(pattern) + right) * MODULE_WIDTH, (format_type, image.shape)
+
+        row = image[MARGIN + BAR_HEIGHT // 2, left * MODULE_WIDTH:(left + len(pattern)) * MODULE_WIDTH]
+        expected = [(light, length * MODULE_WIDTH) for light, length in runs([c == "0" for c in pattern])]
+        assert runs(row) == expected, (format_type, text)
+
+def test_quiet_zones_are_blank():
+    """Nothing is drawn in the per-symbology quiet zones or the margin above the bars"""
+    for format_type, text in CASES:
+        pattern = reference_pattern(text, format_type)
+        image = decode(render_linear_png(text, format_type))
+        left, right = QUIET_ZONES[format_type]
+        bars = image[:MARGIN + BAR_HEIGHT + GUARD_EXTENSION]
+        assert bars[:, :left * MODULE_WIDTH].all(), format_type
+        assert bars[:, (left + len(pattern)) * MODULE_WIDTH:].all(), format_type
+        assert bars[:MARGIN].all(), format_type
+        # The first and last modules of every pattern are bars, so the zones end exactly at the symbol
+        assert not bars[MARGIN, left * MODULE_WIDTH] and not bars[MARGIN, (left + len(pattern)) * MODULE_WIDTH - 1]
+
+def test_guard_bars_extend_below_the_others():
+    """Below the data bars only the EAN/UPC guard bars continue: the 101, 01010, 101 start, centre and end patterns"""
+    for format_type, text in CASES:
+        pattern = reference_pattern(text, format_type)
+        image = decode(render_linear_png(text, format_type))
+        left = QUIET_ZONES[format_type][0] * MODULE_WIDTH
+        extension = image[MARGIN + BAR_HEIGHT:MARGIN + BAR_HEIGHT + GUARD_EXTENSION, left:left + len(pattern) * MODULE_WIDTH]
+        dark = ~extension[:, ::MODULE_WIDTH]
+        assert (dark == dark[0]).all(), format_type
+        guards = [i for i, d in enumerate(dark[0]) if d]
+
+        if format_type not in GUARD_RANGES:
+            assert not guards, format_type
+            continue
+        assert [pattern[start:end] for start, end in GUARD_RANGES[format_type]] == ["101", "01010", "101"], format_type
+        if format_type == "upc":
+            expected = [i for start, end in GUARD_RANGES[format_type] for i in range(start, end) if pattern[i] == "1"]
+        else:
+            # python-barcode marks guard bars with G when asked to
+            code = barcode.get_barcode_class(format_type)(text, guardbar=True).build()[0]
+            expected = [i for i, c in enumerate(code) if c == "G"]
+        assert guards == expected, (format_type, guards, expected)
+
+def test_batch_matches_single_renders():
+    """render_linear_batch gives the same bars, quiet zones and guards as one render per code"""
+    for format_type, texts in [
+        ("ean13", ["590123412345", "400638133393", "978020137962"]),
+        ("ean8", ["9638507", "5512345"]),
+        ("upc", ["03600029145", "12345678901"])
+    ]:
+        batch = render_linear_batch(texts, format_type)
+        assert batch.shape[0] == len(texts)
+        height = MARGIN + BAR_HEIGHT + GUARD_EXTENSION
+        assert batch.shape[1] == height
+        for text, image in zip(texts, batch):
+            single = decode(render_linear_png(text, format_type))
+            assert (image == single[:height]).all(), (format_type, text)
+
+    try:
+        render_linear_batch(["12345678"], "code128")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing the linear barcode raster engine")
+    print("=" * 60)
+
+    tests = [
+        test_bars_match_the_encoder,
+        test_quiet_zones_are_blank,
+        test_guard_bars_extend_below_the_others,
+        test_batch_matches_single_renders
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Test script for streamed batch generation (POST /api/v1/batch) (no server needed)
+"""
+
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("RENDER_EXECUTOR", "sync")
+
+import httpx
+
+import src.main as main_module
+from src.main import app
+from src.services.batch_service import iter_json_items, iter_ndjson_lines, stream_batch
+
+def client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+async def collect(source):
+    return [item async for item in source]
+
+def test_concurrency_is_bounded():
+    """No more than `concurrency` items are rendered at once, and every item still gets its result"""
+    state = {"in_flight": 0, "peak": 0}
+
+    async def render(item):
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        await asyncio.sleep(0.001 * (item % 4))
+        state["in_flight"] -= 1
+        return {"value": item * 2}
+
+    async def run():
+        return [result async for result in stream_batch(iter_json_items(range(50)), render, 3)]
+
+    results = asyncio.run(run())
+    assert state["peak"] == 3, state
+    assert sorted(result["index"] for result in results) == list(range(50))
+    assert all(result["success"] and result["value"] == result["index"] * 2 for result in results)
+
+def test_results_stream_in_completion_order():
+    """A slow item doesn't hold back the ones after it; each result carries its input index"""
+    async def render(item):
+        await asyncio.sleep(item)
+        return {"slept": item}
+
+    async def run():
+        return [result["index"] async for result in stream_batch(iter_json_items([0.05, 0, 0]), render, 3)]
+
+    order = asyncio.run(run())
+    assert sorted(order[:2]) == [1, 2] and order[2] == 0, order
+
+def test_ndjson_results_match_their_items():
+    """An NDJSON body gets one result line per item, each matching the item at its index"""
+    stamp = time.time()
+    items = [
+        {"type": "qr", "text": f"batch {stamp} {i}", "id": f"q{i}"} if i % 2 else
+        {"type": "barcode", "text": f"{10000000 + i}", "format": "code128", "id": f"b{i}"}
+        for i in range(12)
+    ]
+    body = "\n".join(json.dumps(item) for item in items) + "\n\n"
+
+    async def run():
+        async with client() as c:
+            response = await c.post("/api/v1/batch", content=body, headers={"content-type": "application/x-ndjson"})
+            assert response.status_code == 200 and response.headers["content-type"].startswith("application/x-ndjson")
+            return [json.loads(line) for line in response.text.splitlines()]
+
+    results = asyncio.run(run())
+    assert sorted(result["index"] for result in results) == list(range(len(items)))
+    for result in results:
+        item = items[result["index"]]
+        assert result["success"] and result["id"] == item["id"] and result["text"] == item["text"], result
+        assert result["type"] == item["type"] and result["image"].startswith("data:image/png;base64,")
+
+def test_item_errors_are_inline():
+    """Invalid items fail on their own line with their id; the rest of the batch still renders"""
+    items = [
+        {"type": "qr", "text": "fine", "id": "ok"},
+        {"type": "barcode", "text": "abc", "format": "ean13", "id": "bad-text"},
+        {"type": "qr", "id": "no-text"},
+        {"type": "barcode", "text": "12345678", "format": "code128", "id": "ok2"}
+    ]
+
+    async def run():
+        async with client() as c:
+            response = await c.post("/api/v1/batch", json={"items": items})
+            assert response.status_code == 200
+            broken = await c.post("/api/v1/batch", content="not json", headers={"content-type": "application/json"})
+            assert broken.status_code == 400
+            return {json.loads(line)["index"]: json.loads(line) for line in response.text.splitlines()}
+
+    results = asyncio.run(run())
+    assert len(results) == len(items)
+    assert results[0]["success"] and results[3]["success"]
+    for index in (1, 2):
+        assert not results[index]["success"] and results[index]["id"] == items[index]["id"] and results[index]["error"], results[index]
+
+    lines = asyncio.run(collect(iter_ndjson_lines(b'{"a": 1}\n\n  \n{"b": 2}')))
+    assert lines == ['{"a": 1}', '{"b": 2}']
+
+def test_ndjson_errors_keep_their_id():
+    """An NDJSON line that parses but fails validation still reports its id; a malformed line reports none"""
+    body = "\n".join([
+        json.dumps({"type": "qr", "id": "no-text"}),
+        json.dumps({"type": "barcode", "text": "abc", "format": "ean13", "id": "bad-text"}),
+        "{not json",
+        json.dumps({"type": "qr", "text": "fine", "id": "ok"})
+    ])
+
+    async def run():
+        async with client() as c:
+            response = await c.post("/api/v1/batch", content=body, headers={"content-type": "application/x-ndjson"})
+            return {json.loads(line)["index"]: json.loads(line) for line in response.text.splitlines()}
+
+    results = asyncio.run(run())
+    assert [results[i]["id"] for i in range(4)] == ["no-text", "bad-text", None, "ok"], results
+    assert [results[i]["success"] for i in range(4)] == [False, False, False, True]
+
+def test_json_array_size_is_capped():
+    """A JSON array body over the limit is refused with 413 before it is parsed; NDJSON is not limited"""
+    items = [{"type": "qr", "text": f"capped {i}", "id": str(i)} for i in range(20)]
+    limit = main_module.MAX_JSON_BATCH_BYTES
+    main_module.MAX_JSON_BATCH_BYTES = 200
+
+    async def run():
+        async with client() as c:
+            too_big = await c.post("/api/v1/batch", json=items)
+            assert too_big.status_code == 413 and "ndjson" in too_big.json()["detail"]
+            small = await c.post("/api/v1/batch", json=items[:1])
+            assert small.status_code == 200
+            ndjson = await c.post("/api/v1/batch", content="\n".join(json.dumps(item) for item in items), headers={"content-type": "application/x-ndjson"})
+            assert ndjson.status_code == 200 and len(ndjson.text.splitlines()) == len(items)
+
+    try:
+        asyncio.run(run())
+    finally:
+        main_module.MAX_JSON_BATCH_BYTES = limit
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing batch generation")
+    print("=" * 60)
+
+    tests = [
+        test_concurrency_is_bounded,
+        test_results_stream_in_completion_order,
+        test_ndjson_results_match_their_items,
+        test_item_errors_are_inline,
+        test_ndjson_errors_keep_their_id,
+        test_json_array_size_is_capped
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Test script for offline bulk generation into tar and zip archives (no server needed)
+"""
+
+import json
+import os
+import signal
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+
+import bulk_generate
+
+ROWS = 3000
+
+def write_catalogue(directory):
+    path = os.path.join(directory, "catalogue.csv")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("text,type,format,size\n")
+        for i in range(ROWS):
+            f.write(f"item {i},qr,,4\n" if i % 2 else f"{100000 + i},barcode,code128,\n")
+    return path
+
+def archive_names(path):
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            assert archive.testzip() is None
+            return archive.namelist()
+    with tarfile.open(path) as archive:
+        return archive.getnames()
+
+def kill_mid_run(catalogue, output):
+    """Start a run in its own process group and SIGKILL it once part of the manifest is written"""
+    manifest = f"{output}.manifest.jsonl"
+    process = subprocess.Popen(
+        [sys.executable, "bulk_generate.py", catalogue, output, "--workers", "2", "--progress-every", "0"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if os.path.exists(manifest) and os.path.getsize(manifest) > 20000:
+            break
+        time.sleep(0.01)
+    os.killpg(process.pid, signal.SIGKILL)
+    process.wait()
+    with open(manifest, encoding="utf-8") as f:
+        return sum(1 for _ in f)
+
+def test_resume_after_kill():
+    """A run killed mid-archive resumes without losing or duplicating entries, for zip and tar"""
+    with tempfile.TemporaryDirectory() as directory:
+        catalogue = write_catalogue(directory)
+        for name in ("codes.zip", "codes.tar"):
+            output = os.path.join(directory, name)
+            done = kill_mid_run(catalogue, output)
+            assert 0 < done < ROWS, done
+
+            assert bulk_generate.main([catalogue, output, "--resume", "--workers", "2", "--progress-every", "0"]) == 0
+            names = archive_names(output)
+            assert len(names) == len(set(names)) == ROWS, (name, len(names), len(set(names)))
+
+            with open(f"{output}.manifest.jsonl", encoding="utf-8") as f:
+                rows = [json.loads(line)["row"] for line in f]
+            assert sorted(set(rows)) == list(range(ROWS)), name
+
+def test_resume_without_offsets_is_refused():
+    """A manifest without archive offsets can't be resumed safely, so the writer refuses it"""
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            bulk_generate.ArchiveWriter(os.path.join(directory, "codes.zip"), resume=True, resume_offset=None)
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing bulk generation")
+    print("=" * 60)
+
+    tests = [
+        test_resume_after_kill,
+        test_resume_without_offsets_is_refused
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
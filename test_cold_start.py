@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Test script for cold-start cost of src/main.py (fresh interpreters, no server needed)
+"""
+
+import os
+
+from benchmarks.cold_start import measure
+
+# Import budget for src.main in milliseconds; FastAPI itself accounts for most of it
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+
+def test_import_budget():
+    """Importing the app stays within the budget and does not load the rendering stack"""
+    report = measure("src.main", runs=3)
+    print(f"   import {report['import_ms']:.1f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)")
+    assert report["heavy_modules"] == [], f"cold start loaded {report['heavy_modules']}"
+    assert report["import_ms"] <= IMPORT_BUDGET_MS, f"import took {report['import_ms']:.1f} ms"
+    assert set(report["statuses"].values()) == {200}
+
+def test_agent_card_cached():
+    """The agent card is read from disk once per process"""
+    from src.main import load_agent_card
+    load_agent_card.cache_clear()
+    first = load_agent_card()
+    assert load_agent_card() is first
+    assert load_agent_card.cache_info().hits == 1
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing cold-start cost")
+    print("=" * 60)
+
+    tests = [
+        test_import_budget,
+        test_agent_card_cached
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
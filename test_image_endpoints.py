@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test script for the cacheable GET image endpoints (no server needed)
+"""
+
+import asyncio
+import os
+import time
+
+os.environ.setdefault("RENDER_EXECUTOR", "sync")
+
+import httpx
+
+from src.main import IMMUTABLE_CACHE_CONTROL, app, barcode_render_key, qr_render_key
+from src.models.request_models import IMAGE_PNG_PROFILE, OutputFormat
+from src.services.render_executor import render_executor
+
+def client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+def test_etag_and_cache_control():
+    """Images carry the render key as ETag and a year-long immutable Cache-Control"""
+    text = f"etag {time.time()}"
+
+    async def run():
+        async with client() as c:
+            qr = await c.get("/api/v1/qr.png", params={"text": text, "size": 6})
+            assert qr.status_code == 200 and qr.headers["content-type"] == "image/png"
+            assert qr.headers["etag"] == f'"{qr_render_key(text, 6, OutputFormat.PNG, IMAGE_PNG_PROFILE)[:32]}"'
+            assert qr.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+
+            barcode = await c.get("/api/v1/barcode.svg", params={"text": "12345678", "format": "code128"})
+            assert barcode.status_code == 200 and barcode.headers["content-type"].startswith("image/svg+xml")
+            assert barcode.headers["etag"] == f'"{barcode_render_key("12345678", "code128", OutputFormat.SVG)[:32]}"'
+
+            # Different parameters, different ETag
+            other = await c.get("/api/v1/qr.png", params={"text": text, "size": 7})
+            assert other.headers["etag"] != qr.headers["etag"]
+
+    asyncio.run(run())
+
+def test_if_none_match_is_answered_without_rendering():
+    """A matching If-None-Match gets 304 with the same headers and no render; a stale one gets the image"""
+    text = f"conditional {time.time()}"
+
+    async def run():
+        async with client() as c:
+            first = await c.get("/api/v1/qr.svg", params={"text": text, "cache": "false"})
+            etag = first.headers["etag"]
+
+            submitted = render_executor.submitted
+            again = await c.get("/api/v1/qr.svg", params={"text": text, "cache": "false"}, headers={"If-None-Match": f'W/{etag}, "other"'})
+            assert again.status_code == 304 and again.content == b""
+            assert again.headers["etag"] == etag and again.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+            assert render_executor.submitted == submitted
+
+            stale = await c.get("/api/v1/qr.svg", params={"text": text}, headers={"If-None-Match": '"stale"'})
+            assert stale.status_code == 200 and stale.content == first.content
+
+            # "*" only matches an image that exists, so invalid input is still rejected
+            invalid = await c.get("/api/v1/barcode.png", params={"text": "abc", "format": "ean13"}, headers={"If-None-Match": "*"})
+            assert invalid.status_code == 400
+
+    asyncio.run(run())
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing the GET image endpoints")
+    print("=" * 60)
+
+    tests = [
+        test_etag_and_cache_control,
+        test_if_none_match_is_answered_without_rendering
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
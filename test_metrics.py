@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Test script for the Prometheus /metrics exposition and its stage and route labels (no server needed)
+"""
+
+import asyncio
+import os
+import re
+import time
+
+os.environ.setdefault("RENDER_EXECUTOR", "sync")
+
+import httpx
+
+from src.main import app
+from src.utils.metrics import (
+    CONTENT_TYPE, Registry, STAGE_SECONDS, qr_size_bucket, replay_stages, run_capturing_stages,
+    stage, stage_labels, update_stage_labels
+)
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(.*)\})? (\S+)$')
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+def parse(text):
+    """Parse exposition text into ({family: type}, [(name, labels, value)]), checking every line on the way"""
+    types, samples = {}, []
+    assert text.endswith("\n")
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            continue
+        if line.startswith("# TYPE "):
+            _, _, family, kind = line.split(" ")
+            assert family not in types, f"duplicate TYPE for {family}"
+            types[family] = kind
+            continue
+        match = SAMPLE.match(line)
+        assert match, f"malformed line: {line!r}"
+        name, _, labels, value = match.groups()
+        family = re.sub(r"_(bucket|sum|count)$", "", name) if name not in types else name
+        assert family in types, f"{name} has no TYPE line"
+        samples.append((name, dict(LABEL.findall(labels or "")), float(value)))
+    return types, samples
+
+def find(samples, name, **labels):
+    """Values of the samples named name whose labels include labels"""
+    return [value for sample, sample_labels, value in samples if sample == name and labels.items() <= sample_labels.items()]
+
+def test_exposition_format():
+    """Counters and histograms expose HELP/TYPE, escaped labels, cumulative buckets ending in +Inf, _sum and _count"""
+    registry = Registry()
+    counter = registry.counter("demo_total", "A counter", ["kind"])
+    histogram = registry.histogram("demo_seconds", "A histogram", ["kind"], (0.1, 1.0))
+    counter.inc(kind='say "hi"\n')
+    counter.inc(2, kind="plain")
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, kind="x")
+    registry.register_collector(lambda: ["# HELP demo_depth A gauge", "# TYPE demo_depth gauge", "demo_depth 3"])
+
+    text = registry.expose()
+    assert "# HELP demo_total A counter\n# TYPE demo_total counter\n" in text
+    assert 'demo_total{kind="say \\"hi\\"\\n"} 1' in text
+
+    types, samples = parse(text)
+    assert types == {"demo_total": "counter", "demo_seconds": "histogram", "demo_depth": "gauge"}, types
+    buckets = [(labels["le"], value) for name, labels, value in samples if name == "demo_seconds_bucket"]
+    assert buckets == [("0.1", 1), ("1.0", 3), ("+Inf", 4)], buckets
+    assert find(samples, "demo_seconds_sum", kind="x") == [6.05]
+    assert find(samples, "demo_seconds_count", kind="x") == [4]
+    assert find(samples, "demo_total", kind="plain") == [2]
+
+def test_stage_labels():
+    """Stages pick up the enclosing stage_labels (updated as they become known), and worker captures replay with theirs"""
+    def count(**labels):
+        _, samples = parse("\n".join(STAGE_SECONDS.expose()) + "\n")
+        return sum(find(samples, "qrbar_render_stage_seconds_count", **labels))
+
+    before = count(stage="test_stage", symbology="qr", size_bucket="v10-26")
+    with stage_labels(symbology="qr", size_bucket="pending"):
+        update_stage_labels(size_bucket=qr_size_bucket(12))
+        with stage("test_stage"):
+            pass
+    assert count(stage="test_stage", symbology="qr", size_bucket="v10-26") == before + 1
+
+    def work():
+        with stage("test_stage", symbology="ean13", size_bucket="linear"):
+            return "done"
+
+    before = count(stage="test_stage", symbology="ean13")
+    result, records = run_capturing_stages(work)
+    assert result == "done" and len(records) == 1
+    assert count(stage="test_stage", symbology="ean13") == before
+    replay_stages(records)
+    assert count(stage="test_stage", symbology="ean13", size_bucket="linear") == before + 1
+
+    assert [qr_size_bucket(v) for v in (1, 9, 10, 26, 27, 40)] == ["v1-9", "v1-9", "v10-26", "v10-26", "v27-40", "v27-40"]
+
+def test_metrics_endpoint():
+    """/metrics parses cleanly and labels renders by stage and symbology and requests by route template"""
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+            assert (await c.get("/api/v1/qr.png", params={"text": f"metrics {time.time()}", "cache": "false"})).status_code == 200
+            assert (await c.get("/api/v1/barcode.png", params={"text": f"{int(time.time())}", "format": "code128", "cache": "false"})).status_code == 200
+            assert (await c.get("/no/such/route")).status_code == 404
+            return await c.get("/metrics")
+
+    response = asyncio.run(run())
+    assert response.status_code == 200 and response.headers["content-type"] == CONTENT_TYPE
+    types, samples = parse(response.text)
+    assert types["qrbar_render_stage_seconds"] == "histogram" and types["qrbar_http_requests_total"] == "counter"
+
+    for symbology, size_bucket, stages in [
+        ("qr", "v1-9", ("plan", "mask", "matrix", "rasterize", "compress")),
+        ("code128", "linear", ("encode", "rasterize", "compress"))
+    ]:
+        for stage_name in stages:
+            assert find(samples, "qrbar_render_stage_seconds_count", stage=stage_name, symbology=symbology, size_bucket=size_bucket), (symbology, stage_name)
+
+    endpoints = {labels["endpoint"] for name, labels, _ in samples if name == "qrbar_http_requests_total"}
+    assert "/api/v1/qr.{extension}" in endpoints and "/api/v1/barcode.{extension}" in endpoints, endpoints
+    assert not any(endpoint.startswith("/api/v1/qr.png") or endpoint.startswith("/no/") for endpoint in endpoints), endpoints
+    assert find(samples, "qrbar_http_requests_total", endpoint="/api/v1/qr.{extension}", status="2xx")
+    assert find(samples, "qrbar_http_requests_total", endpoint="unmatched", status="4xx")
+    assert find(samples, "qrbar_http_request_duration_seconds_bucket", endpoint="/api/v1/qr.{extension}", le="+Inf")
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing metrics")
+    print("=" * 60)
+
+    tests = [
+        test_exposition_format,
+        test_stage_labels,
+        test_metrics_endpoint
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Test script for the outbound Telex delivery queue against a local fake webhook
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+from src.services.outbound_queue import OutboundQueue, OutboundQueueFull
+from test_telex_client import StubWebhook, make_client
+
+def make_queue(stub, spill_path, **kwargs):
+    kwargs.setdefault("coalesce_window", 0.02)
+    kwargs.setdefault("retry_backoff_max", 0.05)
+    return OutboundQueue(make_client(stub.url, max_retries=0), spill_path=spill_path, **kwargs)
+
+async def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the queue"
+        await asyncio.sleep(0.01)
+
+def test_coalesces_per_channel():
+    """Texts to one channel within the window become one POST; each image closes a delivery"""
+    async def run():
+        with StubWebhook() as stub, tempfile.TemporaryDirectory() as tmp:
+            queue = make_queue(stub, os.path.join(tmp, "spill.db"))
+            queue.start()
+            for i in range(5):
+                assert await queue.enqueue("a", f"a{i}") == "memory"
+            await queue.enqueue("b", "b0")
+            await queue.enqueue("c", "c0")
+            await queue.enqueue("c", "c1", image_data="img")
+            await queue.enqueue("c", "c2")
+            await wait_until(lambda: queue.delivered == 9)
+            await queue.stop()
+            queue.close()
+
+            by_channel = {}
+            for _, payload in stub.requests:
+                by_channel.setdefault(payload["channel_id"], []).append(payload)
+            assert [p["message"] for p in by_channel["a"]] == ["a0\na1\na2\na3\na4"]
+            assert [p["message"] for p in by_channel["c"]] == ["c0\nc1", "c2"]
+            assert by_channel["c"][0]["image"] == "img"
+            assert len(stub.requests) == 4
+    asyncio.run(run())
+
+def test_spills_while_webhook_is_down():
+    """Failed deliveries and later messages go to SQLite and drain in order once the webhook recovers"""
+    async def run():
+        with StubWebhook([(500, {})] * 1000) as stub, tempfile.TemporaryDirectory() as tmp:
+            queue = make_queue(stub, os.path.join(tmp, "spill.db"), max_batch=3)
+            queue.start()
+            await queue.enqueue("a", "m0")
+            await wait_until(lambda: not queue.webhook_up)
+            for i in range(1, 6):
+                assert await queue.enqueue("a", f"m{i}") == "spilled"
+            assert queue.stats()["spilled_pending"] == 6
+
+            stub.responses.clear()
+            await wait_until(lambda: queue.delivered == 6)
+            await queue.stop()
+            queue.close()
+
+            delivered = [line for _, p in stub.requests for line in p["message"].split("\n")]
+            assert delivered[-6:] == [f"m{i}" for i in range(6)], delivered
+            assert queue.spill.count == 0
+    asyncio.run(run())
+
+def test_memory_bound_and_backpressure():
+    """Beyond max_memory messages spill, taking the memory backlog with them; beyond max_spill enqueue raises"""
+    async def run():
+        with StubWebhook() as stub, tempfile.TemporaryDirectory() as tmp:
+            queue = make_queue(stub, os.path.join(tmp, "spill.db"), max_memory=2, max_spill=5)
+            results = [await queue.enqueue("a", f"m{i}") for i in range(5)]
+            assert results == ["memory", "memory", "spilled", "spilled", "spilled"]
+            assert queue.stats()["in_memory"] == 0 and queue.spill.count == 5
+            assert queue.pressure == 1.0
+            try:
+                await queue.enqueue("a", "one too many")
+                assert False, "expected OutboundQueueFull"
+            except OutboundQueueFull:
+                pass
+
+            queue.start()
+            await wait_until(lambda: queue.delivered == 5)
+            await queue.stop()
+            queue.close()
+    asyncio.run(run())
+
+def test_spilling_keeps_channel_order():
+    """A message that spills while older ones are in memory, or out for delivery, is still sent after them"""
+    async def run():
+        with StubWebhook() as stub, tempfile.TemporaryDirectory() as tmp:
+            queue = make_queue(stub, os.path.join(tmp, "spill.db"), max_memory=3)
+            results = [await queue.enqueue("a", f"m{i}") for i in range(4)]
+            assert results == ["memory", "memory", "memory", "spilled"]
+            queue.start()
+            await wait_until(lambda: queue.delivered == 4)
+            await queue.stop()
+            queue.close()
+            delivered = [line for _, p in stub.requests for line in p["message"].split("\n")]
+            assert delivered == [f"m{i}" for i in range(4)], delivered
+
+        with StubWebhook([(500, {})] * 1000, delay=0.2) as stub, tempfile.TemporaryDirectory() as tmp:
+            queue = make_queue(stub, os.path.join(tmp, "spill.db"), max_memory=2)
+            await queue.enqueue("a", "m0")
+            queue.start()
+            await wait_until(lambda: len(stub.requests) == 1)
+            # m0 is out for delivery and about to fail; m1 and m2 fill memory, so m3 spills
+            assert [await queue.enqueue("a", f"m{i}") for i in range(1, 4)] == ["memory", "memory", "spilled"]
+            assert queue.spill.count == 4
+
+            stub.responses.clear()
+            await wait_until(lambda: queue.delivered == 4)
+            await queue.stop()
+            queue.close()
+            delivered = [line for _, p in stub.requests[1:] for line in p["message"].split("\n")]
+            assert delivered == [f"m{i}" for i in range(4)], delivered
+    asyncio.run(run())
+
+def test_spill_survives_restart():
+    """Messages left on disk are delivered by the next queue using the same file"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            spill_path = os.path.join(tmp, "spill.db")
+            with StubWebhook([(503, {})] * 1000) as stub:
+                queue = make_queue(stub, spill_path)
+                queue.start()
+                await queue.enqueue("a", "survivor")
+                await wait_until(lambda: queue.spill.count == 1)
+                await queue.stop()
+                queue.close()
+
+            with StubWebhook() as stub:
+                queue = make_queue(stub, spill_path)
+                queue.start()
+                await wait_until(lambda: queue.delivered == 1)
+                await queue.stop()
+                queue.close()
+                assert stub.requests[0][1]["message"] == "survivor"
+    asyncio.run(run())
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing outbound delivery queue against a fake webhook")
+    print("=" * 60)
+
+    tests = [
+        test_coalesces_per_channel,
+        test_spills_while_webhook_is_down,
+        test_memory_bound_and_backpressure,
+        test_spilling_keeps_channel_order,
+        test_spill_survives_restart
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
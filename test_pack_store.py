@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Test script for the append-only pack file image store (no server needed)
+"""
+
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import zlib
+
+os.environ.setdefault("RENDER_EXECUTOR", "sync")
+os.environ.setdefault("PACK_STORE_DIR", tempfile.mkdtemp())
+
+import httpx
+
+from src.main import app
+from src.models.request_models import OutputFormat
+from src.services.pack_store import PackStore, RECORD, RECORD_MAGIC, key_bytes, pack_store
+from src.services.qr_service import QRCodeService, render_qr_png
+from src.services.render_cache import RenderCache, make_render_key
+from src.services.render_pipeline import RenderPipeline, cache_sink
+
+def key(i):
+    return hashlib.sha256(str(i).encode()).hexdigest()
+
+def test_put_get_and_reopen():
+    """Images round-trip as zero-copy views, identical keys are stored once, and a reopened store finds them"""
+    directory = tempfile.mkdtemp()
+    store = PackStore(directory)
+    for i in range(5000):  # grows the index past its initial size
+        assert store.put(key(i), f"image {i}".encode(), "png")
+    assert not store.put(key(7), b"other bytes")
+
+    view, output_format = store.get(key(7))
+    assert isinstance(view, memoryview) and bytes(view) == b"image 7" and output_format == "png"
+    assert store.get(key(-1)) is None
+    assert store.stats()["deduplicated"] == 1
+
+    reopened = PackStore(directory)
+    assert bytes(reopened.get(key(4999))[0]) == b"image 4999"
+    assert reopened.stats()["entries"] == 5000
+
+def test_recovery_after_crash():
+    """A record appended but not yet indexed is recovered; a torn record at the tail is truncated"""
+    directory = tempfile.mkdtemp()
+    store = PackStore(directory)
+    store.put(key(1), b"first")
+
+    # Simulate dying after the append but before the index update, then mid-way through the next append
+    data = b"appended before the crash"
+    with open(store.pack_path, "ab") as pack:
+        pack.write(RECORD.pack(RECORD_MAGIC, len(data), key_bytes(key(2)), 1, zlib.crc32(data)) + data)
+        pack.write(RECORD.pack(RECORD_MAGIC, 100, key_bytes(key(3)), 0, 0) + b"partial")
+
+    reopened = PackStore(directory)
+    assert bytes(reopened.get(key(1))[0]) == b"first"
+    assert reopened.get(key(2)) is not None and reopened.get(key(2))[1] == "svg"
+    assert reopened.get(key(3)) is None
+    stats = reopened.stats()
+    assert stats["recovered"] == 1 and stats["truncated_bytes"] == RECORD.size + len(b"partial"), stats
+
+    # A missing index is rebuilt from the pack
+    os.remove(reopened.index_path)
+    assert bytes(PackStore(directory).get(key(2))[0]) == data
+
+def test_compaction():
+    """Compaction drops expired and over-budget entries, keeps the rest readable and shrinks the pack"""
+    directory = tempfile.mkdtemp()
+    store = PackStore(directory, max_bytes=10 * (RECORD.size + 1000))
+    for i in range(30):
+        store.put(key(i), bytes([i]) * 1000)
+    before = store.stats()["pack_bytes"]
+
+    assert store.compact() == 20
+    stats = store.stats()
+    assert stats["entries"] == 10 and stats["pack_bytes"] < before / 2, stats
+    survivors = [i for i in range(30) if store.get(key(i)) is not None]
+    assert len(survivors) == 10
+    assert all(bytes(store.get(key(i))[0]) == bytes([i]) * 1000 for i in survivors)
+    assert PackStore(directory).stats()["entries"] == 10
+
+    assert store.compact(now=time.time() + store.ttl_seconds + 1) == 10
+    assert store.stats()["entries"] == 0
+
+def append_from_another_process(directory, worker):
+    store = PackStore(directory)
+    for i in range(300):
+        store.put(key(worker * 1000 + i), f"image {worker} {i}".encode())
+        if i == 150 and worker == 0:
+            store.compact(force=True)
+
+def test_processes_share_a_directory():
+    """Worker processes append to (and compact) one store without losing each other's records"""
+    directory = tempfile.mkdtemp()
+    store = PackStore(directory)
+    store.put(key("before"), b"written first")
+
+    context = multiprocessing.get_context("spawn")
+    writers = [context.Process(target=append_from_another_process, args=(directory, worker)) for worker in range(3)]
+    for process in writers:
+        process.start()
+    for process in writers:
+        process.join()
+
+    assert bytes(store.get(key("before"))[0]) == b"written first"
+    assert all(bytes(store.get(key(worker * 1000 + i))[0]) == f"image {worker} {i}".encode()
+               for worker in range(3) for i in range(300))
+    assert store.stats()["entries"] == 901
+
+def test_rendered_images_survive_restart():
+    """A new process (fresh memory cache) answers from the pack store instead of rendering again"""
+    render_key = make_render_key("survives restarts", "qr", output_format="png")
+    first = RenderPipeline(cache=RenderCache())
+    artifact = first.render_sync(render_key, OutputFormat.PNG, "qr", render_qr_png, "survives restarts", sinks=[cache_sink])
+    pack_store.flush()
+
+    restarted = RenderPipeline(cache=RenderCache(), store=PackStore(pack_store.directory))
+    again = restarted.render_sync(render_key, OutputFormat.PNG, "qr", render_qr_png, "survives restarts")
+    assert again.from_cache and again.data == artifact.data
+
+def test_static_images_served_from_store():
+    """Service-persisted images are named by render key and served from /static/images; stats are read off the loop"""
+    file_path, _ = QRCodeService().generate_qr_code("served from the pack", 4)
+    pack_store.flush()
+    name = os.path.basename(file_path)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get(f"/static/images/{name}")
+            assert response.status_code == 200 and response.headers["content-type"] == "image/png"
+            assert response.content == bytes(pack_store.get(name[3:-4])[0])
+            assert (await client.get("/static/images/qr_missing.png")).status_code == 404
+
+            stats = await client.get("/api/v1/store/stats")
+            assert stats.status_code == 200 and stats.json()["entries"] >= 1
+
+    threads = []
+    stats = pack_store.stats
+    pack_store.stats = lambda: threads.append(threading.current_thread()) or stats()
+    try:
+        asyncio.run(run())
+    finally:
+        del pack_store.stats
+    assert threads and threading.main_thread() not in threads, threads
+
+def test_unusable_directory_is_a_miss():
+    """A store whose directory can't be created only costs cache hits; renders still succeed"""
+    blocker = tempfile.NamedTemporaryFile()
+    broken = PackStore(os.path.join(blocker.name, "images"))
+    pipeline = RenderPipeline(cache=RenderCache(), store=broken)
+    render_key = make_render_key("no store", "qr", output_format="png")
+
+    async def run():
+        artifact = await pipeline.render(render_key, OutputFormat.PNG, "qr", render_qr_png, "no store")
+        assert not artifact.from_cache and artifact.data.startswith(b"\x89PNG")
+
+    asyncio.run(run())
+    assert not pipeline.render_sync(render_key, OutputFormat.PNG, "qr", render_qr_png, "no store", use_cache=False).from_cache
+    broken._put_logged(render_key, b"image", "png")  # logged, not raised
+    blocker.close()
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing the pack file image store")
+    print("=" * 60)
+
+    tests = [
+        test_put_get_and_reopen,
+        test_recovery_after_crash,
+        test_compaction,
+        test_processes_share_a_directory,
+        test_rendered_images_survive_restart,
+        test_static_images_served_from_store,
+        test_unusable_directory_is_a_miss
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
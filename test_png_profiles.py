@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test script for the fast / balanced / small PNG encoding profiles (no server needed)
+"""
+
+import asyncio
+import io
+import os
+
+os.environ.setdefault("RENDER_EXECUTOR", "sync")
+
+import httpx
+import numpy as np
+from PIL import Image
+
+from src.main import app
+from src.models.request_models import PngProfile
+from src.services.barcode_service import render_barcode_png
+from src.services.qr_service import _make_qr, render_qr_png, render_qr_png_pil
+from src.services.render_cache import make_render_key
+from src.utils.png_encoder import PNG_PROFILES, encode_module_matrix_png, png_profile
+
+TEXT = "https://example.com/" + "x" * 200
+
+def pixels(data):
+    image = Image.open(io.BytesIO(data))
+    assert image.mode == "1", image.mode
+    return np.array(image)
+
+def test_profiles_encode_identical_pixels():
+    """Every profile produces a 1-bit PNG with the same pixels; small is never larger than fast or balanced"""
+    for render in (lambda p: render_qr_png(TEXT, profile=p), lambda p: render_barcode_png("HELLO-12345", "code128", p)):
+        images = {name: render(name) for name in PNG_PROFILES}
+        reference = pixels(images["balanced"])
+        for data in images.values():
+            assert np.array_equal(pixels(data), reference)
+        assert len(images["small"]) <= len(images["balanced"]) < len(images["fast"]), {k: len(v) for k, v in images.items()}
+
+def test_direct_encoder_matches_pil():
+    """The direct 1-bit encoder draws the same pixels as qrcode's PIL image factory, whatever the version, box size or profile"""
+    for version, box_size, border in ((1, 10, 4), (5, 1, 0), (10, 3, 2), (40, 4, 4)):
+        qr = _make_qr("x", version, box_size, border, "L")
+        reference = np.array(Image.open(io.BytesIO(render_qr_png_pil("x", version, box_size, border, "L"))).convert("1"))
+        assert reference.shape == ((qr.modules_count + 2 * border) * box_size,) * 2
+        for name in PNG_PROFILES:
+            assert np.array_equal(pixels(encode_module_matrix_png(qr.modules, box_size, border, profile=name)), reference), (version, name)
+    assert np.array_equal(pixels(render_qr_png(TEXT, mask_mode="reference")), np.array(Image.open(io.BytesIO(render_qr_png_pil(TEXT))).convert("1")))
+
+def test_profile_lookup_and_cache_key():
+    """Profiles accept names or PngProfile members, unknown names are rejected, PNG cache keys differ per profile"""
+    assert png_profile(PngProfile.SMALL) is png_profile("small")
+    try:
+        png_profile("tiny")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+    keys = {make_render_key("x", "qr", output_format="png", profile=name) for name in PNG_PROFILES}
+    assert len(keys) == len(PNG_PROFILES)
+    assert make_render_key("x", "qr", output_format="svg", profile="fast") == make_render_key("x", "qr", output_format="svg", profile="small")
+
+def test_endpoint_defaults():
+    """GET images default to small, POST bodies to balanced, A2A commands to fast; all can be overridden"""
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            params = {"text": TEXT, "cache": "false"}
+            small = (await client.get("/api/v1/qr.png", params=params)).content
+            fast = (await client.get("/api/v1/qr.png", params={**params, "profile": "fast"})).content
+            assert len(small) < len(fast)
+            assert (await client.get("/api/v1/qr.png", params={**params, "profile": "tiny"})).status_code == 422
+
+            body = (await client.post("/api/v1/qr", json={"text": TEXT, "cache": False})).json()
+            overridden = (await client.post("/api/v1/qr", json={"text": TEXT, "cache": False, "profile": "small"})).json()
+            assert body["image"] != overridden["image"]
+
+            command = (await client.post("/", json={"text": f"qr {TEXT}"})).json()
+            assert command["image"] == (await client.post("/api/v1/qr", json={"text": TEXT, "cache": False, "profile": "fast"})).json()["image"]
+            explicit = (await client.post("/", json={"text": f"qr profile:small {TEXT}"})).json()
+            assert explicit["image"] == overridden["image"]
+
+    asyncio.run(run())
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing PNG encoding profiles")
+    print("=" * 60)
+
+    tests = [
+        test_profiles_encode_identical_pixels,
+        test_direct_encoder_matches_pil,
+        test_profile_lookup_and_cache_key,
+        test_endpoint_defaults
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test script for vectorized QR mask selection against qrcode's reference scoring
+"""
+
+import random
+import string
+
+import numpy as np
+import qrcode
+from qrcode import util
+
+from src.services.qr_mask import FAST_MASK, penalty_scores, select_mask, _layout
+from src.services.qr_service import render_qr_png, render_qr_svg
+
+def fitted_qr(text, ecc):
+    qr = qrcode.QRCode(error_correction=ecc)
+    qr.add_data(text)
+    qr.best_fit(start=None)
+    return qr
+
+def test_penalty_matches_lost_point():
+    """All eight penalties equal qrcode.util.lost_point across versions and ECC levels"""
+    rng = random.Random(18)
+    for length in (1, 20, 100, 400, 900):
+        for ecc in (qrcode.constants.ERROR_CORRECT_L, qrcode.constants.ERROR_CORRECT_H):
+            text = "".join(rng.choice(string.printable) for _ in range(length))
+            qr = fitted_qr(text, ecc)
+            reference = []
+            for mask in range(8):
+                qr.makeImpl(True, mask)
+                reference.append(util.lost_point(qr.modules))
+            masks = _layout(qr.version)
+            unmasked = np.array(qr.modules, dtype=bool) ^ masks[7]  # the loop left mask 7 applied
+            assert penalty_scores(unmasked[np.newaxis] ^ masks).tolist() == reference, (qr.version, length)
+
+def test_exact_mode_picks_reference_mask():
+    """exact and reference modes choose the same mask, so rendered images are identical"""
+    rng = random.Random(180)
+    for _ in range(40):
+        text = "".join(rng.choice(string.ascii_letters + string.digits) for _ in range(rng.randint(1, 600)))
+        ecc = rng.choice([qrcode.constants.ERROR_CORRECT_L, qrcode.constants.ERROR_CORRECT_M,
+                          qrcode.constants.ERROR_CORRECT_Q, qrcode.constants.ERROR_CORRECT_H])
+        assert select_mask(fitted_qr(text, ecc), "exact") == select_mask(fitted_qr(text, ecc), "reference")
+
+    text = "https://example.com/" + "x" * 300
+    assert render_qr_png(text, mask_mode="exact") == render_qr_png(text, mask_mode="reference")
+    assert render_qr_svg(text, mask_mode="exact") == render_qr_svg(text, mask_mode="reference")
+
+def test_fast_mode():
+    """fast mode skips scoring and uses the fixed mask; unknown modes are rejected"""
+    qr = fitted_qr("Hello World", qrcode.constants.ERROR_CORRECT_L)
+    assert select_mask(qr, "fast") == FAST_MASK
+    assert qr.data_cache is None, "fast mode should not lay out test matrices"
+    assert render_qr_png("Hello World", mask_mode="fast").startswith(b"\x89PNG")
+    try:
+        select_mask(qr, "slow")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing vectorized QR mask selection")
+    print("=" * 60)
+
+    tests = [
+        test_penalty_matches_lost_point,
+        test_exact_mode_picks_reference_mask,
+        test_fast_mode
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
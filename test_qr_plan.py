@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test script for QR segmentation, version and ECC planning
+"""
+
+import base64
+import itertools
+import random
+
+import qrcode
+from qrcode import util
+from qrcode.exceptions import DataOverflowError
+
+from src.services.qr_plan import (
+    ALPHANUMERIC, BYTE, CAPACITY_BITS, ECC_ORDER, ERROR_CORRECTION_LEVELS, NUMERIC,
+    plan_qr, segment, segment_bits
+)
+from src.models.request_models import MIN_QR_BOX_SIZE, qr_box_size
+from src.services.qr_service import MAX_QR_PIXELS, QRCodeService, _make_qr, render_qr_png
+
+def brute_force_bits(data, version):
+    """Shortest encoding over every per-character mode assignment"""
+    options = []
+    for byte in data:
+        modes = [BYTE]
+        if byte in util.ALPHA_NUM:
+            modes.append(ALPHANUMERIC)
+        if byte in b"0123456789":
+            modes.append(NUMERIC)
+        options.append(modes)
+
+    best = None
+    for modes in itertools.product(*options):
+        segments = [(mode, bytes(b for b, _ in group)) for mode, group in itertools.groupby(zip(data, modes), key=lambda pair: pair[1])]
+        bits = segment_bits(segments, version)
+        best = bits if best is None else min(best, bits)
+    return best
+
+def test_segmentation_is_optimal():
+    """The DP matches exhaustive search on short mixed strings in every version group"""
+    rng = random.Random(19)
+    for _ in range(150):
+        data = bytes(rng.choice(b"0123456789ABCab:/.%") for _ in range(rng.randint(1, 8)))
+        for version in (1, 10, 27):
+            segments = segment(data, version)
+            assert b"".join(chunk for _, chunk in segments) == data
+            assert segment_bits(segments, version) == brute_force_bits(data, version), (data, version, segments)
+
+def test_bit_count_matches_qrcode():
+    """segment_bits equals the length of qrcode's own bit stream for the same segments"""
+    for text in ("https://example.com/product/1234567890", "WIFI:S:Net;T:WPA;P:pass1234;;", "ünïcödé 12345678901234", ""):
+        plan = plan_qr(text)
+        buffer = util.BitBuffer()
+        for data in plan.segments:
+            buffer.put(data.mode, 4)
+            buffer.put(len(data), util.length_in_bits(data.mode, plan.version))
+            data.write(buffer)
+        assert len(buffer) == plan.bits
+
+def test_smallest_version_and_boosted_ecc():
+    """The version is the smallest that fits at the minimum level; ECC is raised while it still fits"""
+    rng = random.Random(190)
+    for _ in range(60):
+        text = "".join(rng.choice("0123456789ABCDEFabcdef:/.-") for _ in range(rng.randint(1, 1500)))
+        for ecc in ECC_ORDER:
+            try:
+                plan = plan_qr(text, 1, ecc)
+            except DataOverflowError:
+                continue
+            util.create_data(plan.version, ERROR_CORRECTION_LEVELS[plan.ecc], plan.segments)  # fits
+
+            assert ECC_ORDER.index(plan.ecc) >= ECC_ORDER.index(ecc)
+            if plan.version > 1:
+                smaller = plan_qr(text, plan.version - 1, ecc)  # version - 1 must not fit
+                assert smaller.version == plan.version
+            stronger = ECC_ORDER.index(plan.ecc) + 1
+            if stronger < len(ECC_ORDER):
+                assert plan.bits > CAPACITY_BITS[ECC_ORDER[stronger]][plan.version]
+
+            qr = qrcode.QRCode(error_correction=ERROR_CORRECTION_LEVELS[ecc])
+            qr.add_data(text)
+            assert plan.version <= qr.best_fit(), "never larger than qrcode's own fit"
+
+def test_min_version_and_overflow():
+    """min_version is respected and oversized payloads raise DataOverflowError"""
+    assert plan_qr("hi", 12).version == 12
+    assert plan_qr("hi").version == 1 and plan_qr("hi").ecc == "H"
+    try:
+        plan_qr("x" * 3000)
+        assert False, "expected DataOverflowError"
+    except DataOverflowError:
+        pass
+
+def test_large_size_no_longer_forces_version():
+    """Rendering picks the planned version whatever the box size"""
+    qr = _make_qr("https://example.com", 1, 40, 4, "M")
+    assert qr.version == plan_qr("https://example.com", 1, "M").version == 2
+
+def test_image_size_is_capped():
+    """A large module size on a large symbol is reduced so the image stays within MAX_QR_PIXELS"""
+    png = render_qr_png("x" * 2000, 1, 40, 5, "M")
+    width = int.from_bytes(png[16:20], "big")
+    assert width <= MAX_QR_PIXELS and len(png) < 64 * 1024, (width, len(png))
+    assert _make_qr("hi", 1, 40, 5, "M").box_size == 40  # small symbols keep the requested size
+
+def test_small_size_stays_scannable():
+    """size:1 is raised to MIN_QR_BOX_SIZE pixels per module instead of a ~30px image"""
+    assert [qr_box_size(size) for size in (1, MIN_QR_BOX_SIZE, 15, 40, 99)] == [MIN_QR_BOX_SIZE, MIN_QR_BOX_SIZE, 15, 40, 40]
+    qr = _make_qr("hi", 1, 1, 4, "L")
+    expected = (len(qr.modules) + 2 * 4) * MIN_QR_BOX_SIZE
+    _, image = QRCodeService().generate_qr_code("hi", size=1, use_cache=False, persist=False)
+    png = base64.b64decode(image)
+    assert int.from_bytes(png[16:20], "big") == expected, (int.from_bytes(png[16:20], "big"), expected)
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing QR planning")
+    print("=" * 60)
+
+    tests = [
+        test_segmentation_is_optimal,
+        test_bit_count_matches_qrcode,
+        test_smallest_version_and_boosted_ecc,
+        test_min_version_and_overflow,
+        test_large_size_no_longer_forces_version,
+        test_image_size_is_capped,
+        test_small_size_stays_scannable
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
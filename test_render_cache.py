@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test script for the in-process render cache: LRU eviction, byte budget and the cache=false opt-out (no server needed)
+"""
+
+import asyncio
+import os
+import time
+
+os.environ.setdefault("RENDER_EXECUTOR", "sync")
+
+import httpx
+
+from src.main import app, qr_render_key
+from src.models.request_models import IMAGE_PNG_PROFILE, OutputFormat
+from src.services.render_cache import RenderCache, make_render_key, render_cache
+from src.services.render_executor import render_executor
+
+def client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+def test_least_recently_used_is_evicted():
+    """When the budget is exceeded the least recently used entry goes first, and a get counts as a use"""
+    cache = RenderCache(max_bytes=30)
+    cache.put("a", b"a" * 10)
+    cache.put("b", b"b" * 10)
+    cache.put("c", b"c" * 10)
+    assert cache.get("a") == b"a" * 10
+
+    cache.put("d", b"d" * 10)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None and cache.get("d") is not None
+
+    stats = cache.stats()
+    assert stats["entries"] == 3 and stats["evictions"] == 1, stats
+    assert stats["hits"] == 4 and stats["misses"] == 1 and stats["hit_ratio"] == 0.8, stats
+
+def test_byte_budget_is_respected():
+    """Occupancy never exceeds max_bytes; replacing a key frees its old bytes and oversized entries are not stored"""
+    cache = RenderCache(max_bytes=100)
+    for i in range(20):
+        cache.put(f"k{i}", b"x" * (7 + i % 5))
+        assert cache.current_bytes <= 100
+    assert cache.current_bytes == sum(len(cache._entries[key]) for key in cache._entries)
+
+    cache.put("k19", b"y" * 40)
+    assert cache.get("k19") == b"y" * 40
+    assert cache.current_bytes == sum(len(cache._entries[key]) for key in cache._entries) <= 100
+
+    entries = cache.stats()["entries"]
+    cache.put("huge", b"z" * 101)
+    assert cache.get("huge") is None and cache.stats()["entries"] == entries
+
+    cache.clear()
+    assert cache.stats()["entries"] == 0 and cache.current_bytes == 0
+
+def test_render_key_covers_every_parameter():
+    """Keys differ when anything that changes the output differs, and the PNG profile only matters for PNG"""
+    base = make_render_key("text", "qr", 5, 10, 4, "M", "png", "balanced")
+    assert base == make_render_key("text", "QR", 5, 10, 4, "M", OutputFormat.PNG, "balanced")
+    variants = [
+        make_render_key("text2", "qr", 5, 10, 4, "M", "png", "balanced"),
+        make_render_key("text", "code128", 5, 10, 4, "M", "png", "balanced"),
+        make_render_key("text", "qr", 6, 10, 4, "M", "png", "balanced"),
+        make_render_key("text", "qr", 5, 11, 4, "M", "png", "balanced"),
+        make_render_key("text", "qr", 5, 10, 3, "M", "png", "balanced"),
+        make_render_key("text", "qr", 5, 10, 4, "H", "png", "balanced"),
+        make_render_key("text", "qr", 5, 10, 4, "M", "svg", "balanced"),
+        make_render_key("text", "qr", 5, 10, 4, "M", "png", "fast")
+    ]
+    assert len(set(variants + [base])) == len(variants) + 1
+    assert make_render_key("text", "qr", output_format="svg", profile="fast") == make_render_key("text", "qr", output_format="svg", profile="small")
+
+def test_cache_false_bypasses_the_cache():
+    """cache=false renders every time and neither reads nor fills the render cache; the default does both"""
+    text = f"opt out {time.time()}"
+    key = qr_render_key(text, 5, OutputFormat.PNG, IMAGE_PNG_PROFILE)
+
+    async def run():
+        async with client() as c:
+            submitted = render_executor.submitted
+            for _ in range(2):
+                response = await c.get("/api/v1/qr.png", params={"text": text, "size": 5, "cache": "false"})
+                assert response.status_code == 200
+            assert render_executor.submitted == submitted + 2
+            assert render_cache.get(key) is None
+
+            first = await c.get("/api/v1/qr.png", params={"text": text, "size": 5})
+            assert render_cache.get(key) == first.content
+            second = await c.get("/api/v1/qr.png", params={"text": text, "size": 5})
+            assert second.content == first.content
+            assert render_executor.submitted == submitted + 3
+
+            stats = (await c.get("/api/v1/cache/stats")).json()
+            assert stats["entries"] >= 1 and stats["bytes"] <= stats["max_bytes"], stats
+
+    asyncio.run(run())
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing the render cache")
+    print("=" * 60)
+
+    tests = [
+        test_least_recently_used_is_evicted,
+        test_byte_budget_is_respected,
+        test_render_key_covers_every_parameter,
+        test_cache_false_bypasses_the_cache
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Test script for the render executor's process pool and bounded queue (no server needed)
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("RENDER_EXECUTOR", "sync")
+
+import httpx
+
+from src.main import app
+from src.services import render_executor as render_executor_module
+from src.services.render_executor import RenderExecutor, RenderQueueFull, render_executor
+from src.services.qr_service import render_qr_png
+
+def die():
+    os._exit(1)
+
+def test_renders_in_worker_processes():
+    """Process mode renders in another process and returns the same bytes as an inline render"""
+    executor = RenderExecutor(max_workers=2, mode="process", max_tasks_per_child=0)
+
+    async def run():
+        pids = await asyncio.gather(*[executor.run(os.getpid) for _ in range(4)])
+        assert os.getpid() not in pids
+        assert await executor.run(render_qr_png, "in a worker") == render_qr_png("in a worker")
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown()
+    stats = executor.stats()
+    assert stats["completed"] == 5 and stats["in_flight"] == 0, stats
+
+def test_workers_are_recycled():
+    """With max_tasks_per_child a worker is replaced after that many jobs"""
+    executor = RenderExecutor(max_workers=1, mode="process", max_tasks_per_child=2)
+
+    async def run():
+        return [await executor.run(os.getpid) for _ in range(4)]
+
+    try:
+        pids = asyncio.run(run())
+    finally:
+        executor.shutdown()
+    assert len(set(pids)) == 2, pids
+
+def test_dead_worker_restarts_the_pool():
+    """A worker dying fails its job and the next job runs on a fresh pool"""
+    executor = RenderExecutor(max_workers=1, mode="process", max_tasks_per_child=0)
+
+    async def run():
+        try:
+            await executor.run(die)
+            assert False, "expected the job to fail"
+        except Exception:
+            pass
+        assert await executor.run(os.getpid) != os.getpid()
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown()
+    stats = executor.stats()
+    assert stats["pool_restarts"] == 1 and stats["failed"] == 1, stats
+
+def test_falls_back_to_threads_when_processes_cannot_start():
+    """A pool that can't be created, or can't start workers, is reported once and renders run on threads"""
+    def no_pool(*args, **kwargs):
+        raise OSError(38, "Function not implemented")
+
+    class NoWorkers(ProcessPoolExecutor):
+        def submit(self, *args, **kwargs):
+            raise PermissionError(1, "Operation not permitted")
+
+    for broken in (no_pool, NoWorkers):
+        executor = RenderExecutor(max_workers=2, mode="process")
+        original = render_executor_module.ProcessPoolExecutor
+        render_executor_module.ProcessPoolExecutor = broken
+        try:
+            async def run():
+                return await asyncio.gather(*[executor.run(render_qr_png, "fallback") for _ in range(3)])
+
+            assert asyncio.run(run()) == [render_qr_png("fallback")] * 3
+        finally:
+            render_executor_module.ProcessPoolExecutor = original
+            executor.shutdown()
+        stats = executor.stats()
+        assert stats["mode"] == "thread" and stats["fallback_reason"], stats
+        assert stats["completed"] == 3 and stats["failed"] == 0, stats
+
+def test_recycling_is_opt_in():
+    """Without RENDER_MAX_TASKS_PER_CHILD workers are never recycled, so the pool keeps the default start method"""
+    if "RENDER_MAX_TASKS_PER_CHILD" not in os.environ:
+        assert RenderExecutor(mode="process").max_tasks_per_child == 0
+
+def test_full_queue_refuses_new_jobs():
+    """Once max_waiting jobs wait for a slot, run() raises RenderQueueFull instead of queueing"""
+    executor = RenderExecutor(mode="sync", max_queue=1, max_waiting=2)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold():
+            async with executor.scheduler.slot():
+                await release.wait()
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        waiting = [asyncio.ensure_future(executor.run(len, "queued")) for _ in range(2)]
+        await asyncio.sleep(0)
+        try:
+            await executor.run(len, "refused")
+            assert False, "expected RenderQueueFull"
+        except RenderQueueFull as e:
+            assert e.waiting == 2 and e.retry_after == 1
+        release.set()
+        await holder
+        assert await asyncio.gather(*waiting) == [6, 6]
+        assert await executor.run(len, "accepted again") == 14
+
+    asyncio.run(run())
+    stats = executor.stats()
+    assert stats["rejected"] == 1 and stats["completed"] == 3, stats
+
+def test_full_queue_is_a_503():
+    """The image endpoints answer 503 with Retry-After while the render queue is full"""
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            max_waiting = render_executor.max_waiting
+            render_executor.max_waiting = 0
+            try:
+                response = await client.get(f"/api/v1/qr.png?text=busy {time.time()}&cache=false")
+            finally:
+                render_executor.max_waiting = max_waiting
+            assert response.status_code == 503 and response.headers["retry-after"] == "1", response.text
+            assert (await client.get(f"/api/v1/qr.png?text=idle {time.time()}&cache=false")).status_code == 200
+
+    asyncio.run(run())
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing the render executor")
+    print("=" * 60)
+
+    tests = [
+        test_renders_in_worker_processes,
+        test_workers_are_recycled,
+        test_dead_worker_restarts_the_pool,
+        test_falls_back_to_threads_when_processes_cannot_start,
+        test_recycling_is_opt_in,
+        test_full_queue_refuses_new_jobs,
+        test_full_queue_is_a_503
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test script for the render pipeline: one encode per render fanned out to every sink (no server needed)
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault("RENDER_EXECUTOR", "sync")
+os.environ.setdefault("PACK_STORE_DIR", tempfile.mkdtemp())
+
+from src.models.request_models import OutputFormat
+from src.services.pack_store import PackStore
+from src.services.qr_service import render_qr_png, render_qr_svg
+from src.services.render_cache import RenderCache, make_render_key
+from src.services.render_pipeline import CacheSink, DiskSink, PackSink, RenderPipeline
+
+class RecordingSink:
+    """Keeps a copy of every artifact's bytes it is given"""
+
+    def __init__(self):
+        self.received = []
+
+    def emit(self, artifact):
+        self.received.append((artifact.from_cache, bytes(artifact.data)))
+
+def counted(render, calls):
+    """Wrap a renderer so every encode is counted"""
+    def wrapper(*args, **kwargs):
+        calls.append(args[0])
+        return render(*args, **kwargs)
+    return wrapper
+
+def make_pipeline():
+    """A pipeline with its own cache and store, plus one sink of every kind"""
+    directory = tempfile.mkdtemp()
+    store = PackStore(os.path.join(directory, "pack"))
+    pipeline = RenderPipeline(cache=RenderCache(), store=store, shared=None)
+    disk = DiskSink(os.path.join(directory, "images"), retention=None)
+    sinks = [CacheSink(pipeline.cache, store=store, shared=None), PackSink(os.path.join(directory, "images"), store), disk, RecordingSink(), RecordingSink()]
+    return pipeline, store, disk, sinks
+
+def assert_sinks_match(artifact, pipeline, store, disk, sinks, from_cache):
+    """Every sink got the bytes returned to the caller"""
+    data = bytes(artifact.data)
+    for sink in sinks[3:]:
+        assert sink.received[-1] == (from_cache, data)
+    assert pipeline.cache.get(artifact.key) == data
+    store.flush()
+    assert bytes(store.get(artifact.key)[0]) == data
+    disk.flush()
+    with open(artifact.file_path, "rb") as f:
+        assert f.read() == data
+    assert artifact.base64 and artifact.data_uri.endswith(artifact.base64)
+
+def test_one_encode_for_every_sink():
+    """A render encodes once and every sink, the caches and the written file hold byte-identical output"""
+    pipeline, store, disk, sinks = make_pipeline()
+    calls = []
+    text = f"fan out {time.time()}"
+    key = make_render_key(text, "qr", output_format="png")
+
+    artifact = pipeline.render_sync(key, OutputFormat.PNG, "qr", counted(render_qr_png, calls), text, sinks=sinks)
+    assert calls == [text] and not artifact.from_cache
+    assert_sinks_match(artifact, pipeline, store, disk, sinks, from_cache=False)
+
+    again = pipeline.render_sync(key, OutputFormat.PNG, "qr", counted(render_qr_png, calls), text, sinks=sinks)
+    assert calls == [text] and again.from_cache and again.data == artifact.data
+    assert_sinks_match(again, pipeline, store, disk, sinks, from_cache=True)
+
+def test_async_renders_share_one_encode():
+    """Concurrent async renders of one key encode once, and every sink of every caller gets the same bytes"""
+    pipeline, store, disk, sinks = make_pipeline()
+    calls = []
+    text = f"fan out async {time.time()}"
+    key = make_render_key(text, "qr", output_format="svg")
+    render = counted(render_qr_svg, calls)
+
+    async def run():
+        return await asyncio.gather(*(
+            pipeline.render(key, OutputFormat.SVG, "qr", render, text, use_cache=False, sinks=sinks)
+            for _ in range(4)
+        ))
+
+    artifacts = asyncio.run(run())
+    assert calls == [text], calls
+    assert len({bytes(artifact.data) for artifact in artifacts}) == 1
+    for sink in sinks[3:]:
+        assert sink.received == [(False, bytes(artifacts[0].data))] * 4
+    for artifact in artifacts:
+        assert_sinks_match(artifact, pipeline, store, disk, sinks, from_cache=False)
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing the render pipeline")
+    print("=" * 60)
+
+    tests = [
+        test_one_encode_for_every_sink,
+        test_async_renders_share_one_encode
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
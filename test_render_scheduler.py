@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Test script for the priority-aware render scheduler (no server needed)
+"""
+
+import asyncio
+import os
+import time
+
+os.environ.setdefault("RENDER_EXECUTOR", "sync")
+
+import httpx
+
+from src.main import app
+from src.services.render_executor import RenderExecutor
+from src.services.render_scheduler import API, BULK, INTERACTIVE, RenderScheduler, current_priority, render_priority
+
+async def queue_jobs(scheduler, jobs, order, hold=0.0):
+    """Hold every slot, queue (priority, tenant) jobs, then release the slots and record the dispatch order"""
+    blockers = [asyncio.Event() for _ in range(scheduler.capacity)]
+
+    async def block(event):
+        async with scheduler.slot(INTERACTIVE, "blocker"):
+            await event.wait()
+
+    async def job(index, priority, tenant):
+        async with scheduler.slot(priority, tenant):
+            order.append(index)
+            await asyncio.sleep(hold)
+
+    holders = [asyncio.ensure_future(block(event)) for event in blockers]
+    await asyncio.sleep(0)
+    waiters = [asyncio.ensure_future(job(i, priority, tenant)) for i, (priority, tenant) in enumerate(jobs)]
+    await asyncio.sleep(0)
+    for event in blockers:
+        event.set()
+    await asyncio.gather(*holders, *waiters)
+
+def test_higher_classes_go_first():
+    """A free slot goes to interactive work, then api, then bulk, whatever the arrival order"""
+    scheduler = RenderScheduler(1)
+    order = []
+    jobs = [(BULK, "a"), (API, "a"), (BULK, "a"), (INTERACTIVE, "a"), (API, "a")]
+    asyncio.run(queue_jobs(scheduler, jobs, order))
+    assert order == [3, 1, 4, 0, 2], order
+
+    stats = scheduler.stats()
+    assert stats["running"] == 0 and all(c["waiting"] == 0 for c in stats["classes"].values()), stats
+    assert stats["classes"][BULK]["dispatched"] == 2 and stats["classes"][INTERACTIVE]["dispatched"] == 2
+
+def test_tenants_share_a_class_fairly():
+    """A tenant flooding the queue only delays itself; weights give a tenant a larger share"""
+    order = []
+    jobs = [(BULK, "flood")] * 6 + [(BULK, "quiet")] * 2
+    asyncio.run(queue_jobs(RenderScheduler(1), jobs, order))
+    assert order[:4] == [0, 6, 1, 7], order  # the quiet tenant is not stuck behind the flood
+
+    order = []
+    jobs = [(API, "small")] * 4 + [(API, "big")] * 4
+    asyncio.run(queue_jobs(RenderScheduler(1, tenant_weights={"big": 3}), jobs, order))
+    assert sum(1 for index in order[:4] if index >= 4) == 3, order
+
+def test_starving_work_is_promoted():
+    """Bulk work waiting longer than its max_wait runs ahead of a steady stream of interactive work"""
+    scheduler = RenderScheduler(1, max_wait={BULK: 0.05})
+    order = []
+
+    async def run():
+        async def job(name, priority):
+            async with scheduler.slot(priority, "tenant"):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        tasks = [asyncio.ensure_future(job("first", INTERACTIVE))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(job("bulk", BULK)))
+        for i in range(20):
+            tasks.append(asyncio.ensure_future(job(f"chat {i}", INTERACTIVE)))
+            await asyncio.sleep(0.005)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert 1 < order.index("bulk") < len(order) - 1, order
+    assert scheduler.stats()["classes"][BULK]["promoted"] == 1
+
+def test_cancelled_waiters_free_their_place():
+    """A caller that gives up while queued is skipped and never leaks a slot"""
+    scheduler = RenderScheduler(1)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot(API, "a"):
+                await release.wait()
+
+        async def wait_for_slot():
+            async with scheduler.slot(BULK, "b"):
+                pass
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        gone = asyncio.ensure_future(wait_for_slot())
+        await asyncio.sleep(0)
+        assert scheduler.stats()["classes"][BULK]["waiting"] == 1
+        gone.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        await holder
+        await asyncio.wait_for(wait_for_slot(), timeout=1)
+
+    asyncio.run(run())
+    stats = scheduler.stats()
+    assert stats["running"] == 0 and stats["classes"][BULK]["waiting"] == 0, stats
+
+def test_executor_runs_renders_in_their_class():
+    """The executor queues renders under the caller's priority; the state is served in stats and /metrics"""
+    executor = RenderExecutor(mode="sync", max_queue=2)
+
+    async def run():
+        with render_priority(BULK, "channel:bulk"):
+            assert await executor.run(current_priority) == (BULK, "channel:bulk")
+        assert await executor.run(current_priority) == (API, "anonymous")
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/api/v1/batch", json=[{"type": "qr", "text": f"scheduled {time.time()}"}])
+            assert response.status_code == 200
+            stats = (await client.get("/api/v1/executor/stats")).json()
+            assert stats["scheduler"]["classes"][BULK]["dispatched"] >= 1, stats
+            metrics = (await client.get("/metrics")).text
+            assert 'qrbar_render_queue_depth{priority="bulk"}' in metrics
+            assert 'qrbar_render_queue_wait_seconds_bucket{priority="bulk"' in metrics
+
+    asyncio.run(run())
+    assert executor.stats()["scheduler"]["classes"][BULK]["dispatched"] == 1
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing the render scheduler")
+    print("=" * 60)
+
+    tests = [
+        test_higher_classes_go_first,
+        test_tenants_share_a_class_fairly,
+        test_starving_work_is_promoted,
+        test_cancelled_waiters_free_their_place,
+        test_executor_runs_renders_in_their_class
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
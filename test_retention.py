@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test script for generated file retention: TTL and byte-budget sweeps (no server needed)
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+from src.services.retention import RetentionManager
+
+def write(directory, name, size, created):
+    """Create a file of size bytes with its mtime set to created"""
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    os.utime(path, (created, created))
+    return path
+
+def test_ttl_sweep():
+    """Files at or past the TTL are deleted; younger files stay on disk and in the index"""
+    with tempfile.TemporaryDirectory() as directory:
+        manager = RetentionManager(directory, max_bytes=10_000, ttl_seconds=100)
+        paths = [write(directory, f"{i}.png", 10, 1000 + i * 50) for i in range(4)]
+        for path, created in zip(paths, (1000, 1050, 1100, 1150)):
+            manager.record(path, 10, created)
+
+        assert manager.sweep(now=1150) == 2
+        assert [os.path.exists(path) for path in paths] == [False, False, True, True]
+        stats = manager.stats()
+        assert stats["files"] == 2 and stats["bytes"] == 20 and stats["evicted_ttl"] == 2, stats
+
+        assert manager.sweep(now=1150) == 0
+        assert manager.stats()["sweeps"] == 2
+
+def test_byte_budget_sweep():
+    """Over budget, the oldest files go first until the total is within max_bytes"""
+    with tempfile.TemporaryDirectory() as directory:
+        manager = RetentionManager(directory, max_bytes=250, ttl_seconds=3600)
+        paths = [write(directory, f"{i}.png", 100, 1000 + i) for i in range(5)]
+        for i, path in enumerate(paths):
+            manager.record(path, 100, 1000 + i)
+
+        assert manager.sweep(now=1010) == 3
+        assert [os.path.exists(path) for path in paths] == [False, False, False, True, True]
+        stats = manager.stats()
+        assert stats["bytes"] == 200 and stats["evicted_budget"] == 3 and stats["evicted_ttl"] == 0, stats
+
+def test_record_replaces_and_missing_files_are_skipped():
+    """Recording a path again replaces its size, and a file already gone doesn't break the sweep"""
+    with tempfile.TemporaryDirectory() as directory:
+        manager = RetentionManager(directory, max_bytes=1000, ttl_seconds=10)
+        path = write(directory, "a.png", 10, 1000)
+        manager.record(path, 10, 1000)
+        manager.record(path, 30, 1000)
+        assert manager.stats()["bytes"] == 30
+
+        manager.record(os.path.join(directory, "gone.png"), 5, 1000)
+        assert manager.sweep(now=2000) == 2
+        assert manager.stats()["files"] == 0 and manager.current_bytes == 0
+
+def test_rebuild_indexes_existing_files_oldest_first():
+    """At startup generated files already on disk are indexed by mtime and swept; other files are never touched"""
+    with tempfile.TemporaryDirectory() as directory:
+        newest = write(directory, "qr_newest.png", 100, 3000)
+        oldest = write(directory, "qr_oldest.png", 100, 1000)
+        middle = write(directory, "barcode_middle.svg", 100, 2000)
+        write(directory, "qr_partial.png.tmp", 500, 500)
+        kept = [write(directory, name, 100, 500) for name in ("logo.png", "favicon.svg", "README")]
+
+        manager = RetentionManager(directory, max_bytes=150, ttl_seconds=10_000)
+        recorded = os.path.join(directory, "qr_recorded.png")
+        manager.record(recorded, 10, 4000)
+        assert manager.rebuild() == 3
+        assert manager.stats()["bytes"] == 310 and manager.stats()["files"] == 4
+
+        assert manager.sweep(now=4000) == 2
+        assert not os.path.exists(oldest) and not os.path.exists(middle) and os.path.exists(newest)
+        assert all(os.path.exists(path) for path in kept)
+
+        assert manager.sweep(now=100_000) == 2
+        assert all(os.path.exists(path) for path in kept)
+
+        assert RetentionManager(os.path.join(directory, "missing")).rebuild() == 0
+
+def test_periodic_sweep():
+    """start() returns at once; the scan and first sweep run off the loop, then a sweep every interval until stop()"""
+    with tempfile.TemporaryDirectory() as directory:
+        manager = RetentionManager(directory, max_bytes=10_000, ttl_seconds=0.05, interval_seconds=0.02)
+
+        async def run():
+            stale = write(directory, "qr_stale.png", 10, time.time() - 60)
+            manager.start()
+            assert manager.stats()["running"] and manager.stats()["sweeps"] == 0
+            await asyncio.sleep(0.01)
+            assert not os.path.exists(stale) and manager.stats()["sweeps"] >= 1
+            path = write(directory, "qr_late.png", 10, time.time())
+            manager.record(path, 10)
+            await asyncio.sleep(0.3)
+            await manager.stop()
+            return path
+
+        path = asyncio.run(run())
+        stats = manager.stats()
+        assert not os.path.exists(path) and stats["evicted_ttl"] == 2, stats
+        assert stats["sweeps"] > 2 and not stats["running"], stats
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing generated file retention")
+    print("=" * 60)
+
+    tests = [
+        test_ttl_sweep,
+        test_byte_budget_sweep,
+        test_record_replaces_and_missing_files_are_skipped,
+        test_rebuild_indexes_existing_files_oldest_first,
+        test_periodic_sweep
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
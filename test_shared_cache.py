@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Test script for the render cache shared across worker processes (no server needed)
+"""
+
+import errno
+import hashlib
+import multiprocessing
+import os
+
+os.environ.setdefault("RENDER_EXECUTOR", "sync")
+os.environ.setdefault("PACK_STORE", "0")
+
+from src.models.request_models import OutputFormat
+from src.services.render_cache import RenderCache, make_render_key
+from src.services.render_pipeline import CacheSink, RenderPipeline
+from src.services import shared_cache as shared_cache_module
+from src.services.shared_cache import SEQUENCE, SLOT, SharedCache
+
+def key(i):
+    return hashlib.sha256(str(i).encode()).hexdigest()
+
+def new_cache(name, **kwargs):
+    cache = SharedCache(f"qrbar-test-{name}-{os.getpid()}", **kwargs)
+    cache.unlink()
+    return cache
+
+def put_from_another_process(name, count):
+    cache = SharedCache(name, max_bytes=1 << 20, slots=1024)
+    for i in range(count):
+        cache.put(key(i), f"image {i}".encode() * 10)
+    cache.close()
+
+def die_mid_write(name, slot_offset):
+    cache = SharedCache(name, max_bytes=1 << 20, slots=1024)
+    cache.attach()
+    cache._acquire()
+    SEQUENCE.pack_into(cache._buf, slot_offset, SEQUENCE.unpack_from(cache._buf, slot_offset)[0] + 1)
+    os._exit(1)  # still holding the writer lock
+
+def test_put_and_get():
+    """Images round-trip, a key is stored once and unknown keys miss"""
+    cache = new_cache("roundtrip", max_bytes=1 << 20, slots=1024)
+    try:
+        assert cache.put(key(1), b"first image")
+        assert not cache.put(key(1), b"again")
+        assert cache.get(key(1)) == b"first image"
+        assert cache.get(key(2)) is None
+        stats = cache.stats()
+        assert stats["entries"] == 1 and stats["puts"] == 1 and stats["hits"] == 1 and stats["misses"] == 1, stats
+    finally:
+        cache.unlink()
+
+def test_images_are_shared_between_processes():
+    """What one process stores is a hit in another"""
+    cache = new_cache("processes", max_bytes=1 << 20, slots=1024)
+    try:
+        cache.attach()
+        context = multiprocessing.get_context("spawn")
+        writers = [context.Process(target=put_from_another_process, args=(cache.name, 200)) for _ in range(3)]
+        for process in writers:
+            process.start()
+        for process in writers:
+            process.join()
+        assert all(cache.get(key(i)) == f"image {i}".encode() * 10 for i in range(200))
+        assert cache.stats()["puts"] == 200
+    finally:
+        cache.unlink()
+
+def test_oldest_images_are_evicted():
+    """The slab is a fixed-size ring: old images make room for new ones and are never returned corrupted"""
+    cache = new_cache("eviction", max_bytes=64 * 1024, slots=256)
+    try:
+        for i in range(500):
+            assert cache.put(key(i), bytes([i % 256]) * 1000)
+        stats = cache.stats()
+        assert stats["evictions"] > 400 and stats["bytes"] <= cache.max_bytes, stats
+        assert cache.get(key(0)) is None
+        assert cache.get(key(499)) == bytes([499 % 256]) * 1000
+        assert all(cache.get(key(i)) in (None, bytes([i % 256]) * 1000) for i in range(500))
+        assert not cache.put(key(1000), b"x" * cache.max_bytes)  # too large for the slab
+    finally:
+        cache.unlink()
+
+def test_recovers_from_a_crashed_writer():
+    """A worker dying mid-write neither blocks other writers nor leaves a readable half-written slot"""
+    cache = new_cache("crash", max_bytes=1 << 20, slots=1024)
+    try:
+        cache.put(key(1), b"image")
+        raw_key = bytes.fromhex(key(1))
+        slot = next(slot for slot in cache._bucket(raw_key) if SLOT.unpack_from(cache._buf, cache._slot_offset(slot))[1] == raw_key)
+        process = multiprocessing.get_context("spawn").Process(target=die_mid_write, args=(cache.name, cache._slot_offset(slot)))
+        process.start()
+        process.join()
+
+        assert cache.get(key(1)) is None  # the slot is mid-write
+        assert cache.put(key(2), b"another image")  # the dead worker's lock was released
+        assert cache.put(key(1), b"image") and cache.get(key(1)) == b"image"
+        assert cache.stats()["recovered"] == 1
+    finally:
+        cache.unlink()
+
+def test_workers_share_renders_through_the_pipeline():
+    """A render in one worker is a cache hit for another worker with a cold in-process cache"""
+    cache = new_cache("pipeline")
+    try:
+        render_key = make_render_key("rendered once", "qr", output_format="png")
+        renders = []
+
+        def render(text):
+            renders.append(text)
+            return text.encode()
+
+        first = RenderPipeline(cache=RenderCache(), store=None, shared=cache)
+        sink = CacheSink(first.cache, store=None, shared=cache)
+        first.render_sync(render_key, OutputFormat.PNG, "qr", render, "rendered once", sinks=[sink])
+
+        second = RenderPipeline(cache=RenderCache(), store=None, shared=SharedCache(cache.name))
+        artifact = second.render_sync(render_key, OutputFormat.PNG, "qr", render, "rendered once")
+        assert artifact.from_cache and artifact.data == b"rendered once"
+        assert renders == ["rendered once"]
+        assert second.cache.get(render_key) == b"rendered once"  # promoted into the worker's own cache
+    finally:
+        cache.unlink()
+
+def test_unavailable_shared_memory_is_a_miss():
+    """Without usable shared memory (ENOSPC, no /dev/shm) or lock file, the tier is skipped instead of raising"""
+    def no_space(*args, **kwargs):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    original = shared_cache_module.shared_memory.SharedMemory
+    shared_cache_module.shared_memory.SharedMemory = no_space
+    try:
+        cache = SharedCache(f"qrbar-test-nospace-{os.getpid()}")
+        assert not cache.attach() and not cache.attach()
+        assert cache.get(key(1)) is None and not cache.put(key(1), b"image")
+        assert cache.stats()["attached"] is False
+    finally:
+        shared_cache_module.shared_memory.SharedMemory = original
+
+    cache = SharedCache(f"qrbar-test-nolock-{os.getpid()}", lock_path="/nonexistent/dir/cache.lock")
+    assert not cache.attach() and cache.get(key(1)) is None
+    assert cache._thread_lock.acquire(blocking=False)  # released after the failed flock
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing the shared memory render cache")
+    print("=" * 60)
+
+    tests = [
+        test_put_and_get,
+        test_images_are_shared_between_processes,
+        test_oldest_images_are_evicted,
+        test_recovers_from_a_crashed_writer,
+        test_workers_share_renders_through_the_pipeline,
+        test_unavailable_shared_memory_is_a_miss
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Test script for single-flight deduplication of identical in-flight renders (no server needed)
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+os.environ.setdefault("RENDER_EXECUTOR", "sync")
+
+from src.main import render_qr
+from src.services.render_pipeline import render_pipeline
+from src.services.render_scheduler import BULK, INTERACTIVE, RenderScheduler, render_priority
+from src.services.single_flight import SingleFlight
+
+def test_concurrent_calls_share_one_computation():
+    """Concurrent callers with the same key await one call; other keys run separately"""
+    flights = SingleFlight()
+    calls = []
+
+    async def work(key):
+        calls.append(key)
+        await asyncio.sleep(0.05)
+        return key.upper()
+
+    async def run():
+        return await asyncio.gather(*(flights.do(key, lambda key=key: work(key)) for key in ["a"] * 10 + ["b"] * 5))
+
+    results = asyncio.run(run())
+    assert results == ["A"] * 10 + ["B"] * 5
+    assert sorted(calls) == ["a", "b"], calls
+    assert flights.stats() == {"in_flight": 0, "leaders": 2, "collapsed": 13}
+
+def test_cancelled_leader_keeps_the_work_running():
+    """Cancelling the first caller neither cancels the shared work nor fails the other callers"""
+    flights = SingleFlight()
+    finished = []
+
+    async def work():
+        await asyncio.sleep(0.05)
+        finished.append(True)
+        return "done"
+
+    async def run():
+        leader = asyncio.ensure_future(flights.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await follower == "done"
+        assert leader.cancelled()
+
+        # With every caller gone the work still completes
+        orphan = asyncio.ensure_future(flights.do("orphan", work))
+        await asyncio.sleep(0.01)
+        orphan.cancel()
+        await asyncio.sleep(0.08)
+
+    asyncio.run(run())
+    assert finished == [True, True]
+    assert flights.stats()["in_flight"] == 0
+
+def test_errors_reach_every_caller():
+    """An exception from the shared work is raised to each waiting caller, and the key is retried afterwards"""
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def run():
+        results = await asyncio.gather(*(flights.do("k", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results), results
+        assert await flights.do("k", lambda: asyncio.sleep(0, result="ok")) == "ok"
+
+    asyncio.run(run())
+
+def test_threads_share_one_computation():
+    """do_sync collapses identical calls from several threads"""
+    flights = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def work():
+        calls.append(1)
+        started.set()
+        time.sleep(0.05)
+        return "value"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.do_sync("k", work)))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=lambda: results.append(flights.do_sync("k", work))) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+    assert flights.collapsed == 4
+
+def test_joining_raises_the_shared_priority():
+    """An interactive caller joining a bulk caller's render moves it ahead of the bulk backlog"""
+    flights = SingleFlight()
+    scheduler = RenderScheduler(capacity=1)
+    order = []
+
+    async def work(name):
+        async with scheduler.slot():
+            order.append(name)
+            await asyncio.sleep(0.001)
+            return name
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot(INTERACTIVE):
+                await release.wait()
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        with render_priority(BULK, "batch"):
+            backlog = [asyncio.ensure_future(work(f"bulk{i}")) for i in range(3)]
+            shared = asyncio.ensure_future(flights.do("k", lambda: work("shared")))
+        await asyncio.sleep(0.01)
+        assert scheduler.stats()["classes"][BULK]["waiting"] == 4
+
+        with render_priority(INTERACTIVE, "chat"):
+            joined = asyncio.ensure_future(flights.do("k", lambda: work("duplicate")))
+        await asyncio.sleep(0.01)
+        assert scheduler.stats()["classes"][INTERACTIVE]["waiting"] == 1
+        assert scheduler.stats()["classes"][BULK]["waiting"] == 3
+
+        release.set()
+        await holder
+        assert await joined == await shared == "shared"
+        await asyncio.gather(*backlog)
+
+        # A lower class joining never lowers it
+        with render_priority(INTERACTIVE, "chat"):
+            first = asyncio.ensure_future(flights.do("k2", lambda: work("k2")))
+        await asyncio.sleep(0)
+        with render_priority(BULK, "batch"):
+            assert await flights.do("k2", lambda: work("never")) == "k2"
+        await first
+
+    asyncio.run(run())
+    assert order == ["shared", "bulk0", "bulk1", "bulk2", "k2"], order
+    assert scheduler.stats()["running"] == 0 and scheduler.waiting() == 0
+
+def test_identical_renders_collapse_in_pipeline():
+    """Fifty identical uncached QR renders encode once"""
+    before = render_pipeline.flights.stats()
+
+    async def run():
+        return await asyncio.gather(*(render_qr("viral message", 10, use_cache=False) for _ in range(50)))
+
+    images = asyncio.run(run())
+    after = render_pipeline.flights.stats()
+    assert len(set(images)) == 1
+    assert after["leaders"] - before["leaders"] == 1
+    assert after["collapsed"] - before["collapsed"] == 49
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing single-flight render deduplication")
+    print("=" * 60)
+
+    tests = [
+        test_concurrent_calls_share_one_computation,
+        test_cancelled_leader_keeps_the_work_running,
+        test_errors_reach_every_caller,
+        test_threads_share_one_computation,
+        test_joining_raises_the_shared_priority,
+        test_identical_renders_collapse_in_pipeline
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
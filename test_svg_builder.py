@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Test script for SVG path generation from module matrices (no server needed)
+"""
+
+import re
+import xml.etree.ElementTree as ET
+
+from src.services.qr_service import _make_qr, render_qr_svg
+from src.utils.svg_builder import modules_to_path, row_runs, svg_document, svg_text
+
+SVG = "{http://www.w3.org/2000/svg}"
+RECT = re.compile(r"([Mm])(-?[\d.]+) (-?[\d.]+)h(\d+)v([\d.]+)h-(\d+)z")
+
+MATRIX = [
+    [1, 1, 1, 0, 1],
+    [1, 1, 1, 0, 1],
+    [0, 0, 0, 0, 1],
+    [1, 0, 1, 1, 0],
+    [1, 0, 1, 1, 0],
+    [0, 0, 0, 0, 0],
+    [1, 1, 1, 1, 1]
+]
+
+def covered_cells(path_data):
+    """Module cells painted by path data, as a list so overlapping rectangles show up twice"""
+    assert "".join(match.group(0) for match in RECT.finditer(path_data)) == path_data, f"unexpected path syntax: {path_data}"
+    cells = []
+    x = y = 0.0
+    for command, dx, dy, width, height, back in RECT.findall(path_data):
+        assert width == back
+        x, y = (float(dx), float(dy)) if command == "M" else (x + float(dx), y + float(dy))
+        cells.extend((int(x) + i, int(y) + j) for j in range(int(float(height))) for i in range(int(width)))
+    return cells
+
+def dark_cells(matrix, offset=0):
+    return sorted((x + offset, y + offset) for y, row in enumerate(matrix) for x, dark in enumerate(row) if dark)
+
+def test_row_runs():
+    """Runs of dark modules are found at the start, middle and end of a row"""
+    assert list(row_runs([1, 1, 0, 1, 0, 0, 1, 1, 1])) == [(0, 2), (3, 1), (6, 3)]
+    assert list(row_runs([0, 0])) == [] and list(row_runs([])) == []
+
+def test_path_covers_exactly_the_dark_modules():
+    """Every dark module is painted once, no light module is painted, and identical rows merge"""
+    path_data = modules_to_path(MATRIX)
+    assert sorted(covered_cells(path_data)) == dark_cells(MATRIX)
+    assert path_data.count("z") == 5, path_data  # identical runs on consecutive rows share a rectangle
+
+    shifted = modules_to_path(MATRIX, x_offset=4, y_offset=4)
+    assert sorted(covered_cells(shifted)) == dark_cells(MATRIX, 4)
+    assert modules_to_path([[0, 0], [0, 0]]) == ""
+
+def test_qr_path_matches_its_module_matrix():
+    """A rendered QR SVG parses as XML and its path paints exactly the symbol's dark modules inside the quiet zone"""
+    text, border = "https://example.com/svg", 4
+    qr = _make_qr(text, 1, 10, border, "L")
+    root = ET.fromstring(render_qr_svg(text, 1, 10, border, "L"))
+
+    dimension = qr.modules_count + 2 * border
+    assert root.tag == f"{SVG}svg" and root.get("viewBox") == f"0 0 {dimension} {dimension}"
+    assert root.get("width") == root.get("height") == str(dimension * qr.box_size)
+    path = root.find(f"{SVG}path")
+    assert path is not None and path.get("fill") == "#000"
+    assert sorted(covered_cells(path.get("d"))) == dark_cells(qr.modules, border)
+
+def test_document_is_valid_svg():
+    """Documents parse as SVG, scale their pixel size and escape text"""
+    text = svg_text(2.5, 9, 'A&B <"x">', 1.5)
+    root = ET.fromstring(svg_document(5, 7, modules_to_path(MATRIX), scale=3, extra=text))
+    assert root.tag == f"{SVG}svg"
+    assert (root.get("width"), root.get("height"), root.get("viewBox")) == ("15", "21", "0 0 5 7")
+    assert [child.tag for child in root] == [f"{SVG}rect", f"{SVG}path", f"{SVG}text"]
+    label = root.find(f"{SVG}text")
+    assert label.text == 'A&B <"x">' and label.get("x") == "2.5" and label.get("text-anchor") == "middle"
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing SVG path generation")
+    print("=" * 60)
+
+    tests = [
+        test_row_runs,
+        test_path_covers_exactly_the_dark_modules,
+        test_qr_path_matches_its_module_matrix,
+        test_document_is_valid_svg
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Test script for the async TelexClient against a local stub webhook server
+"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.utils.telex_client import TelexClient
+
+class StubWebhook:
+    """Local webhook that replays scripted responses and records what it receives"""
+
+    def __init__(self, responses=None, delay=0.0):
+        self.responses = list(responses or [])
+        self.delay = delay
+        self.requests = []
+        self.connections = set()
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with stub.lock:
+                    stub.requests.append((self.path, json.loads(body)))
+                    stub.connections.add(self.client_address)
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                    status, headers = stub.responses.pop(0) if stub.responses else (200, {})
+                time.sleep(stub.delay)
+                with stub.lock:
+                    stub.active -= 1
+
+                try:
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", "2")
+                    self.end_headers()
+                    self.wfile.write(b"{}")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client gave up (deadline test)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/webhook"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+def make_client(url, **kwargs):
+    kwargs.setdefault("backoff_base", 0.01)
+    kwargs.setdefault("backoff_max", 0.05)
+    return TelexClient(webhook_url=url, agent_name="TestBot", **kwargs)
+
+def test_send_message():
+    """Message payload reaches the webhook and connections are reused"""
+    async def run():
+        with StubWebhook() as stub:
+            async with make_client(stub.url) as client:
+                for i in range(3):
+                    assert await client.send_message("channel-1", f"hello {i}")
+                assert await client.register_agent({"name": "TestBot"})
+            path, payload = stub.requests[0]
+            assert path == "/webhook" and payload["channel_id"] == "channel-1" and payload["type"] == "text"
+            assert stub.requests[-1][0] == "/webhook/register"
+            assert len(stub.connections) == 1, "keep-alive connection should be reused"
+    asyncio.run(run())
+
+def test_retries_transient_errors():
+    """503 and 429 are retried (honouring Retry-After); 400 is not"""
+    async def run():
+        with StubWebhook([(503, {}), (429, {"Retry-After": "0.1"}), (200, {})]) as stub:
+            async with make_client(stub.url, max_retries=3) as client:
+                started = time.perf_counter()
+                assert await client.send_message("channel-1", "retry me")
+                assert time.perf_counter() - started >= 0.1
+            assert len(stub.requests) == 3
+
+        with StubWebhook([(400, {}), (200, {})]) as stub:
+            async with make_client(stub.url, max_retries=3) as client:
+                assert not await client.send_message("channel-1", "bad request")
+            assert len(stub.requests) == 1
+
+        with StubWebhook([(500, {})] * 5) as stub:
+            async with make_client(stub.url, max_retries=2) as client:
+                assert not await client.send_message("channel-1", "always failing")
+            assert len(stub.requests) == 3
+    asyncio.run(run())
+
+def test_deadline():
+    """A slow webhook is abandoned once the per-call deadline passes"""
+    async def run():
+        with StubWebhook(delay=1.0) as stub:
+            async with make_client(stub.url, max_retries=5) as client:
+                started = time.perf_counter()
+                assert not await client.send_message("channel-1", "too slow", deadline=0.3)
+                assert time.perf_counter() - started < 0.8
+    asyncio.run(run())
+
+def test_concurrency_limit_and_event_loop():
+    """In-flight calls stay within max_concurrency and the event loop keeps running"""
+    async def run():
+        with StubWebhook(delay=0.1) as stub:
+            async with make_client(stub.url, max_concurrency=2) as client:
+                ticks = 0
+
+                async def ticker():
+                    nonlocal ticks
+                    while True:
+                        await asyncio.sleep(0.01)
+                        ticks += 1
+
+                ticking = asyncio.create_task(ticker())
+                results = await asyncio.gather(*(client.send_message("channel-1", f"m{i}") for i in range(6)))
+                ticking.cancel()
+            assert all(results)
+            assert stub.max_active <= 2
+            assert ticks >= 10, "event loop was blocked while sending"
+    asyncio.run(run())
+
+def test_waiting_for_a_slot_respects_the_deadline():
+    """With every slot busy, a call gives up once its deadline passes instead of queueing behind them"""
+    async def run():
+        with StubWebhook(delay=0.5) as stub:
+            async with make_client(stub.url, max_concurrency=1) as client:
+                busy = asyncio.create_task(client.send_message("channel-1", "slow"))
+                await asyncio.sleep(0.05)
+                started = time.perf_counter()
+                assert not await client.send_message("channel-1", "waiting", deadline=0.1)
+                assert time.perf_counter() - started < 0.3
+                assert await busy
+                assert await client.send_message("channel-1", "slot released", deadline=1.0)
+            assert [payload["message"] for _, payload in stub.requests] == ["slow", "slot released"]
+    asyncio.run(run())
+
+def test_new_event_loop_closes_the_old_pool():
+    """Using the client from a new event loop closes the pool bound to the previous one"""
+    with StubWebhook() as stub:
+        client = make_client(stub.url)
+        assert asyncio.run(client.send_message("channel-1", "first loop"))
+        first = client._client
+        assert asyncio.run(client.send_message("channel-1", "second loop"))
+        assert first.is_closed and client._client is not first and not client._client.is_closed
+        asyncio.run(client.aclose())
+        assert len(stub.requests) == 2
+
+def main():
+    """Run all tests"""
+    print("🧪 Testing async TelexClient against a stub webhook")
+    print("=" * 60)
+
+    tests = [
+        test_send_message,
+        test_retries_transient_errors,
+        test_deadline,
+        test_concurrency_limit_and_event_loop,
+        test_waiting_for_a_slot_respects_the_deadline,
+        test_new_event_loop_closes_the_old_pool
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {passed}/{len(tests)} tests passed")
+
+if __name__ == "__main__":
+    main()